@@ -0,0 +1,121 @@
+"""Compares the vectorized batch calculator with computing each profile row by row.
+
+Generates random profiles (including some invalid rows) and computes BMI, BMI category,
+BMR and calorie targets with:
+  tools        the BMI, BMR and calorie tools' `_run`, three calls per profile
+  formulas     the shared scalar formulas in a Python loop
+  vectorized   `compute_batch` on columns (the NumPy pass alone)
+  profiles     `compute_profiles`, including the dict-to-column conversion an API request pays
+and checks that the formula loop and the batch results are identical.
+
+Run from the project root:
+    python -m backend.benchmarks.batch_calc --rows 100000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from backend.services.batch_calc import CALORIE_ADJUSTMENT, compute_batch, compute_profiles
+from backend.services.tools import (
+    ACTIVITY_MULTIPLIERS,
+    BMICalculatorTool,
+    BMRCalculatorTool,
+    CalorieEstimatorTool,
+    bmi_category,
+    compute_bmi,
+    compute_bmr,
+)
+
+ACTIVITY_LEVELS = list(ACTIVITY_MULTIPLIERS) + ["Light", "moderately_active", "couch"]
+GENDERS = ["male", "female", "Female", "other"]
+
+
+def random_profiles(rows: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "weight_kg": round(rng.uniform(40, 150), rng.choice([0, 1, 2])),
+            "height_cm": round(rng.uniform(140, 210), rng.choice([0, 1])),
+            "age_years": rng.randint(15, 90),
+            "gender": rng.choice(GENDERS),
+            "activity_level": rng.choice(ACTIVITY_LEVELS),
+        }
+        for i in range(rows)
+    ]
+
+
+def per_row(profile: dict) -> dict:
+    """What a caller would get by running the BMI, BMR and calorie formulas one profile at a time."""
+    gender = profile["gender"].lower()
+    activity = profile["activity_level"].lower()
+    if gender not in ("male", "female") or activity not in ACTIVITY_MULTIPLIERS:
+        return {"id": profile["id"], "error": True}
+    bmi = compute_bmi(profile["weight_kg"], profile["height_cm"] / 100)
+    bmr = compute_bmr(profile["age_years"], gender, profile["weight_kg"], profile["height_cm"])
+    maintenance = bmr * ACTIVITY_MULTIPLIERS[activity]
+    return {
+        "id": profile["id"],
+        "bmi": bmi,
+        "bmi_category": bmi_category(bmi),
+        "bmr": round(bmr),
+        "maintenance_calories": round(maintenance),
+        "deficit_calories": round(maintenance - CALORIE_ADJUSTMENT),
+        "surplus_calories": round(maintenance + CALORIE_ADJUSTMENT),
+    }
+
+
+def per_row_tools(profile: dict, bmi_tool, bmr_tool, calorie_tool) -> str:
+    """The strings the planner would get by calling the three tools for one profile."""
+    bmi = bmi_tool._run(profile["weight_kg"], profile["height_cm"] / 100)
+    bmr = bmr_tool._run(profile["age_years"], profile["gender"], profile["weight_kg"], profile["height_cm"])
+    if bmr.startswith("Error"):
+        return bmi + " " + bmr
+    raw_bmr = compute_bmr(profile["age_years"], profile["gender"], profile["weight_kg"], profile["height_cm"])
+    activity = profile["activity_level"]
+    return " ".join([bmi, bmr, calorie_tool._run(raw_bmr, activity, "lose_weight"), calorie_tool._run(raw_bmr, activity, "gain_weight")])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def same(expected: dict, actual: dict) -> bool:
+    if expected.get("error"):
+        return bool(actual["error"])
+    return all(actual[name] == value for name, value in expected.items())
+
+
+def main(rows: int):
+    profiles = random_profiles(rows)
+    columns = (
+        np.array([profile["weight_kg"] for profile in profiles], dtype=float),
+        np.array([profile["height_cm"] for profile in profiles], dtype=float),
+        np.array([profile["age_years"] for profile in profiles], dtype=float),
+        np.array([profile["gender"] for profile in profiles], dtype=object),
+        np.array([profile["activity_level"] for profile in profiles], dtype=object),
+    )
+    tools = (BMICalculatorTool(), BMRCalculatorTool(), CalorieEstimatorTool())
+
+    timings = {}
+    _, timings["tools"] = timed(lambda: [per_row_tools(profile, *tools) for profile in profiles])
+    expected, timings["formulas"] = timed(lambda: [per_row(profile) for profile in profiles])
+    _, timings["vectorized"] = timed(lambda: compute_batch(*columns))
+    actual, timings["profiles"] = timed(lambda: compute_profiles(profiles))
+
+    mismatches = sum(not same(e, a) for e, a in zip(expected, actual))
+    print(f"rows={rows} mismatches={mismatches}")
+    print(f"{'':<12}{'ms':>10}{'vs tools':>10}")
+    for name, seconds in timings.items():
+        print(f"{name:<12}{seconds * 1000:>10.1f}{timings['tools'] / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.rows)
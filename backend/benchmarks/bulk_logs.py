@@ -0,0 +1,103 @@
+"""Compares ingestion rows per second of the single-row log path against the bulk path.
+
+  single  one session, add_log/add_food_log and commit per entry (what /log and /log/food do per request)
+  bulk    validate_entries + add_logs/add_food_logs per batch of `--batch` entries (what /log/bulk does)
+Both write logs and food entries with client timestamps spread over the past week and
+keep the daily rollups up to date. HTTP overhead isn't included, so the real gap is wider.
+
+Uses its own SQLite file unless DATABASE_URL is set (ASYNC_DATABASE_URL is derived from it).
+Run from the project root:
+    python -m backend.benchmarks.bulk_logs --rows 4000 --batch 2016
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bulk_logs_benchmark.sqlite")
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+
+from backend.data.db import AsyncSessionLocal, async_engine, engine
+from backend.data.migrations import migrate
+from backend.schemas import FoodEntryIn, LogEntryIn
+from backend.services import async_db_service
+from backend.services.bulk_logs import validate_entries
+from models.db_models import DailyRollup, FoodEntry, Log, User
+
+USER_ID = 1
+FOODS = ["oatmeal", "banana", "chicken salad", "rice bowl", "greek yogurt", "apple"]
+
+
+def payloads(rows: int):
+    """Wearable-style uploads: a reading every few minutes over the past week, as JSON would decode them."""
+    rng = random.Random(22)
+    now = datetime.now()
+    logs, foods = [], []
+    for i in range(rows):
+        created_at = (now - timedelta(minutes=5 * i)).isoformat()
+        logs.append({"steps": rng.randint(0, 600), "sleep_hours": rng.uniform(0, 0.1), "water_intake": rng.uniform(0, 0.2), "calories": rng.uniform(0, 40), "created_at": created_at})
+        foods.append({"item_name": rng.choice(FOODS), "calories": rng.randint(50, 700), "confirmed": True, "created_at": created_at})
+    return logs, foods
+
+
+async def reset():
+    async with AsyncSessionLocal() as db:
+        for model in (Log, FoodEntry, DailyRollup):
+            await db.execute(delete(model).where(model.user_id == USER_ID))
+        if await db.get(User, USER_ID) is None:
+            db.add(User(id=USER_ID, name="Wearable", email="wearable@example.com", password="x"))
+        await db.commit()
+
+
+async def single(logs, foods, batch: int):
+    async with AsyncSessionLocal() as db:
+        for item in logs:
+            # /log takes no timestamp, so only the values go through
+            await async_db_service.add_log(db, USER_ID, item["steps"], item["sleep_hours"], item["water_intake"], item["calories"])
+        for item in foods:
+            await async_db_service.add_food_log(db, USER_ID, item["item_name"], item["calories"], item["confirmed"])
+
+
+async def bulk(logs, foods, batch: int):
+    for start in range(0, len(logs), batch):
+        async with AsyncSessionLocal() as db:
+            rows, _ = validate_entries(LogEntryIn, logs[start:start + batch])
+            await async_db_service.add_logs(db, USER_ID, rows)
+        async with AsyncSessionLocal() as db:
+            rows, _ = validate_entries(FoodEntryIn, foods[start:start + batch])
+            await async_db_service.add_food_logs(db, USER_ID, rows)
+
+
+async def stored():
+    async with AsyncSessionLocal() as db:
+        logs = (await db.execute(select(func.count(Log.id)).where(Log.user_id == USER_ID))).scalar()
+        foods = (await db.execute(select(func.count(FoodEntry.id)).where(FoodEntry.user_id == USER_ID))).scalar()
+        rolled = (await db.execute(select(func.sum(DailyRollup.log_count) + func.sum(DailyRollup.food_count)).where(DailyRollup.user_id == USER_ID))).scalar()
+    return logs + foods, rolled
+
+
+async def main(rows: int, batch: int):
+    migrate(engine)
+    logs, foods = payloads(rows)
+    print(f"{'':<8}{'rows':>8}{'seconds':>10}{'rows/s':>10}")
+    for name, ingest in (("single", single), ("bulk", bulk)):
+        await reset()
+        begin = time.perf_counter()
+        await ingest(logs, foods, batch)
+        elapsed = time.perf_counter() - begin
+        count, rolled = await stored()
+        assert count == rolled == 2 * rows, (count, rolled)
+        print(f"{name:<8}{count:>8}{elapsed:>10.2f}{count / elapsed:>10.0f}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=4000, help="Logs and food entries to ingest (each)")
+    parser.add_argument("--batch", type=int, default=2016, help="Entries per bulk request (a week of 5-minute readings)")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.batch))
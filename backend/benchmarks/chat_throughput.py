@@ -0,0 +1,98 @@
+"""Measures throughput and latency of the chat routes end to end with an offline LLM.
+
+Requests go through the FastAPI app in-process (no network), and the LLM is the fake
+provider unless LLM_PROVIDER says otherwise. LLM_PROVIDER=replay with a cassette
+recorded by LLM_PROVIDER=record replays real Gemini answers instead. Requests are sent as
+a freshly signed-up user with a goal, so /chat/stream runs the personalized planner.
+
+Run from the project root:
+    python -m backend.benchmarks.chat_throughput --requests 200 --concurrency 20
+"""
+import os
+
+# Offline defaults; must be set before the app (and the LLM client) is imported
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("LLM_REQUESTS_PER_SECOND", "0")
+os.environ.setdefault("LLM_CACHE_BACKEND", "none")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./chat_benchmark.sqlite")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+from backend.main import app
+from backend.services.client import get_llm_coalescing_stats, get_llm_scheduler_stats
+
+SAMPLE_PROMPTS = [
+    "Give me a simple dinner idea for my weight loss goal.",
+    "What are good sources of protein for breakfast?",
+    "Can you explain my BMI? I weigh 82kg and I'm 1.78m tall, and why it matters.",
+    "How much water should I drink on workout days?",
+]
+GOAL = {"goal_type": "lose_weight", "target_weight": 75, "timeframe": "3 months", "activity_level": "moderate", "current_weight": 82, "height": 178, "age": 34, "gender": "male"}
+
+
+async def sign_up(client: httpx.AsyncClient) -> dict:
+    """Signs up a new user with a goal and returns the Authorization header for it."""
+    response = await client.post("/api/v1/auth/signup", json={"name": "benchmark", "email": f"{uuid.uuid4().hex}@example.com", "password": "benchmark"})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    (await client.post("/api/v1/goal/set", json=GOAL, headers=headers)).raise_for_status()
+    return headers
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def stream_once(client: httpx.AsyncClient, headers: dict, prompt: str, session_id: str):
+    """Returns (time to first token, total time) in seconds for one /chat/stream request."""
+    start = time.perf_counter()
+    first_token = None
+    async with client.stream("POST", "/api/v1/chat/stream", json={"message": prompt, "session_id": session_id}, headers=headers) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("data: ") and first_token is None:
+                first_token = time.perf_counter() - start
+    return first_token or 0.0, time.perf_counter() - start
+
+
+async def main(requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        headers = await sign_up(client)
+
+        async def one(i: int):
+            async with semaphore:
+                return await stream_once(client, headers, SAMPLE_PROMPTS[i % len(SAMPLE_PROMPTS)], f"bench-{i}")
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*[one(i) for i in range(requests)])
+        elapsed = time.perf_counter() - start
+
+    ttft = [first * 1000 for first, _ in results]
+    total = [whole * 1000 for _, whole in results]
+    print(f"provider={os.environ['LLM_PROVIDER']} requests={requests} concurrency={concurrency}")
+    print(f"throughput: {requests / elapsed:.1f} req/s")
+    print(f"{'':<14}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    print(f"{'first token':<14}{statistics.median(ttft):>10.1f}{percentile(ttft, 0.95):>10.1f}{max(ttft):>10.1f}")
+    print(f"{'full response':<14}{statistics.median(total):>10.1f}{percentile(total, 0.95):>10.1f}{max(total):>10.1f}")
+    print(f"coalescing: {get_llm_coalescing_stats()}")
+    scheduler = get_llm_scheduler_stats()
+    print(f"scheduler: peak queue {scheduler['peak_queue_depth']}, avg wait {scheduler['wait_seconds_avg'] * 1000:.1f} ms, shed {scheduler['shed']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
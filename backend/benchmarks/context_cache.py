@@ -0,0 +1,122 @@
+"""Compares chat context loads without the context cache and with it, while users keep logging.
+
+Each turn builds the chat context (`aget_user_context`) for a random user; every `--write-every`
+turns a log and a food entry are added through async_db_service, which patches the cache:
+  none     every turn reads the goal, 30 days of rollups and the top foods
+  memory   MemoryContextCache
+  sqlite   SQLiteContextCache in a temporary file
+Reports turns per second, database queries per turn and the cache hit rate, and checks
+that the last context of each user matches a fresh load.
+
+Uses its own SQLite file unless DATABASE_URL is set (ASYNC_DATABASE_URL is derived from it).
+Run from the project root:
+    python -m backend.benchmarks.context_cache --turns 2000 --users 50
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./context_cache_benchmark.sqlite")
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select
+
+from backend.data.db import AsyncSessionLocal, async_engine, engine
+from backend.data.migrations import migrate
+from backend.services import async_db_service, user_context
+from backend.services.context_cache import CONTEXT_DAYS, MemoryContextCache, NoContextCache, SQLiteContextCache
+from backend.services.rollups import backfill_rollups
+from models.db_models import FoodEntry, Goal, Log, User
+
+FOODS = ["oatmeal", "banana", "chicken salad", "rice bowl", "greek yogurt", "apple", "protein bar", "pasta"]
+queries = 0
+
+
+def count_query(*args):
+    global queries
+    queries += 1
+
+
+def seed(users: int, per_day: int):
+    with engine.connect() as conn:
+        if conn.execute(User.__table__.select().where(User.id == users)).first():
+            return
+    rng = random.Random(25)
+    now = datetime.now()
+    logs, foods = [], []
+    for user_id in range(1, users + 1):
+        for day in range(CONTEXT_DAYS):
+            for _ in range(per_day):
+                created_at = now - timedelta(days=day, seconds=rng.uniform(0, 86400))
+                logs.append({"user_id": user_id, "steps": rng.randint(0, 2000), "sleep_hours": rng.uniform(5, 9), "water_intake": rng.uniform(0.1, 0.5), "calories": rng.uniform(0, 200), "created_at": created_at})
+                foods.append({"user_id": user_id, "item_name": rng.choice(FOODS), "calories": rng.randint(50, 700), "confirmed": True, "created_at": created_at})
+    with engine.begin() as conn:
+        for table in (FoodEntry.__table__, Log.__table__, Goal.__table__, User.__table__):
+            conn.execute(table.delete())
+        conn.execute(User.__table__.insert(), [{"id": i, "name": f"user {i}", "email": f"user{i}@example.com", "password": "x"} for i in range(1, users + 1)])
+        conn.execute(Goal.__table__.insert(), [{"user_id": i, "goal_text": "Goal Type: lose_weight", "analysis_result": {"target_steps": 8000}, "target_steps": 8000} for i in range(1, users + 1)])
+        conn.execute(Log.__table__.insert(), logs)
+        conn.execute(FoodEntry.__table__.insert(), foods)
+        backfill_rollups(conn)
+    print(f"seeded {users} users with {len(logs)} logs and {len(foods)} food entries")
+
+
+def install(cache):
+    # The write paths and aget_user_context bind the singleton at import time
+    async_db_service.context_cache = user_context.context_cache = cache
+
+
+async def run(turns: int, users: int, write_every: int, profiles: dict):
+    rng = random.Random(4)
+    last = {}
+    reads, elapsed = 0, 0.0
+    for turn in range(turns):
+        user_id = rng.randint(1, users)
+        user = profiles[user_id] # get_current_user has already loaded it
+        async with AsyncSessionLocal() as db:
+            if write_every and turn % write_every == 0:
+                await async_db_service.add_log(db, user_id, 500, None, 0.25, 80.0)
+                await async_db_service.add_food_log(db, user_id, rng.choice(FOODS), 300, True)
+            before = queries
+            begin = time.perf_counter()
+            last[user_id] = await user_context.aget_user_context(db, user)
+            elapsed += time.perf_counter() - begin
+            reads += queries - before
+    return turns / elapsed, reads / turns, last
+
+
+async def main(turns: int, users: int, per_day: int, write_every: int):
+    migrate(engine)
+    seed(users, per_day)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_query)
+    async with AsyncSessionLocal() as db:
+        profiles = {user.id: user for user in (await db.execute(select(User))).scalars()}
+    print(f"{'':<8}{'turns/s':>10}{'reads/turn':>12}{'hit rate':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        caches = {"none": NoContextCache(), "memory": MemoryContextCache(), "sqlite": SQLiteContextCache(os.path.join(tmp, "context.sqlite"))}
+        for name, cache in caches.items():
+            install(cache)
+            throughput, reads, last = await run(turns, users, write_every, profiles)
+            # Patched entries must match what a fresh load returns now
+            install(NoContextCache())
+            async with AsyncSessionLocal() as db:
+                for user_id, context in last.items():
+                    fresh = await user_context.aget_user_context(db, profiles[user_id])
+                    assert json.dumps(fresh, sort_keys=True) == json.dumps(context, sort_keys=True), user_id
+            print(f"{name:<8}{throughput:>10.0f}{reads:>12.2f}{cache.stats()['hit_rate']:>10.2f}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--per-day", type=int, default=20, help="Seeded logs and food entries per user per day")
+    parser.add_argument("--write-every", type=int, default=5, help="Add a log and a food entry every N turns (0: never)")
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.users, args.per_day, args.write_every))
@@ -0,0 +1,126 @@
+"""Measures event-loop stalls while concurrent requests load the chat context, with sync vs async sessions.
+
+Each simulated request does what `get_current_user` + `get_user_context` do (user by id,
+latest goal, 30 days of rollups, top foods):
+  sync    db_service on a SessionLocal inside an `async def` (the old route code)
+  async   async_db_service on an AsyncSessionLocal
+A heartbeat task sleeps `--tick` ms in a loop; any extra delay before it wakes up is time
+the loop was blocked. Reports throughput, the worst and p99 heartbeat lag and the total
+stalled time.
+
+Uses its own SQLite file unless DATABASE_URL is set (ASYNC_DATABASE_URL is derived from it).
+Run from the project root:
+    python -m backend.benchmarks.event_loop_stall --requests 500 --concurrency 50
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./event_loop_stall_benchmark.sqlite")
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from backend.data.db import AsyncSessionLocal, SessionLocal, async_engine, engine
+from backend.data.migrations import migrate
+from backend.services import async_db_service, db_service
+from backend.services.rollups import aget_daily_rollups, backfill_rollups, get_daily_rollups
+from models.db_models import FoodEntry, Goal, Log, User
+
+USERS = 50
+FOODS = ["oatmeal", "banana", "chicken salad", "rice bowl", "greek yogurt", "apple", "protein bar", "pasta"]
+
+
+def seed(per_day: int):
+    with engine.connect() as conn:
+        if conn.execute(User.__table__.select().limit(1)).first():
+            return
+    rng = random.Random(20)
+    now = datetime.now()
+    logs, foods = [], []
+    for user_id in range(1, USERS + 1):
+        for day in range(30):
+            for _ in range(per_day):
+                created_at = now - timedelta(days=day, seconds=rng.uniform(0, 86400))
+                logs.append({"user_id": user_id, "steps": rng.randint(0, 2000), "sleep_hours": rng.uniform(5, 9), "water_intake": rng.uniform(0.1, 0.5), "calories": rng.uniform(0, 200), "created_at": created_at})
+                foods.append({"user_id": user_id, "item_name": rng.choice(FOODS), "calories": rng.randint(50, 700), "confirmed": True, "created_at": created_at})
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"id": i, "name": f"user {i}", "email": f"user{i}@example.com", "password": "x"} for i in range(1, USERS + 1)])
+        conn.execute(Goal.__table__.insert(), [{"user_id": i, "goal_text": "Goal Type: lose_weight", "analysis_result": {"target_steps": 8000}, "target_steps": 8000} for i in range(1, USERS + 1)])
+        conn.execute(Log.__table__.insert(), logs)
+        conn.execute(FoodEntry.__table__.insert(), foods)
+        backfill_rollups(conn)
+    print(f"seeded {USERS} users with {len(logs)} logs and {len(foods)} food entries")
+
+
+async def sync_context(user_id: int):
+    end = datetime.now()
+    start = end - timedelta(days=30)
+    db = SessionLocal()
+    try:
+        db_service.get_user_by_id(db, user_id)
+        db_service.get_goal_by_user_id(db, user_id)
+        get_daily_rollups(db, user_id, start.date(), end.date())
+        db_service.get_top_foods(db, user_id, start, end)
+    finally:
+        db.close()
+
+
+async def async_context(user_id: int):
+    end = datetime.now()
+    start = end - timedelta(days=30)
+    async with AsyncSessionLocal() as db:
+        await async_db_service.get_user_by_id(db, user_id)
+        await async_db_service.get_goal_by_user_id(db, user_id)
+        await aget_daily_rollups(db, user_id, start.date(), end.date())
+        await async_db_service.get_top_foods(db, user_id, start, end)
+
+
+async def heartbeat(tick: float, lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        begin = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append(max(0.0, time.perf_counter() - begin - tick))
+
+
+async def run(context, requests: int, concurrency: int, tick: float):
+    rng = random.Random(4)
+    user_ids = [rng.randint(1, USERS) for _ in range(requests)]
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(user_id: int):
+        async with limit:
+            await context(user_id)
+
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.create_task(heartbeat(tick, lags, stop))
+    await asyncio.sleep(tick * 2) # Let the heartbeat settle
+    begin = time.perf_counter()
+    await asyncio.gather(*(one(user_id) for user_id in user_ids))
+    elapsed = time.perf_counter() - begin
+    stop.set()
+    await beat
+    lags.sort()
+    return requests / elapsed, lags[-1] * 1000, lags[int(len(lags) * 0.99)] * 1000, sum(lags) * 1000
+
+
+async def main(requests: int, concurrency: int, per_day: int, tick_ms: float):
+    migrate(engine)
+    seed(per_day)
+    await async_context(1) # Warm up the async pool
+    print(f"{'':<8}{'req/s':>10}{'max lag ms':>12}{'p99 lag ms':>12}{'stalled ms':>12}")
+    for name, context in (("sync", sync_context), ("async", async_context)):
+        throughput, worst, p99, stalled = await run(context, requests, concurrency, tick_ms / 1000)
+        print(f"{name:<8}{throughput:>10.0f}{worst:>12.1f}{p99:>12.1f}{stalled:>12.0f}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--per-day", type=int, default=20, help="Logs and food entries per user per day")
+    parser.add_argument("--tick", type=float, default=5, help="Heartbeat interval in ms")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.per_day, args.tick))
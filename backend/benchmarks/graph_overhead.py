@@ -0,0 +1,51 @@
+"""Measures per-turn planner overhead spent outside the LLM call, before and after the graph registry.
+
+"before" repeats the work the planner used to do on every turn: compiling the Q&A graph,
+binding tools, rebuilding the tool prompt strings and scanning the tool list. "after"
+is the equivalent lookups against the precompiled registry. No LLM request is made.
+
+Run from the project root:
+    python -m backend.benchmarks.graph_overhead --iterations 200
+"""
+import argparse
+import time
+
+from backend.services.planner import all_tools, build_qa_app, graph_registry, llm
+
+
+def per_turn_before():
+    build_qa_app()
+    llm.bind_tools(all_tools)
+    [tool.name for tool in all_tools]
+    [f'{tool.name}: {tool.description}' for tool in all_tools]
+    for name in ("bmi_calculator", "bmr_calculator", "calorie_estimator"):
+        next((t for t in all_tools if t.name == name), None)
+
+
+def per_turn_after():
+    graph_registry.get("qa")
+    graph_registry.agent_llm
+    graph_registry.tool_names
+    graph_registry.tool_descriptions
+    for name in ("bmi_calculator", "bmr_calculator", "calorie_estimator"):
+        graph_registry.tools_by_name.get(name)
+
+
+def time_per_call(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    graph_registry.warmup()
+    before = time_per_call(per_turn_before, args.iterations)
+    after = time_per_call(per_turn_after, args.iterations)
+    print(f"before (per-turn compile/bind): {before:10.1f} us/turn")
+    print(f"after  (precompiled registry):  {after:10.1f} us/turn")
+    print(f"speedup: {before / after:.0f}x")
@@ -0,0 +1,95 @@
+"""Compares log write throughput and acknowledgement latency of per-request commits and the write-behind buffer.
+
+`--clients` concurrent clients each send `--writes` logs one after another, like phones
+posting to /log at peak:
+  direct    a session and add_log (one transaction) per write, what /log does by default
+  durable   WriteBuffer with durable acks: each write waits for its batch to commit
+  buffered  WriteBuffer with buffered acks: each write returns once buffered (flushed at the end)
+Every run checks that all entries and their rollups were stored.
+
+Uses its own SQLite file unless DATABASE_URL is set (ASYNC_DATABASE_URL is derived from it).
+Run from the project root:
+    python -m backend.benchmarks.group_commit --clients 16 --writes 20
+SQLite has a single writer lock, so many more direct clients mostly measure lock retries.
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./group_commit_benchmark.sqlite")
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import delete, func, select
+
+from backend.data.db import AsyncSessionLocal, async_engine, engine
+from backend.data.migrations import migrate
+from backend.services import async_db_service
+from backend.services.write_buffer import WriteBuffer
+from models.db_models import DailyRollup, Log, User
+
+
+async def reset(users: int):
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Log))
+        await db.execute(delete(DailyRollup))
+        for user_id in range(1, users + 1):
+            if await db.get(User, user_id) is None:
+                db.add(User(id=user_id, name=f"user {user_id}", email=f"user{user_id}@example.com", password="x"))
+        await db.commit()
+
+
+async def direct_write(user_id: int):
+    async with AsyncSessionLocal() as db:
+        await async_db_service.add_log(db, user_id, 100, 0.1, 0.2, 5.0)
+
+
+async def run(write, clients: int, writes: int):
+    latencies = []
+
+    async def client(user_id: int):
+        for _ in range(writes):
+            begin = time.perf_counter()
+            await write(user_id)
+            latencies.append(time.perf_counter() - begin)
+
+    await asyncio.gather(*(client(user_id) for user_id in range(1, clients + 1)))
+    return latencies
+
+
+async def stored() -> tuple:
+    async with AsyncSessionLocal() as db:
+        logs = (await db.execute(select(func.count(Log.id)))).scalar()
+        rolled = (await db.execute(select(func.sum(DailyRollup.log_count)))).scalar()
+    return logs, rolled
+
+
+async def main(clients: int, writes: int, interval_ms: float, max_rows: int):
+    migrate(engine)
+    print(f"{'':<10}{'writes/s':>10}{'p50 ack ms':>12}{'p99 ack ms':>12}{'avg batch':>11}")
+    for name in ("direct", "durable", "buffered"):
+        await reset(clients)
+        buffer = None if name == "direct" else WriteBuffer(interval_ms, max_rows, durable=name == "durable")
+        write = direct_write if buffer is None else lambda user_id: buffer.add_log(user_id, 100, 0.1, 0.2, 5.0)
+        begin = time.perf_counter()
+        latencies = await run(write, clients, writes)
+        if buffer is not None:
+            await buffer.close() # Counts the final flush, which buffered acks don't wait for
+        elapsed = time.perf_counter() - begin
+        logs, rolled = await stored()
+        assert logs == rolled == clients * writes, (logs, rolled)
+        latencies.sort()
+        batch = buffer.stats()["avg_batch"] if buffer else 1
+        print(f"{name:<10}{logs / elapsed:>10.0f}{statistics.median(latencies) * 1000:>12.2f}{latencies[int(len(latencies) * 0.99)] * 1000:>12.2f}{batch:>11}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=20, help="Sequential writes per client")
+    parser.add_argument("--interval-ms", type=float, default=20, help="Flush interval")
+    parser.add_argument("--max-rows", type=int, default=500, help="Flush once this many entries wait")
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.writes, args.interval_ms, args.max_rows))
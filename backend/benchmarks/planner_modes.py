@@ -0,0 +1,70 @@
+"""Compares LLM calls per turn and end-to-end latency of the fast and graph planner modes.
+
+Run from the project root (LLM_PROVIDER=fake or replay runs it offline):
+    python -m backend.benchmarks.planner_modes --turns 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from backend.services.planner import build_initial_state, get_planner_app, PLANNER_MODES
+
+SAMPLE_CONTEXT = {
+    "user_profile": {"name": "Bench User", "email": "bench@example.com"},
+    "goal": {"goal_text": "Goal Type: lose_weight, Target Weight: 70kg", "analysis_result": {"target_calories": 2000}},
+    "daily_rollups": [],
+    "recent_food_entries": [],
+}
+
+SAMPLE_PROMPTS = [
+    "What's my BMI if I weigh 82kg and I'm 1.78m tall?",
+    "Give me a simple dinner idea for my weight loss goal.",
+    "I'm 30, male, 82kg, 178cm and moderately active. How many calories should I eat to lose weight?",
+    "I want to be healthier.",
+]
+
+
+class LLMCallCounter(AsyncCallbackHandler):
+    """Counts chat model calls made during a graph run."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.calls += 1
+
+    async def on_llm_start(self, serialized, prompts, **kwargs):
+        self.calls += 1
+
+
+async def run_turn(mode: str, prompt: str):
+    counter = LLMCallCounter()
+    state = build_initial_state(prompt, user_context=SAMPLE_CONTEXT)
+    start = time.perf_counter()
+    await get_planner_app(mode).ainvoke(state, config={"callbacks": [counter]})
+    return counter.calls, time.perf_counter() - start
+
+
+async def main(modes, turns: int):
+    print(f"{'mode':<8}{'turns':>7}{'llm calls/turn':>16}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for mode in modes:
+        calls, latencies = [], []
+        for _ in range(turns):
+            for prompt in SAMPLE_PROMPTS:
+                n, elapsed = await run_turn(mode, prompt)
+                calls.append(n)
+                latencies.append(elapsed * 1000)
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{mode:<8}{len(latencies):>7}{statistics.mean(calls):>16.2f}{statistics.median(latencies):>10.1f}{p95:>10.1f}{statistics.mean(latencies):>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=3, help="Passes over the sample prompts per mode")
+    parser.add_argument("--modes", nargs="+", default=list(PLANNER_MODES), choices=list(PLANNER_MODES))
+    args = parser.parse_args()
+    asyncio.run(main(args.modes, args.turns))
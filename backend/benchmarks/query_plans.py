@@ -0,0 +1,134 @@
+"""Shows query plans and timings of the hot per-user queries before and after the (user_id, time) indexes.
+
+Seeds a fresh database at schema version 1 (no composite indexes) with `--rows` logs and
+as many food entries spread over `--users` users and a year of timestamps, runs the
+queries behind the summary, chat context and goal routes, then applies the remaining
+migrations and runs them again.
+
+Uses its own SQLite file unless DATABASE_URL is set; point it at an empty database.
+Run from the project root:
+    python -m backend.benchmarks.query_plans --rows 2000000 --users 1000
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./query_plans_benchmark.sqlite")
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from backend.data.db import SessionLocal, engine
+from backend.data.migrations import migrate
+from backend.services import db_service
+from models.db_models import FoodEntry, Goal, Log, User
+
+BATCH_ROWS = 50000
+
+
+def seed(rows: int, users: int):
+    rng = random.Random(17)
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"id": i, "name": f"user {i}", "email": f"user{i}@example.com", "password": "x"} for i in range(1, users + 1)])
+        conn.execute(Goal.__table__.insert(), [
+            {"user_id": rng.randint(1, users), "goal_text": "Goal Type: lose_weight", "created_at": now - timedelta(days=rng.uniform(0, 365))}
+            for _ in range(users * 3)
+        ])
+    for table, row in (
+        (Log.__table__, lambda: {"steps": rng.randint(0, 20000), "sleep_hours": rng.uniform(4, 10), "water_intake": rng.uniform(0.5, 4), "calories": rng.uniform(0, 800)}),
+        (FoodEntry.__table__, lambda: {"item_name": "meal", "calories": rng.randint(50, 900), "confirmed": True}),
+    ):
+        for start in range(0, rows, BATCH_ROWS):
+            batch = [
+                {"user_id": rng.randint(1, users), "created_at": now - timedelta(seconds=rng.uniform(0, 365 * 86400)), **row()}
+                for _ in range(min(BATCH_ROWS, rows - start))
+            ]
+            with engine.begin() as conn:
+                conn.execute(table.insert(), batch)
+        print(f"seeded {rows} rows into {table.name}")
+
+
+def hot_queries(user_id: int):
+    end = datetime.now()
+    start = end - timedelta(days=30)
+    return {
+        "logs, 30 days": lambda db: db_service.get_logs_by_date_range(db, user_id, start, end),
+        "food, 30 days": lambda db: db_service.get_food_entries_by_date_range(db, user_id, start, end),
+        "latest goal": lambda db: db_service.get_goal_by_user_id(db, user_id),
+    }
+
+
+def explain_statements(user_id: int):
+    end = datetime.now()
+    start = end - timedelta(days=30)
+    params = {"user_id": user_id, "start": start, "end": end}
+    return {
+        "logs, 30 days": ("SELECT * FROM logs WHERE user_id = :user_id AND created_at >= :start AND created_at <= :end", params),
+        "food, 30 days": ("SELECT * FROM food_entries WHERE user_id = :user_id AND created_at >= :start AND created_at <= :end", params),
+        "latest goal": ("SELECT * FROM goals WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 1", params),
+    }
+
+
+def explain(sql: str, params: dict) -> str:
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        rows = conn.execute(text(prefix + sql), params).fetchall()
+    # SQLite: (id, parent, notused, detail); MySQL: key columns of each row
+    if engine.dialect.name == "sqlite":
+        return "; ".join(row[-1] for row in rows)
+    return "; ".join(f"table={row._mapping.get('table')} type={row._mapping.get('type')} key={row._mapping.get('key')} rows={row._mapping.get('rows')} extra={row._mapping.get('Extra')}" for row in rows)
+
+
+def measure(label: str, users: int, samples: int):
+    rng = random.Random(3)
+    user_ids = [rng.randint(1, users) for _ in range(samples)]
+    print(f"\n== {label} ==")
+    with engine.begin() as conn:
+        # Fresh statistics so the planner sees the table sizes and new indexes
+        conn.execute(text("ANALYZE" if engine.dialect.name == "sqlite" else "ANALYZE TABLE logs, food_entries, goals"))
+    for name, (sql, params) in explain_statements(user_ids[0]).items():
+        print(f"{name:<15} plan: {explain(sql, params)}")
+    print(f"{'':<15}{'p50 ms':>10}{'p95 ms':>10}")
+    db = SessionLocal()
+    try:
+        for name in hot_queries(0):
+            timings = []
+            for user_id in user_ids:
+                query = hot_queries(user_id)[name]
+                begin = time.perf_counter()
+                query(db)
+                timings.append((time.perf_counter() - begin) * 1000)
+                db.expunge_all()
+            timings.sort()
+            print(f"{name:<15}{statistics.median(timings):>10.2f}{timings[int(len(timings) * 0.95)]:>10.2f}")
+    finally:
+        db.close()
+
+
+def main(rows: int, users: int, samples: int):
+    migrate(engine, target=1)
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT COUNT(*) FROM logs")).scalar():
+            raise SystemExit("The benchmark database is not empty; remove it or set DATABASE_URL to an empty database.")
+    start = time.perf_counter()
+    seed(rows, users)
+    print(f"seeding took {time.perf_counter() - start:.1f}s")
+
+    measure("version 1: id indexes only", users, samples)
+    start = time.perf_counter()
+    migrate(engine)
+    print(f"\nmigrations took {time.perf_counter() - start:.1f}s")
+    measure("latest: (user_id, time) indexes", users, samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000, help="Logs and food entries to seed (each)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=50, help="Users queried per measurement")
+    args = parser.parse_args()
+    main(args.rows, args.users, args.samples)
@@ -0,0 +1,122 @@
+"""Compares memory and latency of the 30-day context reads: ORM entities, projected rows, SQL aggregates and rollups.
+
+Seeds one heavily logging user (`--per-day` logs and food entries a day for 30 days) and
+builds the per-day totals and top foods the chat context needs in four ways:
+  entities    get_logs/food_entries_by_date_range + to_dict() + Python rollup (the old path)
+  projected   get_log_rows/get_food_rows tuples + Python rollup
+  aggregates  get_daily_log_totals/get_daily_food_totals + get_top_foods, grouped in SQL
+  rollups     get_daily_rollups + get_top_foods (what get_user_context reads now)
+Peak memory is measured with tracemalloc on a fresh session per run.
+
+Uses its own SQLite file unless DATABASE_URL is set. Run from the project root:
+    python -m backend.benchmarks.read_models --per-day 200
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./read_models_benchmark.sqlite")
+
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from backend.data.db import SessionLocal, engine
+from backend.data.migrations import migrate
+from backend.services import db_service
+from backend.services.context_compactor import daily_rollups, top_foods
+from backend.services.rollups import backfill_rollups, get_daily_rollups
+from models.db_models import FoodEntry, Log, User
+
+USER_ID = 1
+FOODS = ["oatmeal", "banana", "chicken salad", "rice bowl", "greek yogurt", "apple", "protein bar", "pasta", "coffee", "almonds"]
+
+
+def seed(per_day: int):
+    db = SessionLocal()
+    try:
+        if db.query(User).filter(User.id == USER_ID).first():
+            return
+        db.add(User(id=USER_ID, name="Heavy Logger", email="heavy@example.com", password="x"))
+        db.commit()
+    finally:
+        db.close()
+    rng = random.Random(5)
+    now = datetime.now()
+    logs, foods = [], []
+    for day in range(30):
+        for _ in range(per_day):
+            created_at = now - timedelta(days=day, seconds=rng.uniform(0, 86400))
+            logs.append({"user_id": USER_ID, "steps": rng.randint(0, 2000), "sleep_hours": rng.uniform(5, 9), "water_intake": rng.uniform(0.1, 0.5), "calories": rng.uniform(0, 200), "created_at": created_at})
+            foods.append({"user_id": USER_ID, "item_name": rng.choice(FOODS), "calories": rng.randint(50, 700), "confirmed": True, "created_at": created_at})
+    with engine.begin() as conn:
+        conn.execute(Log.__table__.insert(), logs)
+        conn.execute(FoodEntry.__table__.insert(), foods)
+        backfill_rollups(conn, USER_ID)
+    print(f"seeded {len(logs)} logs and {len(foods)} food entries")
+
+
+def entities(db, start, end):
+    logs = [log.to_dict() for log in db_service.get_logs_by_date_range(db, USER_ID, start, end)]
+    foods = [food.to_dict() for food in db_service.get_food_entries_by_date_range(db, USER_ID, start, end)]
+    return daily_rollups(logs, foods), top_foods(foods)
+
+
+def projected(db, start, end):
+    logs = [row._mapping for row in db_service.get_log_rows(db, USER_ID, start, end)]
+    foods = [row._mapping for row in db_service.get_food_rows(db, USER_ID, start, end)]
+    return daily_rollups(logs, foods), top_foods(foods)
+
+
+def aggregates(db, start, end):
+    return (
+        db_service.get_daily_log_totals(db, USER_ID, start, end),
+        db_service.get_daily_food_totals(db, USER_ID, start, end),
+        db_service.get_top_foods(db, USER_ID, start, end),
+    )
+
+
+def rollups(db, start, end):
+    return [rollup.to_dict() for rollup in get_daily_rollups(db, USER_ID, start.date(), end.date())], db_service.get_top_foods(db, USER_ID, start, end)
+
+
+def measure(fn, iterations: int):
+    end = datetime.now()
+    start = end - timedelta(days=30)
+    timings, peaks = [], []
+    for _ in range(iterations):
+        db = SessionLocal()
+        try:
+            begin = time.perf_counter()
+            fn(db, start, end)
+            timings.append((time.perf_counter() - begin) * 1000)
+        finally:
+            db.close()
+    # Memory on a separate run; tracemalloc slows allocation-heavy paths down
+    db = SessionLocal()
+    try:
+        tracemalloc.start()
+        fn(db, start, end)
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    finally:
+        db.close()
+    return statistics.median(timings), max(timings), max(peaks)
+
+
+def main(per_day: int, iterations: int):
+    migrate(engine)
+    seed(per_day)
+    print(f"{'':<12}{'p50 ms':>10}{'max ms':>10}{'peak KiB':>10}")
+    for name, fn in (("entities", entities), ("projected", projected), ("aggregates", aggregates), ("rollups", rollups)):
+        p50, worst, peak = measure(fn, iterations)
+        print(f"{name:<12}{p50:>10.2f}{worst:>10.2f}{peak:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--per-day", type=int, default=200, help="Logs and food entries per day")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+    main(args.per_day, args.iterations)
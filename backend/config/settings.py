@@ -5,4 +5,81 @@ load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
\ No newline at end of file
+ALGORITHM = os.getenv("ALGORITHM")
+
+# Planner mode: "fast" makes one tool-bound LLM call per turn, "graph" runs the
+# multi-node goal analysis -> planning -> agent workflow.
+PLANNER_MODE = os.getenv("PLANNER_MODE", "fast")
+
+# LLM response cache: "memory" (in-process LRU), "sqlite" (on disk at LLM_CACHE_PATH) or "none".
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite")
+
+# Approximate token budget for the compacted user context placed in planner prompts.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+
+# Chat history: recent turns kept verbatim, token ceiling for history per request,
+# and the length of the running summary older turns are folded into.
+HISTORY_WINDOW_TURNS = int(os.getenv("HISTORY_WINDOW_TURNS", "6"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_SUMMARY_WORDS = int(os.getenv("HISTORY_SUMMARY_WORDS", "150"))
+
+# Tool execution: default per-tool timeout (tools may set `timeout_seconds`) and the
+# size of the thread pool used for tools without a native async implementation.
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "10"))
+TOOL_EXECUTOR_WORKERS = int(os.getenv("TOOL_EXECUTOR_WORKERS", "8"))
+
+# LLM admission scheduler: concurrent upstream calls, queue depth at which requests are
+# shed with 503 + Retry-After, and token-bucket pacing (LLM_REQUESTS_PER_SECOND=0 disables it).
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE_DEPTH = int(os.getenv("LLM_MAX_QUEUE_DEPTH", "32"))
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "10"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+
+# LLM provider: "gemini", "fake" (deterministic offline model, LLM_FAKE_LATENCY_MS per call),
+# "record" (Gemini, saving every response to LLM_CASSETTE_PATH) or "replay" (answers from the cassette).
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "50"))
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "llm_cassette.jsonl")
+
+# Add a Server-Timing header (per-node, per-tool and LLM durations) to /chat responses and a
+# last `server_timing` event with the same value to /chat/stream responses.
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+# Goal analysis results memoized per normalized (bucketed) GoalSet profile.
+GOAL_ANALYSIS_CACHE_SIZE = int(os.getenv("GOAL_ANALYSIS_CACHE_SIZE", "2048"))
+
+# /calc/batch: most profiles accepted in one JSON body, and rows per vectorized chunk for NDJSON streams.
+CALC_BATCH_MAX_ROWS = int(os.getenv("CALC_BATCH_MAX_ROWS", "100000"))
+CALC_BATCH_CHUNK_ROWS = int(os.getenv("CALC_BATCH_CHUNK_ROWS", "5000"))
+
+# Database connection pools (one per engine, sync and async): persistent connections,
+# extra connections allowed under burst, seconds to wait for a free connection, seconds
+# before a connection is recycled, and whether to ping connections on checkout.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# /health/ready reports not ready once this share of a pool's connections is checked out.
+DB_POOL_READY_SATURATION = float(os.getenv("DB_POOL_READY_SATURATION", "0.9"))
+
+# /log/bulk and /log/food/bulk: most entries accepted per request (JSON array or NDJSON stream).
+LOG_BULK_MAX_ROWS = int(os.getenv("LOG_BULK_MAX_ROWS", "20000"))
+
+# Write-behind group commit for /log and /log/food: buffer entries and write them as one
+# transaction every LOG_FLUSH_INTERVAL_MS or LOG_FLUSH_MAX_ROWS entries. LOG_WRITE_ACK is
+# "durable" (respond after the batch commits) or "buffered" (respond once buffered).
+LOG_WRITE_BEHIND = os.getenv("LOG_WRITE_BEHIND", "false").lower() == "true"
+LOG_FLUSH_INTERVAL_MS = float(os.getenv("LOG_FLUSH_INTERVAL_MS", "20"))
+LOG_FLUSH_MAX_ROWS = int(os.getenv("LOG_FLUSH_MAX_ROWS", "500"))
+LOG_WRITE_ACK = os.getenv("LOG_WRITE_ACK", "durable")
+
+# Per-user chat context cache, kept current by log/food/goal writes: "memory" (in-process LRU),
+# "sqlite" (at CONTEXT_CACHE_PATH, shared by workers on the same disk) or "none".
+CONTEXT_CACHE_BACKEND = os.getenv("CONTEXT_CACHE_BACKEND", "memory")
+CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "10000"))
+CONTEXT_CACHE_TTL_SECONDS = float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "600"))
+CONTEXT_CACHE_PATH = os.getenv("CONTEXT_CACHE_PATH", ".context_cache.sqlite")
@@ -1,8 +1,15 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 import os
+import time
+
+from backend.config.settings import DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_POOL_SIZE, DB_POOL_TIMEOUT
+from backend.services.metrics import DB_CHECKOUT_SECONDS
 
 load_dotenv()
 
@@ -11,13 +18,77 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL is None:
     raise ValueError("DATABASE_URL environment variable not set.")
 
-engine = create_engine(DATABASE_URL)
+# Async drivers for the async engine, by backend
+ASYNC_DRIVERS = {"mysql": "aiomysql", "sqlite": "aiosqlite"}
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its driver swapped for the async one (mysql -> aiomysql, sqlite -> aiosqlite)."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver for {parsed.get_backend_name()}; set ASYNC_DATABASE_URL.")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+def timed_pool(pool_class, name: str):
+    """`pool_class` recording how long each checkout waits (including connecting) as db_pool_checkout_seconds."""
+    class TimedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                DB_CHECKOUT_SECONDS.observe(time.perf_counter() - start, pool=name)
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+def pool_options(url: str, pool_class, name: str) -> dict:
+    """Pool settings from DB_POOL_*; in-memory SQLite keeps its default single-connection pool."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": timed_pool(pool_class, name),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL, QueuePool, "sync"))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async routes use this engine so database round trips don't block the event loop.
+# expire_on_commit=False: attributes stay loaded after commit (lazy loads can't run implicitly under asyncio).
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, "async"))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """One session per request: FastAPI caches this dependency, so get_current_user and the route share it."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_stats() -> dict:
+    """Checked-out, idle and overflow connections and saturation (checked out / capacity) of each pool."""
+    stats = {"size": {}, "in_use": {}, "idle": {}, "overflow": {}, "saturation": {}}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        if not isinstance(pool, QueuePool):
+            continue
+        in_use = pool.checkedout()
+        capacity = pool.size() + DB_MAX_OVERFLOW if DB_MAX_OVERFLOW >= 0 else None # -1: unlimited overflow
+        stats["size"][name] = pool.size()
+        stats["in_use"][name] = in_use
+        stats["idle"][name] = pool.checkedin()
+        stats["overflow"][name] = max(0, pool.overflow()) # Negative while the pool isn't full yet
+        stats["saturation"][name] = round(in_use / capacity, 3) if capacity else 0.0
+    return stats
@@ -1,5 +1,6 @@
 # backend/data/init_db.py
 
+import argparse
 import sys
 import os
 
@@ -8,15 +9,25 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..
 sys.path.insert(0, project_root)
 
 from backend.data.db import engine
-from models.db_models import Base
+from backend.data.migrations import MIGRATIONS, applied_versions, migrate
 
-def init_tables():
-    # print("Attempting to drop existing database tables...")
-    # Base.metadata.drop_all(bind=engine)
-    # print("Existing database tables dropped.")
-    print("Attempting to create new database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("Database tables creation attempt complete.")
+def run_migrations():
+    """Brings the database schema up to date; replaces the old create_all-based init_tables()."""
+    applied = migrate(engine)
+    print(f"Database schema up to date (applied: {applied or 'none'}).")
+
+def print_status():
+    with engine.connect() as conn:
+        applied = set(applied_versions(conn))
+    for m in MIGRATIONS:
+        print(f"{m.version:>4}  {'applied' if m.version in applied else 'pending':<8} {m.name}")
 
 if __name__ == "__main__":
-    init_tables()
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument("--status", action="store_true", help="List migrations and whether they are applied")
+    parser.add_argument("--target", type=int, help="Stop after this version")
+    args = parser.parse_args()
+    if args.status:
+        print_status()
+    else:
+        print(f"Applied: {migrate(engine, args.target) or 'none'}")
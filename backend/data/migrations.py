@@ -0,0 +1,174 @@
+"""Versioned schema migrations.
+
+Each migration is a function of a SQLAlchemy Connection registered with `@migration(version)`.
+Applied versions are recorded in `schema_migrations`. Rules for adding one:
+
+- Change the model in models/db_models.py *and* add a migration with the next version
+  that brings an existing database to the same shape. A fresh database is created
+  straight from the models and stamped with every version, so the two must agree.
+- Migrations check before they change anything (see `create_index`), since version 1
+  creates any missing table from the current models.
+- Never edit or renumber a migration that has shipped.
+"""
+import json
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import JSON, Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from models.db_models import GOAL_TARGETS, Base, analysis_targets
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def migration(version: int):
+    def register(fn: Callable[[Connection], None]):
+        MIGRATIONS.append(Migration(version, fn.__name__, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+    return register
+
+
+def create_index(conn: Connection, table: str, name: str):
+    """Creates the model-declared index `name` on `table` unless it already exists."""
+    if name not in {index["name"] for index in inspect(conn).get_indexes(table)}:
+        next(index for index in Base.metadata.tables[table].indexes if index.name == name).create(conn)
+
+
+def add_column(conn: Connection, table: str, name: str):
+    """Adds the model-declared column `name` to `table` (nullable, no default) unless it already exists."""
+    if name not in {column["name"] for column in inspect(conn).get_columns(table)}:
+        column_type = Base.metadata.tables[table].c[name].type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"))
+
+
+# --- Migrations --- #
+USER_TIME_INDEXES = [ # table -> time column indexed together with user_id
+    ("logs", "created_at"),
+    ("food_entries", "created_at"),
+    ("goals", "created_at"),
+    ("weight_logs", "timestamp"),
+    ("activity_logs", "date"),
+    ("ocr_logs", "timestamp"),
+    ("bmi_data", "calculated_at"),
+    ("bmr_data", "calculated_at"),
+]
+LATER_TABLES = {"daily_rollups"} # Created by their own migrations
+
+
+@migration(1)
+def initial_schema(conn: Connection):
+    """The tables as `init_tables()` created them before migrations existed (no composite indexes)."""
+    later = {f"ix_{table}_user_id_{column}" for table, column in USER_TIME_INDEXES}
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        if table.name in LATER_TABLES:
+            continue
+        copy = table.to_metadata(metadata)
+        for index in [index for index in copy.indexes if index.name in later]:
+            copy.indexes.discard(index)
+    metadata.create_all(conn, checkfirst=True)
+
+
+@migration(2)
+def user_time_range_indexes(conn: Connection):
+    """(user_id, time) indexes for the per-user date-range and latest-row queries."""
+    for table, column in USER_TIME_INDEXES:
+        create_index(conn, table, f"ix_{table}_user_id_{column}")
+
+
+@migration(3)
+def daily_rollups(conn: Connection):
+    """Per-user daily totals table, filled from the existing entries."""
+    from backend.services.rollups import backfill_rollups
+    Base.metadata.tables["daily_rollups"].create(conn, checkfirst=True)
+    print(f"Backfilled {backfill_rollups(conn)} daily rollups.")
+
+
+def _parse_analysis(raw):
+    # Written with json.dumps into a VARCHAR; None, "null" and unparsable text all become NULL
+    if not isinstance(raw, str):
+        return raw
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+@migration(4)
+def goal_analysis_json(conn: Connection):
+    """goals.analysis_result as a JSON column, with the daily targets promoted to their own columns."""
+    for name in GOAL_TARGETS:
+        add_column(conn, "goals", name)
+    rows = conn.execute(text("SELECT id, analysis_result FROM goals WHERE analysis_result IS NOT NULL")).fetchall()
+    updates = []
+    for goal_id, raw in rows:
+        analysis = _parse_analysis(raw)
+        updates.append({"id": goal_id, "analysis_result": json.dumps(analysis) if analysis is not None else None, **analysis_targets(analysis)})
+    if updates:
+        assignments = ", ".join(f"{name} = :{name}" for name in ["analysis_result", *GOAL_TARGETS])
+        conn.execute(text(f"UPDATE goals SET {assignments} WHERE id = :id"), updates)
+    print(f"Converted {len(updates)} goal analyses.")
+
+    current = next(column["type"] for column in inspect(conn).get_columns("goals") if column["name"] == "analysis_result")
+    if isinstance(current, JSON):
+        return
+    if conn.dialect.name == "mysql":
+        conn.execute(text("ALTER TABLE goals MODIFY analysis_result JSON NULL"))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("ALTER TABLE goals ALTER COLUMN analysis_result TYPE JSON USING analysis_result::json"))
+    # SQLite keeps JSON as text, which the column type now parses on load
+
+
+# --- Runner --- #
+def _stamp(conn: Connection, m: Migration):
+    conn.execute(schema_migrations.insert().values(version=m.version, name=m.name, applied_at=datetime.utcnow()))
+
+
+def applied_versions(conn: Connection) -> List[int]:
+    if not inspect(conn).has_table(schema_migrations.name):
+        return []
+    return list(conn.execute(select(schema_migrations.c.version).order_by(schema_migrations.c.version)).scalars())
+
+
+def migrate(engine: Engine, target: Optional[int] = None) -> List[int]:
+    """Applies pending migrations up to `target` (default: all), each in its own transaction; returns the versions applied."""
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        applied = set(applied_versions(conn))
+        if not applied:
+            existing = set(inspect(conn).get_table_names())
+            if target is None and not existing & set(Base.metadata.tables):
+                # Fresh database: the models already describe the latest schema
+                Base.metadata.create_all(conn)
+                for m in MIGRATIONS:
+                    _stamp(conn, m)
+                print(f"Created schema at version {MIGRATIONS[-1].version}.")
+                return [m.version for m in MIGRATIONS]
+
+    done = []
+    for m in MIGRATIONS:
+        if m.version in applied or (target is not None and m.version > target):
+            continue
+        print(f"Applying migration {m.version}: {m.name}")
+        with engine.begin() as conn:
+            m.apply(conn)
+            _stamp(conn, m)
+        done.append(m.version)
+    return done
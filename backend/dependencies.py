@@ -2,25 +2,17 @@ from typing import Optional
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.schemas import TokenData
 
 from backend.config.settings import SECRET_KEY, ALGORITHM
-from backend.services import db_service
-from backend.services.db_service import get_user_by_id
-from backend.data.db import SessionLocal
+from backend.services import async_db_service
+from backend.data.db import get_async_db
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/token")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     print("🟡 Received Token:", token)  
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -39,7 +31,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         print("❌ JWTError:", str(e))
         raise credentials_exception
     print("🔍 Looking for user ID:", token_data.user_id)
-    user = get_user_by_id(db, user_id=token_data.user_id)
+    user = await async_db_service.get_user_by_id(db, user_id=token_data.user_id)
     print("🔎 User returned:", user)
     if user is None:
         print("❌ User not found in DB.")
@@ -1,13 +1,26 @@
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
 from backend.routes import chat, auth
-from backend.routes import goal, log, ocr, summary
-from backend.data.db import Base, engine
-from backend.data.init_db import init_tables
+from backend.routes import goal, log, ocr, summary, calc
+from backend.data.db import Base, async_engine, engine, pool_stats
+from backend.data.init_db import run_migrations
 from fastapi.middleware.cors import CORSMiddleware
 from backend.middleware.goal_middleware import GoalContextMiddleware
+from backend.services.planner import graph_registry
+from backend.services.llm_scheduler import LLMOverloaded
+from backend.services.client import get_llm_cache_stats, get_llm_coalescing_stats, get_llm_scheduler_stats
+from backend.services.prerouter import prerouter
+from backend.services.goal_analysis import goal_analyzer, resubmit_pending_analyses
+from backend.services.metrics import metrics
+from backend.services.write_buffer import log_writer
+from backend.services.context_cache import context_cache
+from backend.config.settings import DB_POOL_READY_SATURATION, DB_POOL_TIMEOUT
 
-# Create database tables
-init_tables()
+# Create or migrate database tables
+run_migrations()
 
 app = FastAPI(
     title="AI Health Assistant Backend",
@@ -32,6 +45,47 @@ app.include_router(goal.router, prefix="/api/v1")
 app.include_router(log.router, prefix="/api/v1")
 app.include_router(ocr.router, prefix="/api/v1")
 app.include_router(summary.router, prefix="/api/v1")
+app.include_router(calc.router, prefix="/api/v1")
+
+
+metrics.register_collector("llm_cache", get_llm_cache_stats)
+metrics.register_collector("llm_coalescing", get_llm_coalescing_stats)
+metrics.register_collector("llm_scheduler", get_llm_scheduler_stats)
+metrics.register_collector("prerouter", prerouter.stats)
+metrics.register_collector("goal_analysis", goal_analyzer.stats)
+metrics.register_collector("db_pool", pool_stats)
+metrics.register_collector("log_write_buffer", log_writer.stats)
+metrics.register_collector("context_cache", context_cache.stats)
+
+
+@app.on_event("startup")
+async def warmup_graphs():
+    """Compiles every planner workflow before the first request."""
+    print(f"Compiled graphs: {graph_registry.warmup()}")
+
+
+@app.on_event("startup")
+async def resume_goal_analyses():
+    """Restarts the analysis of goals left without one by a restart or a failed job."""
+    print(f"Resubmitted goal analyses: {await resubmit_pending_analyses()}")
+
+
+@app.on_event("shutdown")
+async def flush_log_writes():
+    """Writes log entries still waiting in the write-behind buffer."""
+    await log_writer.close()
+
+
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloaded):
+    """Sheds load with 503 while the LLM queue is full."""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
+
+
+@app.get("/metrics", tags=["System"], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Node, tool and LLM timings, token counts and LLM queue gauges in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/health", tags=["System"])
@@ -39,6 +93,27 @@ async def health_check():
     """Simple health check endpoint."""
     return {"status": "healthy", "message": "AI Health Assistant is running."}
 
+
+async def ping_database():
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+@app.get("/health/ready", tags=["System"])
+async def readiness_check():
+    """Ready (200) while every connection pool has headroom and the database answers; 503 otherwise."""
+    pools = pool_stats()
+    saturated = [name for name, saturation in pools["saturation"].items() if saturation >= DB_POOL_READY_SATURATION]
+    status = {"status": "ready", "pools": pools}
+    if saturated:
+        status.update(status="saturated", saturated_pools=saturated)
+    else:
+        try:
+            await asyncio.wait_for(ping_database(), DB_POOL_TIMEOUT)
+        except Exception as e:
+            status.update(status="unavailable", error=str(e) or type(e).__name__)
+    return JSONResponse(status_code=200 if status["status"] == "ready" else 503, content=status)
+
 if __name__ == "__main__":
     # This is for local development running directly with `python main.py`
     # Ensure GEMINI_API_KEY is available in your environment or .env file
@@ -0,0 +1,75 @@
+import asyncio
+import json
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from backend.config.settings import CALC_BATCH_MAX_ROWS, CALC_BATCH_CHUNK_ROWS
+from backend.dependencies import get_current_user
+from backend.services.batch_calc import compute_profiles
+from models.db_models import User
+
+router = APIRouter()
+
+NDJSON = "application/x-ndjson"
+
+async def ndjson_lines(request: Request):
+    """Yields the non-empty lines of a streamed request body as they arrive."""
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+def _parse_profile(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None # Reported as a row with missing fields
+
+async def _render_chunk(profiles: List) -> bytes:
+    # The vectorized pass is CPU-bound, so it runs off the event loop
+    results = await asyncio.to_thread(compute_profiles, profiles)
+    return "".join(json.dumps(row) + "\n" for row in results).encode("utf-8")
+
+async def _ndjson_results(request: Request):
+    chunk = []
+    async for line in ndjson_lines(request):
+        chunk.append(_parse_profile(line))
+        if len(chunk) >= CALC_BATCH_CHUNK_ROWS:
+            yield await _render_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield await _render_chunk(chunk)
+
+@router.post("/calc/batch", tags=["Calculators"])
+async def calc_batch(request: Request, current_user: User = Depends(get_current_user)):
+    """BMI, BMI category, BMR and maintenance/deficit/surplus calories for many profiles at once.
+
+    Send `{"profiles": [...]}` (or a bare array) as JSON, or one profile per line with
+    `Content-Type: application/x-ndjson` to get results streamed back one line per profile.
+    Each profile has weight_kg, height_cm, age_years, gender, activity_level and an optional id.
+    activity_level takes the calorie_estimator tool's values (sedentary, light, moderate, active,
+    very_active), not the set-goal form's, so results match the scalar tools.
+    """
+    if request.headers.get("content-type", "").startswith(NDJSON):
+        return StreamingResponse(_ndjson_results(request), media_type=NDJSON)
+
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be JSON or NDJSON.")
+    profiles = body.get("profiles") if isinstance(body, dict) else body
+    if not isinstance(profiles, list):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Expected a list of profiles.")
+    if len(profiles) > CALC_BATCH_MAX_ROWS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"At most {CALC_BATCH_MAX_ROWS} profiles per request; stream larger batches as NDJSON.")
+
+    results = await asyncio.to_thread(compute_profiles, profiles)
+    # Returned as a Response so FastAPI does not re-encode every row
+    return JSONResponse({"count": len(results), "results": results})
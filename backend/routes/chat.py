@@ -1,10 +1,7 @@
-import asyncio
+import json
+import time
 
-from fastapi import APIRouter, HTTPException, Depends ,Request
-from pydantic import BaseModel
-import asyncio
-
-from fastapi import APIRouter, HTTPException, Depends ,Request
+from fastapi import APIRouter, HTTPException, Depends ,Request, Response
 from pydantic import BaseModel
 from typing import List, Tuple, Optional
 from fastapi.responses import StreamingResponse
@@ -14,14 +11,19 @@ def contains_health_keywords(message: str) -> bool:
     message_lower = message.lower()
     return any(keyword in message_lower for keyword in health_keywords)
 
-from backend.services.planner import run_assistant, AgentState, run_qa_assistant # Assuming run_assistant can be adapted for streaming
+from backend.services.planner import arun_assistant, AgentState, arun_qa_assistant, astream_assistant, astream_qa_assistant
 from langchain_core.messages import HumanMessage, AIMessage
-from ..services import db_service
-from sqlalchemy.orm import Session
-from backend.data.db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.data.db import get_async_db
 from backend.dependencies import get_current_user
+from backend.services.chat_history import history_manager, PreparedHistory
+from backend.services.client import get_llm_cache_stats, get_llm_coalescing_stats, get_llm_scheduler_stats
+from backend.services.llm_scheduler import llm_scheduler, llm_priority, Priority, LLMOverloaded
+from backend.services.prerouter import prerouter
+from backend.services.user_context import aget_user_context
+from backend.services.metrics import RequestMetrics, current_request
+from backend.config.settings import SERVER_TIMING_ENABLED
 from models.db_models import User
-from datetime import datetime, timedelta
 
 router = APIRouter()
 
@@ -30,6 +32,7 @@ class ChatMessageInput(BaseModel):
     session_id: Optional[str] = "default_session" # Simple session management
     # In a real app, chat_history might be managed server-side per session_id
     chat_history: Optional[List[Tuple[str, str]]] = [] # (Human, AI) tuples
+    include_tool_events: bool = False # /chat/stream only: emit tool_start/tool_end SSE events
 
 class ChatMessageOutput(BaseModel):
     response: str
@@ -40,70 +43,76 @@ class ChatMessageOutput(BaseModel):
 # WARNING: This is not suitable for production. Use a proper database or cache.
 chat_histories = {}
 
-async def get_user_context(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    user_id = current_user.id
-    user_profile = db_service.get_user_profile(db, user_id)
-    current_goal = db_service.get_goal_by_user_id(db, user_id)
-    
-    # Get recent logs and food entries for the last 30 days
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
-
-    recent_logs = db_service.get_logs_by_date_range(db, user_id, start_date, end_date)
-    recent_food_entries = db_service.get_food_entries_by_date_range(db, user_id, start_date, end_date)
-
-    return {
-        "user_profile": user_profile.to_dict() if user_profile else None,
-        "goal": current_goal.to_dict() if current_goal else None,
-        "recent_logs": [log.to_dict() for log in recent_logs if log is not None],
-        "recent_food_entries": [food.to_dict() for food in recent_food_entries if food is not None],
-    }
+async def get_user_context(db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    return await aget_user_context(db, current_user)
 
 
+def gated_reply(user_input: str, current_user: Optional[User], user_context: Optional[dict]) -> Optional[str]:
+    """The fixed reply to a health question asked without a login or a goal; None when the turn goes to an assistant."""
+    if (user_context and user_context["goal"]) or not contains_health_keywords(user_input):
+        return None
+    if not current_user:
+        return "To get personalized health advice, please login and set a goal using the 'Set Goal' button."
+    return "Welcome! It looks like you haven't set a health goal yet. Please set one to get personalized advice."
 
-async def stream_response_generator(user_input: str, session_id: str, history_tuples: List[Tuple[str,str]], user_context: Optional[dict] = None):
-    """Runs the assistant and streams the response sentence by sentence or chunk by chunk."""
-    # This is a simplified streaming example. 
-    # True streaming from LangGraph requires more complex handling of intermediate steps 
-    # and potentially yield intermediate thoughts or final response chunks.
-
-    # For now, we'll get the full response and then "simulate" streaming it.
-    # A more advanced version would involve `ainvoke` on the graph and processing an AsyncIterator.
 
+def record_turn(session_id: str, user_input: str, response_text: str) -> List[Tuple[str, str]]:
+    """Appends a completed turn to the session and folds turns that left the verbatim window into its summary."""
+    if session_id not in chat_histories:
+        chat_histories[session_id] = []
+    chat_histories[session_id].append((user_input, response_text))
+    history_manager.schedule_fold(session_id, chat_histories[session_id])
+    return chat_histories[session_id]
+
+def sse_event(data: str, event: Optional[str] = None) -> str:
+    """Formats one Server-Sent Event; multi-line data is split across `data:` lines."""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+async def stream_response_generator(user_input: str, session_id: str, history: PreparedHistory, user_context: Optional[dict] = None, include_tool_events: bool = False):
+    """Runs the assistant and streams real LLM chunks as they are generated."""
+    llm_priority.set(Priority.INTERACTIVE)
+    request_metrics = RequestMetrics()
+    current_request.set(request_metrics)
     try:
         if user_context:
             # Context-aware mode
-            full_response = run_assistant(user_input, chat_history=history_tuples)
-            # , user_context=user_context
+            events = astream_assistant(user_input, chat_history=history.turns, user_context=user_context, history_summary=history.summary)
         else:
             # Q&A mode (or generic if user not logged in)
-            full_response = run_qa_assistant(user_input, chat_history=history_tuples)
-
-        # Simulate streaming by splitting the response (e.g., by sentences or newlines)
-        # This is NOT true LLM streaming, but demonstrates the mechanism for FastAPI
-        sentences = full_response.split('\n') # Example: split by newline
-        for i, sentence in enumerate(sentences):
-            if sentence.strip():
-                yield f"data: {sentence.strip()}\n\n"
-                await asyncio.sleep(0.1) # Simulate delay between chunks
-            if i < len(sentences) - 1 and sentences[i+1].strip(): # Add newline if next sentence is not blank
-                 yield f"data: \n\n" # Represents a newline in SSE
-                 await asyncio.sleep(0.05)
+            events = astream_qa_assistant(user_input, chat_history=history.turns, history_summary=history.summary)
+
+        full_response = ""
+        async for kind, payload in events:
+            if kind == "token":
+                yield sse_event(payload)
+            elif kind == "final":
+                full_response = payload
+            elif include_tool_events:
+                yield sse_event(json.dumps(payload, default=str), event=kind)
 
         # Update chat history after successful generation
-        if session_id not in chat_histories:
-            chat_histories[session_id] = []
-        chat_histories[session_id].append((user_input, full_response))
+        record_turn(session_id, user_input, full_response)
+        if SERVER_TIMING_ENABLED:
+            # Headers are sent before the graph runs, so streamed responses carry the timings as a last event
+            yield sse_event(request_metrics.server_timing(), event="server_timing")
 
+    except LLMOverloaded as e:
+        yield sse_event(f"Error: {e}")
     except Exception as e:
           print(f"Error during response generation: {e}")
           yield f"data: Error: Could not process your request.\n\n"
     finally:
+        request_metrics.finish("chat_stream")
         yield "data: [DONE]\n\n" # Signal stream completion
 
+async def fixed_reply_stream(text: str):
+    yield sse_event(text)
+    yield "data: [DONE]\n\n"
+
 @router.post("/chat/stream", tags=["Chat"])
-async def stream_chat_endpoint(payload: ChatMessageInput, db: Session = Depends(get_db)):
-    # , user_context: dict = Depends(get_user_context)
+async def stream_chat_endpoint(payload: ChatMessageInput, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """Receives a user message, processes it with the AI assistant, and streams the response."""
     session_id = payload.session_id or "default_session"
     
@@ -114,57 +123,68 @@ async def stream_chat_endpoint(payload: ChatMessageInput, db: Session = Depends(
         # For simplicity, let's use client's if provided, else server's
         current_history_tuples = payload.chat_history 
         chat_histories[session_id] = current_history_tuples # Update server's knowledge
+    history = history_manager.prepare(session_id, current_history_tuples)
+    # Shed before the 200 is sent; overload later in the stream ends it with an error event
+    llm_scheduler.check_admission(Priority.INTERACTIVE)
+    user_context = await get_user_context(db, current_user) if current_user else None
+    reply = gated_reply(payload.message, current_user, user_context)
+    if reply:
+        return StreamingResponse(fixed_reply_stream(reply), media_type="text/event-stream")
+    if not (user_context and user_context["goal"]):
+        user_context = None # Q&A mode, as in /chat
 
     return StreamingResponse(
-        stream_response_generator(payload.message, session_id, current_history_tuples),
-        # , user_context
+        stream_response_generator(payload.message, session_id, history, user_context=user_context, include_tool_events=payload.include_tool_events),
         media_type="text/event-stream")
 
 
 @router.post("/chat", response_model=ChatMessageOutput, tags=["Chat"])
-async def chat_endpoint(payload: ChatMessageInput, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)) -> ChatMessageOutput:
+async def chat_endpoint(payload: ChatMessageInput, response: Response, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)) -> ChatMessageOutput:
     """Receives a user message, processes it with the AI assistant, and returns a response."""
+    request_metrics = RequestMetrics()
+    current_request.set(request_metrics)
+    try:
+        return await _chat(payload, db, current_user)
+    finally:
+        request_metrics.finish("chat")
+        if SERVER_TIMING_ENABLED:
+            response.headers["Server-Timing"] = request_metrics.server_timing()
+
+async def _chat(payload: ChatMessageInput, db: AsyncSession, current_user: User) -> ChatMessageOutput:
     user_input = payload.message
     session_id = payload.session_id
+    llm_priority.set(Priority.CHAT)
+    llm_scheduler.check_admission()
     
     # Retrieve history for the session or use provided history
     current_history_tuples = chat_histories.get(session_id, [])
     if payload.chat_history:
         current_history_tuples = payload.chat_history
         chat_histories[session_id] = current_history_tuples
-
-    if not current_user:
-        if contains_health_keywords(user_input):
-            return ChatMessageOutput(response="To get personalized health advice, please login and set a goal using the 'Set Goal' button.", session_id=session_id, updated_chat_history=current_history_tuples)
-        response_text = await asyncio.to_thread(run_qa_assistant, user_input, chat_history=current_history_tuples)
-        if session_id not in chat_histories:
-            chat_histories[session_id] = []
-        chat_histories[session_id].append((user_input, response_text))
-        return ChatMessageOutput(response=response_text, session_id=session_id, updated_chat_history=chat_histories[session_id])
-
-    goal = db_service.get_goal_by_user_id(db, current_user.id)
-    if not goal:
-        if contains_health_keywords(user_input):
-            return ChatMessageOutput(response="Welcome! It looks like you haven't set a health goal yet. Please set one to get personalized advice.", session_id=session_id, updated_chat_history=current_history_tuples)
-        response_text = await asyncio.to_thread(run_qa_assistant, user_input, chat_history=current_history_tuples)
-        if session_id not in chat_histories:
-            chat_histories[session_id] = []
-        chat_histories[session_id].append((user_input, response_text))
-        return ChatMessageOutput(response=response_text, session_id=session_id, updated_chat_history=chat_histories[session_id])
+    # Recent turns verbatim plus a running summary of older ones, within the history token budget
+    history = history_manager.prepare(session_id, current_history_tuples)
+
+    # The context holds the latest goal, so a returning user's turn needs no goal query (see context_cache)
+    user_context = None
+    if current_user:
+        context_started = time.perf_counter()
+        user_context = await get_user_context(db, current_user)
+        current_request.get().add_span("context", time.perf_counter() - context_started)
+    reply = gated_reply(user_input, current_user, user_context)
+    if reply:
+        return ChatMessageOutput(response=reply, session_id=session_id, updated_chat_history=current_history_tuples)
+    if not (user_context and user_context["goal"]):
+        response_text = await arun_qa_assistant(user_input, chat_history=history.turns, history_summary=history.summary)
+        return ChatMessageOutput(response=response_text, session_id=session_id, updated_chat_history=record_turn(session_id, user_input, response_text))
 
     # If goal is set, proceed with assistant
-    user_context = await asyncio.to_thread(get_user_context, db, current_user)
-    response_text = await asyncio.to_thread(run_assistant, user_input, chat_history=current_history_tuples)
+    response_text = await arun_assistant(user_input, chat_history=history.turns, user_context=user_context, history_summary=history.summary)
 
     # Update chat history
-    if session_id not in chat_histories:
-        chat_histories[session_id] = []
-    chat_histories[session_id].append((user_input, response_text))
-
     return ChatMessageOutput(
         response=response_text,
         session_id=session_id,
-        updated_chat_history=chat_histories[session_id]
+        updated_chat_history=record_turn(session_id, user_input, response_text)
     )
 
 
@@ -173,21 +193,13 @@ def get_chat_history(session_id: str) -> List[Tuple[str, str]]:
     """Retrieves the chat history for a given session ID."""
     return chat_histories.get(session_id, [])
 
-# Example of how one might try to adapt the planner for true async streaming if it were async
-# async def stream_from_async_planner(user_input: str, history_messages: List[BaseMessage]):
-#     initial_state = AgentState(
-#         input=user_input,
-#         chat_history=history_messages, 
-#         # ... other fields initialized ...
-#     )
-#     async for event in app.astream_events(initial_state, version="v1"):
-#         kind = event["event"]
-#         if kind == "on_chat_model_stream":
-#             content = event["data"]["chunk"].content
-#             if content:
-#                 yield f"data: {content}\n\n"
-#         elif kind == "on_tool_end":
-#             # You might want to yield information about tool usage
-#             tool_output = event["data"].get("output")
-#             # yield f"data: [Tool Output: {tool_output[:50]}...]\n\n"
-#     yield "data: [DONE]\n\n"
\ No newline at end of file
+
+@router.get("/chat/llm/stats", tags=["Chat"])
+def get_llm_stats():
+    """LLM cache, request coalescing, admission scheduler and pre-router counters."""
+    return {
+        "cache": get_llm_cache_stats(),
+        "coalescing": get_llm_coalescing_stats(),
+        "scheduler": get_llm_scheduler_stats(),
+        "prerouter": prerouter.stats(),
+    }
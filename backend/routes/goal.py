@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from backend.data.db import get_db
-from backend.services import db_service
-from backend.services.goal_analysis import analyze_goal, calculate_bmi, calculate_bmr
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.data.db import get_async_db
+from backend.services import async_db_service
+from backend.services.goal_analysis import calculate_bmi, calculate_bmr, describe_goal, submit_goal_analysis, get_goal_job
 from backend.dependencies import get_current_user
 from models.db_models import User
 from backend.schemas import GoalSet
@@ -61,13 +61,18 @@ router = APIRouter()
 #         calculated_bmr=bmr
 #     )
 #     return {"status": "success", "message": "Goal set successfully", "goal_id": new_goal.id}
-@router.post("/goal/set", status_code=status.HTTP_201_CREATED)
-async def set_goal(goal: GoalSet, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def accepted(message: str, goal_id: int, job) -> dict:
+    """202 body pointing the client at the background analysis job."""
+    return {"status": "accepted", "message": message, "goal_id": goal_id, "job_id": job.id, "job_status": job.status, "status_url": f"/api/v1/goal/jobs/{job.id}"}
+
+@router.post("/goal/set", status_code=status.HTTP_202_ACCEPTED)
+async def set_goal(goal: GoalSet, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    """Saves the goal right away and analyzes it into daily targets in the background."""
     try:
         print("Incoming goal:", goal)
         print("Current user:", current_user)
 
-        existing_goal = db_service.get_goal_by_user_id(db, current_user.id)
+        existing_goal = await async_db_service.get_goal_by_user_id(db, current_user.id)
         if existing_goal:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User already has an active goal.")
 
@@ -77,13 +82,10 @@ async def set_goal(goal: GoalSet, db: Session = Depends(get_db), current_user: U
             bmi = calculate_bmi(goal.current_weight, goal.height)
             bmr = calculate_bmr(goal.current_weight, goal.height, goal.age, goal.gender)
 
-        goal_description = f"Goal Type: {goal.goal_type}, Target Weight: {goal.target_weight}kg, ..."
+        goal_description = describe_goal(goal)
         print("Goal description:", goal_description)
 
-        analysis_result = await analyze_goal(goal_description)
-        print("Analysis:", analysis_result)
-
-        new_goal = db_service.add_goal(
+        new_goal = await async_db_service.add_goal(
             db, user_id=current_user.id,
             goal_text=goal_description,
             goal_type=goal.goal_type,
@@ -92,7 +94,7 @@ async def set_goal(goal: GoalSet, db: Session = Depends(get_db), current_user: U
             activity_level=goal.activity_level,
             preferences=goal.dietary_preferences,
             allergies=goal.allergies,
-            analysis_result=analysis_result,
+            analysis_result=None, # Filled in by the analysis job
             current_weight=goal.current_weight,
             height=goal.height,
             age=goal.age,
@@ -101,22 +103,33 @@ async def set_goal(goal: GoalSet, db: Session = Depends(get_db), current_user: U
             calculated_bmr=bmr
         )
 
-        return {"status": "success", "message": "Goal set successfully", "goal_id": new_goal.id}
-    
+        job = submit_goal_analysis(current_user.id, new_goal.id, goal)
+        return accepted("Goal set successfully, analysis in progress", new_goal.id, job)
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Goal set error: {e}")
         raise HTTPException(status_code=500, detail="Something went wrong")
 
+@router.get("/goal/jobs/{job_id}")
+async def get_goal_analysis_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Status of a goal analysis job: pending, running, succeeded, needs_clarification, superseded (a later update's job stores the result) or failed."""
+    job = get_goal_job(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal analysis job not found.")
+    return job.to_dict()
+
 @router.get("/goal/get")
-async def get_goal(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    goal = db_service.get_goal_by_user_id(db, current_user.id)
+async def get_goal(db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    goal = await async_db_service.get_goal_by_user_id(db, current_user.id)
     if not goal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No goal found for this user.")
     return goal.to_dict()
 
-@router.put("/goal/update")
-async def update_goal(goal: GoalSet, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    existing_goal = db_service.get_goal_by_user_id(db, current_user.id)
+@router.put("/goal/update", status_code=status.HTTP_202_ACCEPTED)
+async def update_goal(goal: GoalSet, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    existing_goal = await async_db_service.get_goal_by_user_id(db, current_user.id)
     if not existing_goal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No goal found for this user to update.")
     
@@ -130,24 +143,9 @@ async def update_goal(goal: GoalSet, db: Session = Depends(get_db), current_user
         except Exception as e:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Error calculating BMI/BMR: {e}")
 
-    # Create a goal description from the new fields
-    goal_description = f"Goal Type: {goal.goal_type}"
-    goal_description += f", Target Weight: {goal.target_weight}kg"
-    goal_description += f", Timeframe: {goal.timeframe}"
-    goal_description += f", Activity Level: {goal.activity_level}"
-    if goal.dietary_preferences: goal_description += f", Dietary Preferences: {goal.dietary_preferences}"
-    if goal.allergies: goal_description += f", Allergies: {goal.allergies}"
-    goal_description += f", Current Weight: {goal.current_weight}kg"
-    goal_description += f", Height: {goal.height}cm"
-    goal_description += f", Age: {goal.age}"
-    goal_description += f", Gender: {goal.gender}"
-
-    # Analyze the combined goal description
-    analysis_result = await analyze_goal(goal_description)
-    if analysis_result.get("clarification_needed"):
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=analysis_result.get("message"))
-
-    updated_goal = db_service.update_goal(
+    goal_description = describe_goal(goal)
+
+    updated_goal = await async_db_service.update_goal(
         db,
         goal_id=existing_goal.id,
         goal_text=goal_description, # Use goal_text for the combined description
@@ -157,7 +155,7 @@ async def update_goal(goal: GoalSet, db: Session = Depends(get_db), current_user
         activity_level=goal.activity_level,
         preferences=goal.dietary_preferences, # Map to preferences
         allergies=goal.allergies,
-        analysis_result=analysis_result, # Store the analysis result
+        analysis_result=existing_goal.analysis_result, # Kept until the analysis job replaces it
         current_weight=goal.current_weight,
         height=goal.height,
         age=goal.age,
@@ -165,4 +163,6 @@ async def update_goal(goal: GoalSet, db: Session = Depends(get_db), current_user
         calculated_bmi=bmi,
         calculated_bmr=bmr
     )
-    return {"status": "success", "message": "Goal updated successfully", "goal_id": updated_goal.id}
\ No newline at end of file
+    # Clarification requests now surface as the job's `needs_clarification` status instead of a 422
+    job = submit_goal_analysis(current_user.id, updated_goal.id, goal)
+    return accepted("Goal updated successfully, analysis in progress", updated_goal.id, job)
@@ -1,9 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from backend.data.db import get_db
-from backend.services.db_service import add_log, add_food_log, get_logs_by_date_range, get_food_entries_by_date_range
+from backend.data.db import get_async_db, get_db
+from backend.services.async_db_service import add_log, add_food_log, add_logs, add_food_logs
+from backend.services.db_service import get_logs_by_date_range, get_food_entries_by_date_range
 from backend.dependencies import get_current_user
+from backend.config.settings import LOG_BULK_MAX_ROWS, LOG_WRITE_BEHIND
+from backend.routes.calc import NDJSON, ndjson_lines
+from backend.schemas import FoodEntryIn, LogEntryIn
+from backend.services.bulk_logs import stamp_results, validate_entries
+from backend.services.write_buffer import WriteFailed, log_writer
 from models.db_models import User, Log, FoodEntry
 
 router = APIRouter()
@@ -19,20 +31,83 @@ class FoodLogCreate(BaseModel):
     calories: int
     confirmed: bool
 
+async def buffered_write(db: AsyncSession, write, id_key: str, detail: str) -> dict:
+    """Group commit: the entry is written with others in the next flush of `log_writer`.
+
+    Same response as the direct write; with LOG_WRITE_ACK=buffered the id is null, since the
+    response is sent before the entry is stored.
+    """
+    await db.close() # Return the request's connection instead of holding it while the batch fills
+    try:
+        row = await write
+    except WriteFailed:
+        raise HTTPException(status_code=500, detail=detail)
+    return {"status": "success", id_key: row.get("id")}
+
 @router.post("/log")
-def create_log(log: LogCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_log = add_log(db, current_user.id, log.steps, log.sleep_hours, log.water_intake, log.calories)
+async def create_log(log: LogCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    if LOG_WRITE_BEHIND:
+        return await buffered_write(db, log_writer.add_log(current_user.id, log.steps, log.sleep_hours, log.water_intake, log.calories), "log_id", "Failed to add log")
+    db_log = await add_log(db, current_user.id, log.steps, log.sleep_hours, log.water_intake, log.calories)
     if db_log is None:
         raise HTTPException(status_code=500, detail="Failed to add log")
     return {"status": "success", "log_id": db_log.id}
 
 @router.post("/log/food")
-def create_food_log(food_log: FoodLogCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_food_log = add_food_log(db, current_user.id, food_log.item_name, food_log.calories, food_log.confirmed)
+async def create_food_log(food_log: FoodLogCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    if LOG_WRITE_BEHIND:
+        return await buffered_write(db, log_writer.add_food_log(current_user.id, food_log.item_name, food_log.calories, food_log.confirmed), "food_log_id", "Failed to add food log")
+    db_food_log = await add_food_log(db, current_user.id, food_log.item_name, food_log.calories, food_log.confirmed)
     if db_food_log is None:
         raise HTTPException(status_code=500, detail="Failed to add food log")
     return {"status": "success", "food_log_id": db_food_log.id}
 
+async def read_entries(request: Request, key: str) -> List:
+    """Items of a bulk upload: a JSON array (or `{key: [...]}`), or one item per line as NDJSON."""
+    too_many = HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"At most {LOG_BULK_MAX_ROWS} entries per request.")
+    if request.headers.get("content-type", "").startswith(NDJSON):
+        items = []
+        async for line in ndjson_lines(request):
+            if len(items) >= LOG_BULK_MAX_ROWS:
+                raise too_many
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None) # Reported as an invalid item
+        return items
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be JSON or NDJSON.")
+    items = body.get(key) if isinstance(body, dict) else body
+    if not isinstance(items, list):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Expected a list of {key}.")
+    if len(items) > LOG_BULK_MAX_ROWS:
+        raise too_many
+    return items
+
+def bulk_response(rows, results) -> JSONResponse:
+    if rows is None:
+        raise HTTPException(status_code=500, detail="Failed to add entries")
+    return JSONResponse({"status": "success", "created": len(rows), "invalid": len(results) - len(rows), "results": stamp_results(results)})
+
+@router.post("/log/bulk")
+async def create_logs(request: Request, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    """Adds many daily logs in one transaction, e.g. a week of wearable data.
+
+    Send `{"logs": [...]}` (or a bare array) as JSON, or one log per line with
+    `Content-Type: application/x-ndjson`. Each log has the /log fields plus an optional
+    ISO 8601 `created_at`. Invalid items are skipped and reported by index; the rest are stored.
+    """
+    rows, results = await asyncio.to_thread(validate_entries, LogEntryIn, await read_entries(request, "logs"))
+    return bulk_response(await add_logs(db, current_user.id, rows), results)
+
+@router.post("/log/food/bulk")
+async def create_food_logs(request: Request, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    """Adds many food entries in one transaction; same formats as /log/bulk with `{"food_logs": [...]}`."""
+    rows, results = await asyncio.to_thread(validate_entries, FoodEntryIn, await read_entries(request, "food_logs"))
+    return bulk_response(await add_food_logs(db, current_user.id, rows), results)
+
 @router.get("/logs")
 def get_logs(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     logs = get_logs_by_user_id(db, current_user.id)
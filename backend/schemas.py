@@ -1,4 +1,5 @@
 from typing import Optional
+from datetime import datetime
 from pydantic import BaseModel
 
 class UserCreate(BaseModel):
@@ -25,4 +26,19 @@ class GoalSet(BaseModel):
     current_weight: float
     height: float
     age: int
-    gender: str
\ No newline at end of file
+    gender: str
+
+class LogEntryIn(BaseModel):
+    """One item of POST /log/bulk; created_at defaults to the time of the upload."""
+    steps: int
+    sleep_hours: float
+    water_intake: float
+    calories: float
+    created_at: Optional[datetime] = None
+
+class FoodEntryIn(BaseModel):
+    """One item of POST /log/food/bulk."""
+    item_name: str
+    calories: int
+    confirmed: bool
+    created_at: Optional[datetime] = None
@@ -0,0 +1,246 @@
+"""Async versions of the db_service functions, for `async def` routes and background tasks.
+
+Same names, arguments and return values as db_service, but they take an AsyncSession
+(see `backend.data.db.get_async_db`) and must be awaited.
+"""
+from typing import Optional
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.services.context_cache import context_cache
+from models.db_models import Goal, FoodEntry, User, Log, analysis_targets
+from backend.services.db_service import (
+    daily_food_totals_statement,
+    daily_log_totals_statement,
+    food_rows_statement,
+    goal_targets_statement,
+    insert_ids_statement,
+    log_rows_statement,
+    returns_ids,
+    top_foods_statement,
+)
+from backend.services.bulk_logs import needs_now, owned_by, stamp_rows
+from backend.services.rollups import abump_daily_rollup, daily_increments, food_increments, log_increments
+
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    return await db.get(User, user_id)
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return (await db.execute(select(User).where(User.email == email).limit(1))).scalars().first()
+
+async def get_user_profile(db: AsyncSession, user_id: int):
+    return await db.get(User, user_id)
+
+async def create_user(db: AsyncSession, email: str, hashed_password: str, name: str):
+    db_user = User(email=email, password=hashed_password, name=name)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def add_goal(db: AsyncSession, user_id: int, goal_text: str, goal_type: str, target_weight: Optional[float] = None, timeframe: Optional[str] = None, activity_level: Optional[str] = None, preferences: Optional[str] = None, allergies: Optional[str] = None, analysis_result: dict = None, current_weight: Optional[float] = None, height: Optional[float] = None, age: Optional[int] = None, gender: Optional[str] = None, calculated_bmi: Optional[float] = None, calculated_bmr: Optional[float] = None):
+    try:
+        db_goal = Goal(
+            user_id=user_id,
+            goal_text=goal_text,
+            current_weight=current_weight,
+            height=height,
+            age=age,
+            gender=gender,
+            calculated_bmi=calculated_bmi,
+            calculated_bmr=calculated_bmr,
+            goal_type=goal_type,
+            target_weight=target_weight,
+            timeframe=timeframe,
+            activity_level=activity_level,
+            preferences=preferences,
+            allergies=allergies
+        )
+        db_goal.set_analysis(analysis_result)
+        db.add(db_goal)
+        await db.commit()
+        await db.refresh(db_goal)
+        await context_cache.arecord_goal(user_id, db_goal.to_dict())
+        return db_goal
+    except Exception as e:
+        await db.rollback()
+        print(f"Error adding goal: {e}")
+        return None
+
+async def set_goal_analysis(db: AsyncSession, goal_id: int, analysis_result: dict) -> bool:
+    """Stores the result of a background goal analysis on an existing goal."""
+    try:
+        user_id = (await db.execute(select(Goal.user_id).where(Goal.id == goal_id))).scalar()
+        if user_id is None:
+            return False
+        await db.execute(update(Goal).where(Goal.id == goal_id).values(analysis_result=analysis_result, **analysis_targets(analysis_result)))
+        await db.commit()
+        await context_cache.arecord_goal_analysis(user_id, goal_id, analysis_result)
+        return True
+    except Exception as e:
+        await db.rollback()
+        print(f"Error saving goal analysis: {e}")
+        return False
+
+async def get_goals_without_analysis(db: AsyncSession) -> list:
+    """Goals whose background analysis never stored a result."""
+    return list((await db.execute(select(Goal).where(Goal.analysis_result.is_(None)))).scalars())
+
+async def get_goal_by_id(db: AsyncSession, goal_id: int):
+    return await db.get(Goal, goal_id)
+
+async def update_goal(db: AsyncSession, goal_id: int, goal_text: str, goal_type: Optional[str] = None, target_weight: Optional[float] = None, timeframe: Optional[str] = None, activity_level: Optional[str] = None, preferences: Optional[str] = None, allergies: Optional[str] = None, analysis_result: dict = None, current_weight: Optional[float] = None, height: Optional[float] = None, age: Optional[int] = None, gender: Optional[str] = None, calculated_bmi: Optional[float] = None, calculated_bmr: Optional[float] = None):
+    try:
+        db_goal = await db.get(Goal, goal_id)
+        if db_goal:
+            db_goal.goal_text = goal_text
+            db_goal.set_analysis(analysis_result)
+            db_goal.current_weight = current_weight
+            db_goal.height = height
+            db_goal.age = age
+            db_goal.gender = gender
+            db_goal.calculated_bmi = calculated_bmi
+            db_goal.calculated_bmr = calculated_bmr
+            db_goal.goal_type = goal_type if goal_type is not None else db_goal.goal_type
+            db_goal.target_weight = target_weight if target_weight is not None else db_goal.target_weight
+            db_goal.timeframe = timeframe if timeframe is not None else db_goal.timeframe
+            db_goal.activity_level = activity_level if activity_level is not None else db_goal.activity_level
+            db_goal.preferences = preferences if preferences is not None else db_goal.preferences
+            db_goal.allergies = allergies if allergies is not None else db_goal.allergies
+            await db.commit()
+            await db.refresh(db_goal)
+            await context_cache.arecord_goal(db_goal.user_id, db_goal.to_dict(), latest=False)
+        return db_goal
+    except Exception as e:
+        await db.rollback()
+        print(f"Error updating goal: {e}")
+        return None
+
+async def add_log(db: AsyncSession, user_id: int, steps: int, sleep_hours: float, water_intake: float, calories: float):
+    try:
+        db_log = Log(user_id=user_id, steps=steps, sleep_hours=sleep_hours, water_intake=water_intake, calories=calories)
+        db.add(db_log)
+        await db.flush()
+        await db.refresh(db_log, ["created_at"]) # Server-side timestamp decides the rollup day
+        await abump_daily_rollup(db, user_id, db_log.created_at.date(), log_increments(db_log))
+        await db.commit()
+        await context_cache.arecord_entries([db_log.to_dict()], [])
+        return db_log
+    except Exception as e:
+        await db.rollback()
+        print(f"Error adding log: {e}")
+        return None
+
+async def add_food_log(db: AsyncSession, user_id: int, item_name: str, calories: int, confirmed: bool):
+    try:
+        db_food_entry = FoodEntry(user_id=user_id, item_name=item_name, calories=calories, confirmed=confirmed)
+        db.add(db_food_entry)
+        await db.flush()
+        await db.refresh(db_food_entry, ["created_at"])
+        await abump_daily_rollup(db, user_id, db_food_entry.created_at.date(), food_increments(db_food_entry))
+        await db.commit()
+        await context_cache.arecord_entries([], [db_food_entry.to_dict()])
+        return db_food_entry
+    except Exception as e:
+        await db.rollback()
+        print(f"Error adding food log: {e}")
+        return None
+
+async def add_entries(db: AsyncSession, log_rows: list, food_rows: list, with_ids: bool = False) -> bool:
+    try:
+        now = (await db.execute(select(func.now()))).scalar() if needs_now(log_rows) or needs_now(food_rows) else None
+        ids = []
+        for model, rows, increments in ((Log, log_rows, log_increments), (FoodEntry, food_rows, food_increments)):
+            if not rows:
+                continue
+            stamp_rows(rows, now)
+            if not with_ids:
+                await db.execute(insert(model), rows)
+            elif returns_ids(db.bind.dialect):
+                ids.append((rows, (await db.execute(insert_ids_statement(model), rows)).scalars().all()))
+            else:
+                ids.append((rows, [(await db.execute(insert(model).values(**row))).inserted_primary_key[0] for row in rows]))
+            for (user_id, day), totals in daily_increments(rows, increments).items():
+                await abump_daily_rollup(db, user_id, day, totals)
+        await db.commit()
+        for rows, row_ids in ids:
+            for row, row_id in zip(rows, row_ids):
+                row["id"] = row_id
+        await context_cache.arecord_entries(log_rows, food_rows)
+        return True
+    except Exception as e:
+        await db.rollback()
+        print(f"Error adding entries: {e}")
+        return False
+
+async def add_logs(db: AsyncSession, user_id: int, rows: list):
+    return rows if await add_entries(db, owned_by(rows, user_id), []) else None
+
+async def add_food_logs(db: AsyncSession, user_id: int, rows: list):
+    return rows if await add_entries(db, [], owned_by(rows, user_id)) else None
+
+async def get_logs_by_date_range(db: AsyncSession, user_id: int, start_date: datetime, end_date: datetime):
+    try:
+        result = await db.execute(select(Log).where(Log.user_id == user_id, Log.created_at >= start_date, Log.created_at <= end_date))
+        return list(result.scalars())
+    except Exception as e:
+        print(f"Error retrieving logs: {e}")
+        return []
+
+async def get_food_entries_by_date_range(db: AsyncSession, user_id: int, start_date: datetime, end_date: datetime):
+    try:
+        result = await db.execute(select(FoodEntry).where(FoodEntry.user_id == user_id, FoodEntry.created_at >= start_date, FoodEntry.created_at <= end_date))
+        return list(result.scalars())
+    except Exception as e:
+        print(f"Error retrieving food entries: {e}")
+        return []
+
+# --- Read models --- #
+async def get_log_rows(db: AsyncSession, user_id: int, start_date: datetime, end_date: datetime):
+    try:
+        return (await db.execute(log_rows_statement(user_id, start_date, end_date))).all()
+    except Exception as e:
+        print(f"Error retrieving log rows: {e}")
+        return []
+
+async def get_food_rows(db: AsyncSession, user_id: int, start_date: datetime, end_date: datetime):
+    try:
+        return (await db.execute(food_rows_statement(user_id, start_date, end_date))).all()
+    except Exception as e:
+        print(f"Error retrieving food rows: {e}")
+        return []
+
+async def get_daily_log_totals(db: AsyncSession, user_id: int, start_date: datetime, end_date: datetime):
+    try:
+        return (await db.execute(daily_log_totals_statement(user_id, start_date, end_date))).all()
+    except Exception as e:
+        print(f"Error aggregating logs: {e}")
+        return []
+
+async def get_daily_food_totals(db: AsyncSession, user_id: int, start_date: datetime, end_date: datetime):
+    try:
+        return (await db.execute(daily_food_totals_statement(user_id, start_date, end_date))).all()
+    except Exception as e:
+        print(f"Error aggregating food entries: {e}")
+        return []
+
+async def get_top_foods(db: AsyncSession, user_id: int, start_date: datetime, end_date: datetime, limit: int = 5):
+    try:
+        return (await db.execute(top_foods_statement(user_id, start_date, end_date, limit))).all()
+    except Exception as e:
+        print(f"Error aggregating top foods: {e}")
+        return []
+
+async def get_goal_targets(db: AsyncSession, user_id: int) -> dict:
+    row = (await db.execute(goal_targets_statement(user_id))).first()
+    return {name: value for name, value in row._mapping.items() if value is not None} if row else {}
+
+async def get_goal_by_user_id(db: AsyncSession, user_id: int):
+    try:
+        result = await db.execute(select(Goal).where(Goal.user_id == user_id).order_by(Goal.created_at.desc()).limit(1))
+        return result.scalars().first()
+    except Exception as e:
+        print(f"Error retrieving goal by user ID: {e}")
+        return None
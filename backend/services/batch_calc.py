@@ -0,0 +1,112 @@
+import math
+from typing import Dict, List
+
+import numpy as np
+
+from backend.services.tools import ACTIVITY_MULTIPLIERS
+
+CALORIE_ADJUSTMENT = 500 # Same deficit/surplus as CalorieEstimatorTool
+BMI_CATEGORIES = np.array(["Underweight", "Normal weight", "Overweight", "Obesity"], dtype=object)
+RESULTS = ("bmi", "bmi_category", "bmr", "maintenance_calories", "deficit_calories", "surplus_calories")
+CALORIE_RESULTS = ("bmr", "maintenance_calories", "deficit_calories", "surplus_calories") # Whole kcal, as the tools report them
+
+
+def _round_like_python(values: np.ndarray, digits: int) -> np.ndarray:
+    """np.round, with values near a rounding half redone by Python's round() so results match the scalar tools."""
+    rounded = np.round(values, digits)
+    scaled = values * 10 ** digits
+    near_half = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in near_half:
+        rounded[i] = round(float(values[i]), digits)
+    return rounded
+
+
+def _numbers(values: list) -> np.ndarray:
+    """Float column with NaN for missing or non-numeric values."""
+    try:
+        return np.array(values, dtype=float) # None becomes NaN
+    except (TypeError, ValueError):
+        return np.array([_number(value) for value in values], dtype=float)
+
+
+def _number(value) -> float:
+    if isinstance(value, bool) or value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _lookup(values: np.ndarray, mapping, dtype=object) -> np.ndarray:
+    """Applies `mapping` to each distinct value once instead of once per row."""
+    memo = {}
+    return np.array([memo[value] if value in memo else memo.setdefault(value, mapping(value)) for value in values.tolist()], dtype=dtype)
+
+
+def compute_batch(weight_kg: np.ndarray, height_cm: np.ndarray, age_years: np.ndarray, gender: np.ndarray, activity_level: np.ndarray) -> Dict[str, np.ndarray]:
+    """Computes BMI, BMI category, BMR and maintenance/deficit/surplus calories for every row at once.
+
+    Uses the formulas and rounding of BMICalculatorTool, BMRCalculatorTool and
+    CalorieEstimatorTool (BMR is unrounded before the activity multiplier), and takes the
+    tools' activity levels (ACTIVITY_MULTIPLIERS keys). Rows the tools would reject get the
+    error the tools would report first (BMR checks, then the activity level) and NaN results.
+    """
+    n = len(weight_kg)
+    gender = _lookup(gender, lambda value: str(value).lower())
+    is_male = gender == "male"
+    multiplier = _lookup(activity_level, lambda level: ACTIVITY_MULTIPLIERS.get(str(level).lower(), math.nan), dtype=float)
+
+    error = np.full(n, None, dtype=object)
+    error[np.isnan(multiplier)] = f"Error: Invalid activity level. Choose from: {', '.join(ACTIVITY_MULTIPLIERS.keys())}."
+    # Later checks overwrite earlier ones, so the order is the reverse of the tools'
+    error[~((weight_kg > 0) & (height_cm > 0) & (age_years > 0))] = "Error: Age, weight, and height must be positive values."
+    error[~(is_male | (gender == "female"))] = "Error: Gender must be 'male' or 'female'."
+    for field, values in (("weight_kg", weight_kg), ("height_cm", height_cm), ("age_years", age_years)):
+        error[np.isnan(values)] = f"Error: Missing or invalid {field}."
+    valid = error == None # noqa: E711 - elementwise comparison on an object array
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        height_m = height_cm / 100
+        bmi = _round_like_python(weight_kg / (height_m ** 2), 1)
+        bmr = (10 * weight_kg) + (6.25 * height_cm) - (5 * age_years) + np.where(is_male, 5, -161)
+        maintenance = bmr * multiplier
+
+    category = BMI_CATEGORIES[np.select([bmi < 18.5, (bmi >= 18.5) & (bmi <= 24.9), (bmi >= 25) & (bmi <= 29.9)], [0, 1, 2], default=3)]
+    results = {
+        "bmi": bmi,
+        "bmi_category": category,
+        "bmr": np.rint(bmr),
+        "maintenance_calories": np.rint(maintenance),
+        "deficit_calories": np.rint(maintenance - CALORIE_ADJUSTMENT),
+        "surplus_calories": np.rint(maintenance + CALORIE_ADJUSTMENT),
+    }
+    for name in CALORIE_RESULTS:
+        results[name] = np.where(valid, results[name], 0).astype(np.int64)
+    results["error"] = error
+    return results
+
+
+def compute_profiles(profiles: List[dict]) -> List[dict]:
+    """Runs `compute_batch` on a list of profile dicts and returns one result dict per profile.
+
+    Rows with an `error` have None for every result.
+    """
+    if not profiles:
+        return []
+    profiles = [profile if isinstance(profile, dict) else {} for profile in profiles]
+    results = compute_batch(
+        _numbers([profile.get("weight_kg") for profile in profiles]),
+        _numbers([profile.get("height_cm") for profile in profiles]),
+        _numbers([profile.get("age_years") for profile in profiles]),
+        np.array([profile.get("gender") or "" for profile in profiles], dtype=object),
+        np.array([profile.get("activity_level") or "" for profile in profiles], dtype=object),
+    )
+    names = list(results)
+    rows = [dict(zip(names, row)) for row in zip(*(results[name].tolist() for name in names))]
+    for profile, row in zip(profiles, rows):
+        if row["error"] is not None:
+            row.update(dict.fromkeys(RESULTS))
+        if "id" in profile:
+            row["id"] = profile["id"]
+    return rows
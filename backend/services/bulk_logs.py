@@ -0,0 +1,59 @@
+"""Validation and row preparation for the bulk log endpoints (/log/bulk, /log/food/bulk).
+
+Items are validated up front, one result per item, so a bad item is reported without
+failing the batch; the valid ones are inserted by `add_logs` / `add_food_logs` in one
+transaction.
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+
+def local_time(value: datetime) -> datetime:
+    # Stored naive in server local time, like the datetime.now() the summaries compare against
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+
+def validate_entries(model: Type[BaseModel], items: List) -> Tuple[List[dict], List[dict]]:
+    """(rows to insert, per-item results); invalid items get their errors, valid ones a placeholder result filled in by `stamp_results`."""
+    rows, results = [], []
+    for index, item in enumerate(items):
+        try:
+            entry = model.model_validate(item)
+        except ValidationError as e:
+            results.append({"index": index, "status": "invalid", "errors": [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]})
+            continue
+        row = entry.model_dump()
+        if row["created_at"] is not None:
+            row["created_at"] = local_time(row["created_at"])
+        rows.append(row)
+        results.append({"index": index, "status": "created", "row": row})
+    return rows, results
+
+
+def stamp_rows(rows: List[dict], now: Optional[datetime]) -> List[dict]:
+    """Sets `now` (the database's clock) where no timestamp was given."""
+    for row in rows:
+        if row.get("created_at") is None:
+            row["created_at"] = now
+    return rows
+
+
+def stamp_results(results: List[dict]) -> List[dict]:
+    """Replaces each created item's row with the timestamp it was stored under."""
+    for result in results:
+        row = result.pop("row", None)
+        if row is not None:
+            result["created_at"] = row["created_at"].isoformat()
+    return results
+
+
+def needs_now(rows: List[dict]) -> bool:
+    return any(row.get("created_at") is None for row in rows)
+
+
+def owned_by(rows: List[dict], user_id: int) -> List[dict]:
+    for row in rows:
+        row["user_id"] = user_id
+    return rows
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage, BaseMessage
+
+from backend.services.fake_llm import FakeChatModel
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def _tool_names(tools) -> List[str]:
+    """Names of the bound tools in either OpenAI-format dicts or Gemini tool objects."""
+    names = []
+    for tool in tools or []:
+        if isinstance(tool, dict):
+            names.append(tool.get("function", tool).get("name", ""))
+        elif getattr(tool, "function_declarations", None):
+            names.extend(declaration.name for declaration in tool.function_declarations)
+        else:
+            names.append(getattr(tool, "name", None) or getattr(tool, "__name__", str(tool)))
+    return sorted(names)
+
+
+def cassette_key(messages: List[BaseMessage], tools=None) -> str:
+    """Provider-independent request key: message contents, tool calls and the names of the bound tools.
+
+    Message ids (run ids) are left out so a replayed conversation produces the same keys
+    as the recorded one.
+    """
+    payload = {
+        "messages": [
+            {
+                "type": message.type,
+                "content": message.content,
+                "tool_calls": [[call["name"], call["args"], call.get("id")] for call in getattr(message, "tool_calls", None) or []],
+                "tool_call_id": getattr(message, "tool_call_id", None),
+            }
+            for message in messages
+        ],
+        "tools": _tool_names(tools),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Append-only JSONL file of recorded LLM responses keyed by `cassette_key`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, AIMessage] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = loads(entry["message"])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        return self._entries.get(key)
+
+    def record(self, key: str, message: AIMessage):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = message
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "message": dumps(message)}) + "\n")
+
+
+_cassettes: Dict[str, Cassette] = {}
+
+
+def get_cassette(path: str) -> Cassette:
+    """Returns the cassette at `path`, loading it once per process."""
+    if path not in _cassettes:
+        _cassettes[path] = Cassette(path)
+    return _cassettes[path]
+
+
+class ReplayChatModel(FakeChatModel):
+    """Answers from a recorded cassette instead of calling the provider; unknown requests raise CassetteMiss."""
+
+    cassette_path: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-replay"
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[dict]] = None, tool_choice: Optional[str] = None, **kwargs) -> AIMessage:
+        message = get_cassette(self.cassette_path).get(cassette_key(messages, tools))
+        if message is None:
+            raise CassetteMiss(f"No recorded response in {self.cassette_path} for this request; record it with LLM_PROVIDER=record.")
+        return message.model_copy(deep=True)
@@ -0,0 +1,116 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from backend.config.settings import HISTORY_WINDOW_TURNS, HISTORY_TOKEN_BUDGET, HISTORY_SUMMARY_WORDS
+from backend.services.client import get_llm
+from backend.services.context_compactor import estimate_tokens
+from backend.services.llm_scheduler import llm_priority, Priority
+
+
+@dataclass
+class PreparedHistory:
+    """What a single request sends to the planner: a running summary plus the recent turns verbatim."""
+    summary: str
+    turns: List[Tuple[str, str]]
+
+
+@dataclass
+class _RunningSummary:
+    text: str
+    folded_turns: int # Number of leading turns of the session folded into `text`
+    last_folded: Tuple[str, str] # Used to detect a client sending a different history for the same session
+
+
+def _turn_tokens(turn: Tuple[str, str]) -> int:
+    return estimate_tokens(turn[0]) + estimate_tokens(turn[1]) + 4
+
+
+class ChatHistoryManager:
+    """Keeps the last N turns verbatim, folds older turns into a running summary and caps history tokens.
+
+    Folding happens in a background task after a turn completes, one batch of new
+    overflow turns at a time, so the summary is updated incrementally and no request
+    waits on the summarization call.
+    """
+
+    def __init__(self, window_turns: int = HISTORY_WINDOW_TURNS, token_budget: int = HISTORY_TOKEN_BUDGET, summary_words: int = HISTORY_SUMMARY_WORDS):
+        self.window_turns = window_turns
+        self.token_budget = token_budget
+        self.summary_words = summary_words
+        # WARNING: in-memory like `chat_histories` in routes/chat.py; not shared across workers.
+        self._summaries: Dict[str, _RunningSummary] = {}
+        self._folding: Dict[str, asyncio.Task] = {}
+
+    def _running_summary(self, session_id: str, history: List[Tuple[str, str]]) -> Optional[_RunningSummary]:
+        running = self._summaries.get(session_id)
+        if running is None:
+            return None
+        if running.folded_turns > len(history) or tuple(history[running.folded_turns - 1]) != running.last_folded:
+            # The history no longer starts with the turns we summarized
+            del self._summaries[session_id]
+            return None
+        return running
+
+    def prepare(self, session_id: str, history: List[Tuple[str, str]]) -> PreparedHistory:
+        """Returns the summary and verbatim turns to send for this request, within the token budget."""
+        running = self._running_summary(session_id, history)
+        summary = running.text if running else ""
+        turns = [tuple(turn) for turn in history[running.folded_turns if running else 0:]]
+
+        summary_budget = self.token_budget // 3
+        if estimate_tokens(summary) > summary_budget:
+            summary = summary[:summary_budget * 4].rsplit(" ", 1)[0] + " ..."
+
+        # Turns not folded yet (the background fold is still running) and the window itself
+        # are trimmed oldest first until the whole history fits the ceiling.
+        remaining = self.token_budget - estimate_tokens(summary)
+        kept: List[Tuple[str, str]] = []
+        for turn in reversed(turns):
+            cost = _turn_tokens(turn)
+            if cost > remaining:
+                break
+            kept.append(turn)
+            remaining -= cost
+        kept.reverse()
+        return PreparedHistory(summary=summary, turns=kept)
+
+    def schedule_fold(self, session_id: str, history: List[Tuple[str, str]]):
+        """Folds turns that fell out of the window into the summary in the background."""
+        running = self._running_summary(session_id, history)
+        folded = running.folded_turns if running else 0
+        if len(history) - self.window_turns <= folded:
+            return
+        task = self._folding.get(session_id)
+        if task is not None and not task.done():
+            return # The next completed turn will pick up whatever this fold misses
+        self._folding[session_id] = asyncio.create_task(self.fold(session_id, list(history)))
+
+    async def fold(self, session_id: str, history: List[Tuple[str, str]]):
+        """Updates the session summary with the turns between the last fold and the window."""
+        running = self._running_summary(session_id, history)
+        folded = running.folded_turns if running else 0
+        fold_until = len(history) - self.window_turns
+        if fold_until <= folded:
+            return
+        new_turns = "\n".join(f"User: {human}\nAssistant: {ai}" for human, ai in history[folded:fold_until])
+        prompt = f"""Update the running summary of a conversation between a user and an AI health assistant.
+        Keep facts about the user (goal, body metrics, preferences, allergies, conditions), numbers that were calculated, and open questions.
+        Respond with the updated summary only, in at most {self.summary_words} words.
+
+        Current summary:
+        {running.text if running else "(none)"}
+
+        New turns:
+        {new_turns}
+        """
+        llm_priority.set(Priority.BACKGROUND) # Runs in its own task, so this does not leak into the request
+        try:
+            response = await get_llm(cache=False).ainvoke(prompt)
+        except Exception as e:
+            print(f"Error folding chat history for session {session_id}: {e}")
+            return
+        self._summaries[session_id] = _RunningSummary(text=response.content, folded_turns=fold_until, last_folded=tuple(history[fold_until - 1]))
+
+
+history_manager = ChatHistoryManager()
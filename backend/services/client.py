@@ -1,11 +1,126 @@
+import time
+from functools import partial
+
+from langchain_core.load import dumps
+from langchain_core.messages import message_chunk_to_message
 from langchain_google_genai import ChatGoogleGenerativeAI
-from backend.config.settings import GEMINI_API_KEY
+from backend.config.settings import GEMINI_API_KEY, LLM_PROVIDER, LLM_FAKE_LATENCY_MS, LLM_CASSETTE_PATH
+from backend.services.cassette import ReplayChatModel, cassette_key, get_cassette
+from backend.services.fake_llm import FakeChatModel
+from backend.services.llm_cache import build_llm_cache, make_cache_key
+from backend.services.llm_scheduler import llm_scheduler
+from backend.services.metrics import record_llm_call
+from backend.services.singleflight import SingleFlight
+
+LLM_PROVIDERS = ("gemini", "fake", "record", "replay")
+if LLM_PROVIDER not in LLM_PROVIDERS:
+    raise ValueError(f"Unknown LLM_PROVIDER '{LLM_PROVIDER}'. Choose from: {', '.join(LLM_PROVIDERS)}.")
+
+# Response cache shared by every cached LLM call (None when LLM_CACHE_BACKEND=none).
+# Recording skips it so that every request reaches the provider and lands on the cassette.
+llm_cache = build_llm_cache() if LLM_PROVIDER != "record" else None
+recording_cassette = get_cassette(LLM_CASSETTE_PATH) if LLM_PROVIDER == "record" else None
+
+# In-flight LLM requests, shared by every model instance below
+llm_flights = SingleFlight()
+
+async def _scheduled(fn):
+    start = time.perf_counter()
+    async with llm_scheduler.slot():
+        result = await fn()
+    record_llm_call("generate", time.perf_counter() - start, result.generations[0].message.usage_metadata)
+    return result
+
+async def _scheduled_stream(fn):
+    start = time.perf_counter()
+    usage = {}
+    async with llm_scheduler.slot():
+        async for chunk in fn():
+            for name, count in (getattr(chunk.message, "usage_metadata", None) or {}).items():
+                if isinstance(count, int):
+                    usage[name] = usage.get(name, 0) + count
+            yield chunk
+    record_llm_call("stream", time.perf_counter() - start, usage)
+
+async def _recorded(messages, tools, fn):
+    result = await fn()
+    recording_cassette.record(cassette_key(messages, tools), result.generations[0].message)
+    return result
+
+async def _recorded_stream(messages, tools, fn):
+    merged = None
+    async for chunk in fn():
+        merged = chunk if merged is None else merged + chunk
+        yield chunk
+    if merged is not None:
+        recording_cassette.record(cassette_key(messages, tools), message_chunk_to_message(merged.message))
+
+class CoalescingMixin:
+    """Makes identical concurrent async requests of a chat model share one upstream call.
+
+    Runs after the response cache, so only cache misses are coalesced. Each caller keeps
+    its own callbacks; the shared upstream call runs without a run manager, takes a
+    slot from the LLM admission scheduler and, when recording, is saved to the cassette.
+    """
 
-# Initialize the Gemini LLM
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=GEMINI_API_KEY)
+    def _flight_key(self, messages, stop=None, **kwargs) -> str:
+        return make_cache_key(dumps(messages), self._get_llm_string(stop=stop, **kwargs))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super()
+        call = lambda: parent._agenerate(messages, stop=stop, **kwargs)
+        if recording_cassette is not None:
+            call = partial(_recorded, messages, kwargs.get("tools"), call)
+        key = self._flight_key(messages, stop, **kwargs)
+        return await llm_flights.do(key, lambda: _scheduled(call))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super()
+        call = lambda: parent._astream(messages, stop=stop, **kwargs)
+        if recording_cassette is not None:
+            call = partial(_recorded_stream, messages, kwargs.get("tools"), call)
+        key = self._flight_key(messages, stop, **kwargs)
+        async for chunk in llm_flights.stream(key, lambda: _scheduled_stream(call)):
+            # Langchain stamps run ids onto chunks, so every caller gets its own copy
+            yield chunk.model_copy(deep=True)
+
+class CoalescingChatGoogleGenerativeAI(CoalescingMixin, ChatGoogleGenerativeAI):
+    """Gemini chat model with request coalescing and admission control."""
+
+class CoalescingFakeChatModel(CoalescingMixin, FakeChatModel):
+    """Offline fake model going through the same coalescing and admission path as Gemini."""
+
+class CoalescingReplayChatModel(CoalescingMixin, ReplayChatModel):
+    """Cassette replay model going through the same coalescing and admission path as Gemini."""
+
+def build_llm(cache: bool = True):
+    """Builds the chat model for LLM_PROVIDER."""
+    cache_setting = (llm_cache or False) if cache else False
+    if LLM_PROVIDER == "fake":
+        return CoalescingFakeChatModel(latency_seconds=LLM_FAKE_LATENCY_MS / 1000, cache=cache_setting)
+    if LLM_PROVIDER == "replay":
+        return CoalescingReplayChatModel(latency_seconds=LLM_FAKE_LATENCY_MS / 1000, cassette_path=LLM_CASSETTE_PATH, cache=cache_setting)
+    return CoalescingChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=GEMINI_API_KEY, cache=cache_setting)
+
+# Initialize the LLM
+llm = build_llm()
+# Same model with caching disabled, for personalized prompts that are unlikely to repeat
+uncached_llm = build_llm(cache=False)
 
 # You can add other client-related configurations or helper functions here if needed
 
-def get_llm():
-    """Returns the initialized LLM client."""
-    return llm
\ No newline at end of file
+def get_llm(cache: bool = True):
+    """Returns the initialized LLM client; pass cache=False to bypass the response cache."""
+    return llm if cache else uncached_llm
+
+def get_llm_cache_stats() -> dict:
+    """Returns hit/miss counters of the LLM response cache."""
+    return llm_cache.stats() if llm_cache is not None else {"backend": "none"}
+
+def get_llm_coalescing_stats() -> dict:
+    """Returns how many LLM calls and streams were shared with an identical in-flight request."""
+    return llm_flights.stats()
+
+def get_llm_scheduler_stats() -> dict:
+    """Returns concurrency, queue depth, queue wait and shedding counters of the LLM scheduler."""
+    return llm_scheduler.stats()
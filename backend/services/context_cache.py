@@ -0,0 +1,425 @@
+"""Per-user chat context cache (CONTEXT_CACHE_BACKEND: "memory", "sqlite" or "none").
+
+An entry holds what `get_user_context` loads for a user: the latest goal, the daily rollup
+counters of the last CONTEXT_DAYS days and the top foods. Writes keep entries current
+instead of just dropping them:
+  logs, food entries      their increments are added to the cached day; a food is counted in
+                          the top list if it's in it or the list isn't full, otherwise the
+                          list is reloaded on the next read
+  add_goal, update_goal   the goal is replaced with the stored one
+  goal analysis results   the analysis and targets of the cached goal are updated
+so a returning user's chat turn builds its context without database reads. Async code
+uses the `a`-prefixed methods, which run the SQLite backend in a worker thread.
+
+Each entry carries a version that every write bumps; a context loaded from the database is
+only stored if no write landed while it was loading. "memory" is per process, so with
+several workers use "sqlite" (a file on a disk they share), or entries of writes served by
+another worker are only corrected by the TTL.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.config.settings import CONTEXT_CACHE_BACKEND, CONTEXT_CACHE_MAX_ENTRIES, CONTEXT_CACHE_PATH, CONTEXT_CACHE_TTL_SECONDS
+from backend.services.rollups import COUNTERS, as_date, daily_increments, food_increments, log_increments
+from models.db_models import analysis_targets
+
+CONTEXT_DAYS = 30
+TOP_FOODS_LIMIT = 5
+
+
+# --- Patches: pure functions of an entry --- #
+def _in_window(entry: dict, day: date) -> bool:
+    built = date.fromisoformat(entry["built_for"])
+    return built - timedelta(days=CONTEXT_DAYS) <= day <= built
+
+
+def add_increments(entry: dict, day: date, increments: Dict[str, float]):
+    """Adds a write's rollup increments to the entry's counters for `day` (newest first, like the query)."""
+    if not _in_window(entry, day):
+        return
+    key = day.isoformat()
+    row = next((row for row in entry["rollups"] if row["day"] == key), None)
+    if row is None:
+        row = {"day": key, **{name: 0 for name in COUNTERS}}
+        entry["rollups"].append(row)
+        entry["rollups"].sort(key=lambda row: row["day"], reverse=True)
+    for name, value in increments.items():
+        row[name] += value
+
+
+def add_food(entry: dict, item_name: str, calories: int, day: date):
+    """Counts a food entry in the cached top foods, or marks them for reloading when the ranking can't be known."""
+    if entry["top_foods"] is None or not _in_window(entry, day):
+        return
+    name = (item_name or "").strip().lower()
+    if not name:
+        return
+    food = next((food for food in entry["top_foods"] if food["item_name"] == name), None)
+    if food is None and len(entry["top_foods"]) >= TOP_FOODS_LIMIT:
+        # Its earlier count is unknown, so it might now outrank the last one
+        entry["top_foods"] = None
+        return
+    if food is None:
+        food = {"item_name": name, "count": 0, "calories": 0}
+        entry["top_foods"].append(food)
+    food["count"] += 1
+    food["calories"] += calories or 0
+    entry["top_foods"].sort(key=lambda food: (-food["count"], food["item_name"]))
+
+
+def _created_day(row: dict) -> date:
+    return as_date(row["created_at"])
+
+
+# --- Backends --- #
+class ContextCacheBase:
+    """Hit/miss/patch counters and the write-through API shared by the backends."""
+
+    backend_name = "none"
+    blocking = False # Calls do file I/O (and may wait for another worker's lock)
+
+    def _init_stats(self):
+        self.hits = 0
+        self.partial_hits = 0 # Entry found with a part marked for reloading
+        self.misses = 0
+        self.patches = 0
+        self.stale_puts = 0 # Loads discarded because a write landed meanwhile
+        self.evictions = 0
+        self.errors = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.partial_hits + self.misses
+        return {
+            "backend": self.backend_name,
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "patches": self.patches,
+            "stale_puts": self.stale_puts,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "size": len(self),
+        }
+
+    def _count_lookup(self, entry: Optional[dict]):
+        if entry is None:
+            self.misses += 1
+        elif entry["goal"] is False or entry["top_foods"] is None:
+            self.partial_hits += 1
+        else:
+            self.hits += 1
+
+    def new_entry(self, today: date) -> dict:
+        # goal False: not loaded (None means the user has no goal); top_foods None: not loaded
+        return {"built_for": today.isoformat(), "goal": False, "rollups": None, "top_foods": None}
+
+    def get(self, user_id: int, today: date) -> Tuple[Optional[dict], int]:
+        """(entry or None, version); an entry built on another day is a miss, its window has moved."""
+        raise NotImplementedError
+
+    def put(self, user_id: int, entry: dict, version: int):
+        """Stores a loaded entry unless a write bumped the version since `get` returned `version`."""
+        raise NotImplementedError
+
+    def patch(self, user_id: int, fn: Callable[[dict], None]):
+        """Applies `fn` to the user's entry, if any, and bumps the version either way."""
+        raise NotImplementedError
+
+    # Write-through hooks called by db_service / async_db_service after a commit
+    def record_entries(self, log_rows: List[dict], food_rows: List[dict]):
+        """Logs and food entries (dicts with user_id and created_at) that were just stored."""
+        for user_id in {row["user_id"] for row in log_rows} | {row["user_id"] for row in food_rows}:
+            logs = [row for row in log_rows if row["user_id"] == user_id]
+            foods = [row for row in food_rows if row["user_id"] == user_id]
+
+            def apply(entry: dict, logs=logs, foods=foods):
+                for increments_fn, rows in ((log_increments, logs), (food_increments, foods)):
+                    for (_, day), increments in daily_increments(rows, increments_fn).items():
+                        add_increments(entry, day, increments)
+                for row in foods:
+                    add_food(entry, row["item_name"], row["calories"], _created_day(row))
+            self.patch(user_id, apply)
+
+    def record_goal(self, user_id: int, goal: Optional[dict], latest: bool = True):
+        """A goal that was added (`latest`) or updated; an update of an older goal leaves the cached one alone."""
+        def apply(entry: dict):
+            if latest or (entry["goal"] and entry["goal"].get("id") == goal.get("id")):
+                entry["goal"] = goal
+        self.patch(user_id, apply)
+
+    def record_goal_analysis(self, user_id: int, goal_id: int, analysis_result: dict):
+        """A background analysis stored on goal `goal_id` (see set_goal_analysis)."""
+        def apply(entry: dict):
+            if entry["goal"] and entry["goal"].get("id") == goal_id:
+                entry["goal"].update(analysis_result=analysis_result, **analysis_targets(analysis_result))
+        self.patch(user_id, apply)
+
+    # Async variants; blocking backends run in a thread so a busy cache file doesn't stall the event loop
+    async def _off_loop(self, fn, *args, **kwargs):
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    async def aget(self, user_id: int, today: date) -> Tuple[Optional[dict], int]:
+        return await self._off_loop(self.get, user_id, today)
+
+    async def aput(self, user_id: int, entry: dict, version: int):
+        await self._off_loop(self.put, user_id, entry, version)
+
+    async def arecord_entries(self, log_rows: List[dict], food_rows: List[dict]):
+        await self._off_loop(self.record_entries, log_rows, food_rows)
+
+    async def arecord_goal(self, user_id: int, goal: Optional[dict], latest: bool = True):
+        await self._off_loop(self.record_goal, user_id, goal, latest)
+
+    async def arecord_goal_analysis(self, user_id: int, goal_id: int, analysis_result: dict):
+        await self._off_loop(self.record_goal_analysis, user_id, goal_id, analysis_result)
+
+    def __len__(self):
+        return 0
+
+
+class NoContextCache(ContextCacheBase):
+    def __init__(self):
+        self._init_stats()
+
+    def get(self, user_id: int, today: date) -> Tuple[Optional[dict], int]:
+        self.misses += 1
+        return None, 0
+
+    def put(self, user_id: int, entry: dict, version: int):
+        pass
+
+    def patch(self, user_id: int, fn: Callable[[dict], None]):
+        pass
+
+
+class MemoryContextCache(ContextCacheBase):
+    """In-process LRU with TTL; versions of users without an entry are kept as tombstones in the same LRU.
+
+    Versions come from one write clock. Evicting a slot raises `_floor` to its version, and
+    users without a slot report the floor, so a load that started before an evicted write
+    can't match any more.
+    """
+
+    backend_name = "memory"
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, list]" = OrderedDict() # user_id -> [expires_at, version, entry or None]
+        self._clock = 0 # Bumped by every write
+        self._floor = 0 # Highest version of an evicted slot
+        self._lock = threading.Lock()
+        self._init_stats()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _trim(self):
+        while len(self._entries) > self.max_entries:
+            _, slot = self._entries.popitem(last=False)
+            self._floor = max(self._floor, slot[1])
+            self.evictions += 1
+
+    def _version(self, slot: Optional[list]) -> int:
+        return slot[1] if slot else self._floor
+
+    def get(self, user_id: int, today: date) -> Tuple[Optional[dict], int]:
+        with self._lock:
+            slot = self._entries.get(user_id)
+            version = self._version(slot)
+            entry = slot[2] if slot else None
+            if entry is not None and (slot[0] < time.monotonic() or entry["built_for"] != today.isoformat()):
+                slot[2] = entry = None
+                self.evictions += 1
+            if slot:
+                self._entries.move_to_end(user_id)
+            self._count_lookup(entry)
+            # A copy, so patches don't change a context a request is still using
+            return (json.loads(json.dumps(entry)) if entry is not None else None), version
+
+    def put(self, user_id: int, entry: dict, version: int):
+        with self._lock:
+            if self._version(self._entries.get(user_id)) != version:
+                self.stale_puts += 1
+                return
+            self._entries[user_id] = [time.monotonic() + self.ttl_seconds, version, json.loads(json.dumps(entry))]
+            self._entries.move_to_end(user_id)
+            self._trim()
+
+    def patch(self, user_id: int, fn: Callable[[dict], None]):
+        with self._lock:
+            self._clock += 1
+            slot = self._entries.get(user_id)
+            if slot is None:
+                self._entries[user_id] = [0.0, self._clock, None]
+                self._trim()
+                return
+            slot[1] = self._clock
+            if slot[2] is not None:
+                fn(slot[2])
+                self.patches += 1
+
+
+class SQLiteContextCache(ContextCacheBase):
+    """The same cache in a SQLite file, shared by every worker that opens it.
+
+    The write clock and the eviction floor live in `user_context_meta`, so the version
+    check holds across workers too.
+    """
+
+    backend_name = "sqlite"
+    blocking = True
+
+    def __init__(self, path: str = ".context_cache.sqlite", max_entries: int = 10000, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_context ("
+            " user_id INTEGER PRIMARY KEY, value TEXT, version INTEGER NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_user_context_last_used ON user_context (last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS user_context_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        # The clock starts above any version already in the file
+        self._conn.execute("INSERT OR IGNORE INTO user_context_meta VALUES ('clock', (SELECT COALESCE(MAX(version), 0) FROM user_context)), ('floor', 0)")
+        self._init_stats()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM user_context").fetchone()[0]
+
+    def _transaction(self, fn: Callable[[], object]):
+        # Other workers write the same rows, so read-modify-write holds the write lock
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn()
+            self._conn.execute("COMMIT")
+            return result
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _version(self, user_id: int) -> int:
+        return self._conn.execute(
+            "SELECT COALESCE((SELECT version FROM user_context WHERE user_id = ?), (SELECT value FROM user_context_meta WHERE name = 'floor'))",
+            (user_id,),
+        ).fetchone()[0]
+
+    def _trim(self):
+        overflow = self._conn.execute("SELECT COUNT(*) FROM user_context").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            oldest = "SELECT user_id FROM user_context ORDER BY last_used LIMIT ?"
+            self._conn.execute(
+                f"UPDATE user_context_meta SET value = MAX(value, (SELECT COALESCE(MAX(version), 0) FROM user_context WHERE user_id IN ({oldest}))) WHERE name = 'floor'",
+                (overflow,),
+            )
+            self._conn.execute(f"DELETE FROM user_context WHERE user_id IN ({oldest})", (overflow,))
+            self.evictions += overflow
+
+    # Cache errors (e.g. the file stays locked past the timeout) are logged, never raised into
+    # the request or the write that called; a failed patch leaves the entry to the TTL
+    def get(self, user_id: int, today: date) -> Tuple[Optional[dict], int]:
+        try:
+            return self._get(user_id, today)
+        except sqlite3.Error as e:
+            print(f"Error reading context cache: {e}")
+            self.errors += 1
+            return None, -1 # Matches no version, so the load isn't stored
+
+    def put(self, user_id: int, entry: dict, version: int):
+        try:
+            self._put(user_id, entry, version)
+        except sqlite3.Error as e:
+            print(f"Error storing context cache entry: {e}")
+            self.errors += 1
+
+    def patch(self, user_id: int, fn: Callable[[dict], None]):
+        try:
+            self._patch(user_id, fn)
+        except sqlite3.Error as e:
+            print(f"Error updating context cache entry: {e}")
+            self.errors += 1
+
+    def _get(self, user_id: int, today: date) -> Tuple[Optional[dict], int]:
+        now = time.time()
+        with self._lock:
+            # One statement, so the row and the floor come from the same snapshot
+            value, version, expires_at, found = self._conn.execute(
+                "SELECT u.value, COALESCE(u.version, (SELECT value FROM user_context_meta WHERE name = 'floor')), u.expires_at, u.user_id IS NOT NULL"
+                " FROM (SELECT ? AS user_id) AS k LEFT JOIN user_context AS u ON u.user_id = k.user_id",
+                (user_id,),
+            ).fetchone()
+            entry = json.loads(value) if value is not None else None
+            if entry is not None and (expires_at < now or entry["built_for"] != today.isoformat()):
+                entry = None
+                self.evictions += 1
+            if found:
+                try:
+                    self._conn.execute("UPDATE user_context SET last_used = ? WHERE user_id = ?", (now, user_id))
+                except sqlite3.OperationalError:
+                    pass # Locked by a writer past the timeout; the LRU order is only a hint
+            self._count_lookup(entry)
+        return entry, version
+
+    def _put(self, user_id: int, entry: dict, version: int):
+        now = time.time()
+
+        def store() -> bool:
+            if self._version(user_id) != version:
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO user_context (user_id, value, version, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (user_id, json.dumps(entry), version, now + self.ttl_seconds, now),
+            )
+            self._trim()
+            return True
+
+        with self._lock:
+            if not self._transaction(store):
+                self.stale_puts += 1
+
+    def _patch(self, user_id: int, fn: Callable[[dict], None]):
+        now = time.time()
+
+        def apply():
+            self._conn.execute("UPDATE user_context_meta SET value = value + 1 WHERE name = 'clock'")
+            clock = self._conn.execute("SELECT value FROM user_context_meta WHERE name = 'clock'").fetchone()[0]
+            row = self._conn.execute("SELECT value FROM user_context WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None:
+                self._conn.execute("INSERT INTO user_context (user_id, value, version, expires_at, last_used) VALUES (?, NULL, ?, 0, ?)", (user_id, clock, now))
+                self._trim()
+            elif row[0] is None:
+                self._conn.execute("UPDATE user_context SET version = ? WHERE user_id = ?", (clock, user_id))
+            else:
+                entry = json.loads(row[0])
+                fn(entry)
+                self._conn.execute("UPDATE user_context SET value = ?, version = ? WHERE user_id = ?", (json.dumps(entry), clock, user_id))
+                self.patches += 1
+
+        with self._lock:
+            self._transaction(apply)
+
+
+def build_context_cache(backend: str = CONTEXT_CACHE_BACKEND) -> ContextCacheBase:
+    """Builds the configured cache backend ('memory', 'sqlite' or 'none')."""
+    if backend == "memory":
+        return MemoryContextCache(max_entries=CONTEXT_CACHE_MAX_ENTRIES, ttl_seconds=CONTEXT_CACHE_TTL_SECONDS)
+    if backend == "sqlite":
+        return SQLiteContextCache(path=CONTEXT_CACHE_PATH, max_entries=CONTEXT_CACHE_MAX_ENTRIES, ttl_seconds=CONTEXT_CACHE_TTL_SECONDS)
+    if backend == "none":
+        return NoContextCache()
+    raise ValueError(f"Unknown CONTEXT_CACHE_BACKEND '{backend}'. Choose from: memory, sqlite, none.")
+
+
+context_cache = build_context_cache()
@@ -0,0 +1,208 @@
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, date
+from typing import List, Optional
+
+from backend.config.settings import CONTEXT_TOKEN_BUDGET
+
+TARGET_KEYS = (
+    ("target_calories", "kcal"),
+    ("target_water_intake_liters", "water_l"),
+    ("target_sleep_hours", "sleep_h"),
+    ("target_steps", "steps"),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English/JSON text)."""
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class CompactContext:
+    """A compacted user context and how many prompt tokens it saved."""
+    text: str
+    raw_tokens: int
+    compact_tokens: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.raw_tokens - self.compact_tokens)
+
+
+def _entry_day(entry: dict) -> Optional[date]:
+    created_at = entry.get("created_at")
+    if not created_at:
+        return None
+    if isinstance(created_at, datetime):
+        return created_at.date()
+    try:
+        return datetime.fromisoformat(str(created_at)).date()
+    except ValueError:
+        return None
+
+
+def _fmt(value, digits: int = 1) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float) and not value.is_integer():
+        return f"{value:.{digits}f}"
+    return str(int(value))
+
+
+def daily_rollups(recent_logs: List[dict], recent_food_entries: List[dict]) -> List[dict]:
+    """Rolls logs and food entries up into one row per day, most recent first."""
+    days = defaultdict(lambda: {"steps": 0, "sleep_sum": 0.0, "sleep_n": 0, "water_sum": 0.0, "water_n": 0, "log_kcal": 0.0, "food_kcal": 0})
+    for log in recent_logs:
+        day = _entry_day(log)
+        if day is None:
+            continue
+        row = days[day]
+        row["steps"] += log.get("steps") or 0
+        if log.get("sleep_hours") is not None:
+            row["sleep_sum"] += log["sleep_hours"]
+            row["sleep_n"] += 1
+        if log.get("water_intake") is not None:
+            row["water_sum"] += log["water_intake"]
+            row["water_n"] += 1
+        row["log_kcal"] += log.get("calories") or 0
+    for food in recent_food_entries:
+        day = _entry_day(food)
+        if day is None:
+            continue
+        days[day]["food_kcal"] += food.get("calories") or 0
+
+    rollups = []
+    for day in sorted(days, reverse=True):
+        row = days[day]
+        rollups.append({
+            "day": day,
+            "steps": row["steps"],
+            "sleep_hours": row["sleep_sum"] / row["sleep_n"] if row["sleep_n"] else None,
+            "water_intake": row["water_sum"] / row["water_n"] if row["water_n"] else None,
+            "calories": row["log_kcal"] + row["food_kcal"],
+        })
+    return rollups
+
+
+def _average(rows: List[dict], key: str) -> Optional[float]:
+    values = [row[key] for row in rows if row[key] is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _weekly_lines(rollups: List[dict]) -> List[str]:
+    """7-day averages with the change versus the previous 7 days."""
+    if not rollups:
+        return []
+    latest = rollups[0]["day"]
+    this_week = [row for row in rollups if (latest - row["day"]).days < 7]
+    last_week = [row for row in rollups if 7 <= (latest - row["day"]).days < 14]
+    lines = ["7d avg|steps|sleep_h|water_l|kcal"]
+    current = [_average(this_week, key) for key in ("steps", "sleep_hours", "water_intake", "calories")]
+    lines.append("this|" + "|".join(_fmt(value) for value in current))
+    if last_week:
+        previous = [_average(last_week, key) for key in ("steps", "sleep_hours", "water_intake", "calories")]
+        lines.append("prev|" + "|".join(_fmt(value) for value in previous))
+        trends = []
+        for value, prior in zip(current, previous):
+            if value is None or prior is None or prior == 0:
+                trends.append("-")
+            else:
+                trends.append(f"{(value - prior) / prior * 100:+.0f}%")
+        lines.append("trend|" + "|".join(trends))
+    return lines
+
+
+def top_foods(recent_food_entries: List[dict], limit: int = 5) -> List[dict]:
+    """The most logged foods as {item_name, count, calories}, like db_service.get_top_foods computes in SQL."""
+    counts = Counter()
+    calories = defaultdict(int)
+    for food in recent_food_entries:
+        name = (food.get("item_name") or "").strip().lower()
+        if not name:
+            continue
+        counts[name] += 1
+        calories[name] += food.get("calories") or 0
+    return [{"item_name": name, "count": count, "calories": calories[name]} for name, count in counts.most_common(limit)]
+
+
+def _top_foods_line(foods: List[dict]) -> Optional[str]:
+    if not foods:
+        return None
+    return "Top foods (x times, total kcal): " + ", ".join(f"{food['item_name']} x{food['count']} {food['calories']}" for food in foods)
+
+
+def _raw_context_text(user_context: dict) -> str:
+    """What the planner used to put in the prompt: the repr of every log and food entry."""
+    user_profile = user_context.get('user_profile') or {}
+    user_goal = user_context.get('goal') or {}
+    recent_logs = user_context.get('recent_logs') or []
+    recent_food_entries = user_context.get('recent_food_entries') or []
+    text = ""
+    if user_profile:
+        text += f"User: {user_profile.get('name', 'N/A')}, Email: {user_profile.get('email', 'N/A')}.\n"
+    if user_goal:
+        text += f"Current Goal: {user_goal.get('goal_description', 'N/A')}. Analysis: {user_goal.get('analysis_result', 'N/A')}.\n"
+    if recent_logs:
+        text += f"Recent Logs (last {len(recent_logs)} entries): {recent_logs}.\n"
+    if recent_food_entries:
+        text += f"Recent Food Entries (last {len(recent_food_entries)} entries): {recent_food_entries}.\n"
+    return text
+
+
+def compact_user_context(user_context: Optional[dict], token_budget: int = CONTEXT_TOKEN_BUDGET) -> CompactContext:
+    """Renders the user context as rolled-up daily/weekly stats and top foods within `token_budget`.
+
+    Sections are added in priority order (profile, goal, weekly trend, top foods, daily
+    rows from newest to oldest) and whatever no longer fits the budget is dropped.
+    """
+    user_context = user_context or {}
+    user_profile = user_context.get('user_profile') or {}
+    user_goal = user_context.get('goal') or {}
+    recent_logs = user_context.get('recent_logs') or []
+    recent_food_entries = user_context.get('recent_food_entries') or []
+
+    lines: List[str] = []
+    used = 0
+
+    def add(line: str) -> bool:
+        nonlocal used
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            return False
+        lines.append(line)
+        used += cost
+        return True
+
+    if user_profile:
+        add(f"User: {user_profile.get('name', 'N/A')}.")
+    if user_goal:
+        add(f"Current Goal: {user_goal.get('goal_text') or user_goal.get('goal_description') or 'N/A'}.")
+        analysis = user_goal.get('analysis_result')
+        if isinstance(analysis, dict):
+            targets = [f"{label}={_fmt(analysis[key])}" for key, label in TARGET_KEYS if analysis.get(key) is not None]
+            if targets:
+                add("Daily targets: " + ", ".join(targets) + ".")
+
+    rollups = user_context.get('daily_rollups')
+    if rollups is None:
+        rollups = daily_rollups(recent_logs, recent_food_entries)
+    else:
+        # Rows from the daily_rollups table, already newest first
+        rollups = [{**row, "day": _entry_day({"created_at": row["day"]})} for row in rollups]
+    for line in _weekly_lines(rollups):
+        if not add(line):
+            break
+    foods = user_context.get('top_foods')
+    top_foods_line = _top_foods_line(foods if foods is not None else top_foods(recent_food_entries))
+    if top_foods_line:
+        add(top_foods_line)
+    if rollups:
+        if add(f"Daily ({len(rollups)} days logged, newest first) date|steps|sleep_h|water_l|kcal"):
+            for row in rollups:
+                line = f"{row['day'].strftime('%m-%d')}|{row['steps']}|{_fmt(row['sleep_hours'])}|{_fmt(row['water_intake'])}|{_fmt(row['calories'], 0)}"
+                if not add(line):
+                    break
+
+    text = "\n".join(lines)
+    return CompactContext(text=text, raw_tokens=estimate_tokens(_raw_context_text(user_context)), compact_tokens=estimate_tokens(text))
@@ -1,10 +1,13 @@
 from typing import Optional
+from sqlalchemy import func, insert, select
 from sqlalchemy.orm import Session
-import json
 from datetime import datetime, timedelta
-from models.db_models import Goal, FoodEntry, User, Log
+from models.db_models import GOAL_TARGETS, Goal, FoodEntry, User, Log, analysis_targets
 from backend.schemas import UserCreate
 from backend.services.auth_service import get_password_hash
+from backend.services.bulk_logs import needs_now, owned_by, stamp_rows
+from backend.services.context_cache import context_cache
+from backend.services.rollups import bump_daily_rollup, daily_increments, food_increments, log_increments
 
 def get_user_by_id(db: Session, user_id: int):
     return db.query(User).filter(User.id == user_id).first()
@@ -27,7 +30,6 @@ def add_goal(db: Session, user_id: int, goal_text: str, goal_type: str, target_w
         db_goal = Goal(
             user_id=user_id,
             goal_text=goal_text,
-            analysis_result=json.dumps(analysis_result),
             current_weight=current_weight,
             height=height,
             age=age,
@@ -41,9 +43,11 @@ def add_goal(db: Session, user_id: int, goal_text: str, goal_type: str, target_w
             preferences=preferences,
             allergies=allergies
         )
+        db_goal.set_analysis(analysis_result)
         db.add(db_goal)
         db.commit()
         db.refresh(db_goal)
+        context_cache.record_goal(user_id, db_goal.to_dict())
         return db_goal
     except Exception as e:
         db.rollback()
@@ -52,18 +56,30 @@ def add_goal(db: Session, user_id: int, goal_text: str, goal_type: str, target_w
         print(f"Error adding goal: {e}")
         return None
 
+def set_goal_analysis(db: Session, goal_id: int, analysis_result: dict) -> bool:
+    """Stores the result of a background goal analysis on an existing goal."""
+    try:
+        user_id = db.query(Goal.user_id).filter(Goal.id == goal_id).scalar()
+        if user_id is None:
+            return False
+        db.query(Goal).filter(Goal.id == goal_id).update({"analysis_result": analysis_result, **analysis_targets(analysis_result)}, synchronize_session=False)
+        db.commit()
+        context_cache.record_goal_analysis(user_id, goal_id, analysis_result)
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"Error saving goal analysis: {e}")
+        return False
+
 def get_goal_by_id(db: Session, goal_id: int):
-    db_goal = db.query(Goal).filter(Goal.id == goal_id).first()
-    if db_goal and db_goal.analysis_result:
-        db_goal.analysis_result = json.loads(db_goal.analysis_result)
-    return db_goal
+    return db.query(Goal).filter(Goal.id == goal_id).first()
 
 def update_goal(db: Session, goal_id: int, goal_text: str, goal_type: Optional[str] = None, target_weight: Optional[float] = None, timeframe: Optional[str] = None, activity_level: Optional[str] = None, preferences: Optional[str] = None, allergies: Optional[str] = None, analysis_result: dict = None, current_weight: Optional[float] = None, height: Optional[float] = None, age: Optional[int] = None, gender: Optional[str] = None, calculated_bmi: Optional[float] = None, calculated_bmr: Optional[float] = None):
     try:
         db_goal = db.query(Goal).filter(Goal.id == goal_id).first()
         if db_goal:
             db_goal.goal_text = goal_text
-            db_goal.analysis_result = json.dumps(analysis_result)
+            db_goal.set_analysis(analysis_result)
             db_goal.current_weight = current_weight
             db_goal.height = height
             db_goal.age = age
@@ -78,6 +94,7 @@ def update_goal(db: Session, goal_id: int, goal_text: str, goal_type: Optional[s
             db_goal.allergies = allergies if allergies is not None else db_goal.allergies
             db.commit()
             db.refresh(db_goal)
+            context_cache.record_goal(db_goal.user_id, db_goal.to_dict(), latest=False)
         return db_goal
     except Exception as e:
         db.rollback()
@@ -89,8 +106,12 @@ def add_log(db: Session, user_id: int, steps: int, sleep_hours: float, water_int
     try:
         db_log = Log(user_id=user_id, steps=steps, sleep_hours=sleep_hours, water_intake=water_intake, calories=calories)
         db.add(db_log)
+        db.flush()
+        db.refresh(db_log, ["created_at"]) # Server-side timestamp decides the rollup day
+        bump_daily_rollup(db, user_id, db_log.created_at.date(), log_increments(db_log))
         db.commit()
         db.refresh(db_log)
+        context_cache.record_entries([db_log.to_dict()], [])
         return db_log
     except Exception as e:
         db.rollback()
@@ -101,14 +122,66 @@ def add_food_log(db: Session, user_id: int, item_name: str, calories: int, confi
     try:
         db_food_entry = FoodEntry(user_id=user_id, item_name=item_name, calories=calories, confirmed=confirmed)
         db.add(db_food_entry)
+        db.flush()
+        db.refresh(db_food_entry, ["created_at"])
+        bump_daily_rollup(db, user_id, db_food_entry.created_at.date(), food_increments(db_food_entry))
         db.commit()
         db.refresh(db_food_entry)
+        context_cache.record_entries([], [db_food_entry.to_dict()])
         return db_food_entry
     except Exception as e:
         db.rollback()
         print(f"Error adding food log: {e}")
         return None
 
+def returns_ids(dialect) -> bool:
+    """Whether a multi-row INSERT can return the new ids in row order (not on MySQL)."""
+    return bool(getattr(dialect, "insert_executemany_returning_sort_by_parameter_order", False))
+
+def insert_ids_statement(model):
+    return insert(model).returning(model.id, sort_by_parameter_order=True)
+
+def add_entries(db: Session, log_rows: list, food_rows: list, with_ids: bool = False) -> bool:
+    """Inserts logs and food entries (dicts of their columns incl. user_id; created_at None meaning now)
+    with multi-row INSERTs and one rollup bump per user and day, all in one transaction.
+
+    With `with_ids` each row gets its new `id` once committed; databases without RETURNING for
+    multi-row INSERTs insert row by row then (still in the one transaction).
+    """
+    try:
+        now = db.execute(select(func.now())).scalar() if needs_now(log_rows) or needs_now(food_rows) else None
+        ids = []
+        for model, rows, increments in ((Log, log_rows, log_increments), (FoodEntry, food_rows, food_increments)):
+            if not rows:
+                continue
+            stamp_rows(rows, now)
+            if not with_ids:
+                db.execute(insert(model), rows)
+            elif returns_ids(db.get_bind().dialect):
+                ids.append((rows, db.execute(insert_ids_statement(model), rows).scalars().all()))
+            else:
+                ids.append((rows, [db.execute(insert(model).values(**row)).inserted_primary_key[0] for row in rows]))
+            for (user_id, day), totals in daily_increments(rows, increments).items():
+                bump_daily_rollup(db, user_id, day, totals)
+        db.commit()
+        # Only after the commit, so a retry of a failed batch doesn't insert explicit ids
+        for rows, row_ids in ids:
+            for row, row_id in zip(rows, row_ids):
+                row["id"] = row_id
+        context_cache.record_entries(log_rows, food_rows)
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"Error adding entries: {e}")
+        return False
+
+def add_logs(db: Session, user_id: int, rows: list):
+    """Bulk `add_log`; returns the stored rows (with their timestamps) or None on failure."""
+    return rows if add_entries(db, owned_by(rows, user_id), []) else None
+
+def add_food_logs(db: Session, user_id: int, rows: list):
+    return rows if add_entries(db, [], owned_by(rows, user_id)) else None
+
 def get_logs_by_date_range(db: Session, user_id: int, start_date: datetime, end_date: datetime):
     try:
         logs = db.query(Log).filter(Log.user_id == user_id, Log.created_at >= start_date, Log.created_at <= end_date).all()
@@ -125,12 +198,110 @@ def get_food_entries_by_date_range(db: Session, user_id: int, start_date: dateti
         print(f"Error retrieving food entries: {e}")
         return []
 
+# --- Read models: column projections and SQL aggregates (no ORM entities) --- #
+# The statements are shared with async_db_service.
+def log_rows_statement(user_id: int, start_date: datetime, end_date: datetime):
+    return (
+        select(Log.created_at, Log.steps, Log.sleep_hours, Log.water_intake, Log.calories)
+        .where(Log.user_id == user_id, Log.created_at >= start_date, Log.created_at <= end_date)
+        .order_by(Log.created_at)
+    )
+
+def food_rows_statement(user_id: int, start_date: datetime, end_date: datetime):
+    return (
+        select(FoodEntry.created_at, FoodEntry.item_name, FoodEntry.calories)
+        .where(FoodEntry.user_id == user_id, FoodEntry.created_at >= start_date, FoodEntry.created_at <= end_date)
+        .order_by(FoodEntry.created_at)
+    )
+
+def daily_log_totals_statement(user_id: int, start_date: datetime, end_date: datetime):
+    day = func.date(Log.created_at).label("day")
+    return (
+        select(
+            day,
+            func.count(Log.id).label("entries"),
+            func.coalesce(func.sum(Log.steps), 0).label("steps"),
+            func.avg(Log.sleep_hours).label("avg_sleep_hours"),
+            func.avg(Log.water_intake).label("avg_water_intake"),
+            func.coalesce(func.sum(Log.calories), 0).label("calories"),
+        )
+        .where(Log.user_id == user_id, Log.created_at >= start_date, Log.created_at <= end_date)
+        .group_by(day)
+        .order_by(day.desc())
+    )
+
+def daily_food_totals_statement(user_id: int, start_date: datetime, end_date: datetime):
+    day = func.date(FoodEntry.created_at).label("day")
+    return (
+        select(day, func.count(FoodEntry.id).label("entries"), func.coalesce(func.sum(FoodEntry.calories), 0).label("calories"))
+        .where(FoodEntry.user_id == user_id, FoodEntry.created_at >= start_date, FoodEntry.created_at <= end_date)
+        .group_by(day)
+        .order_by(day.desc())
+    )
+
+def top_foods_statement(user_id: int, start_date: datetime, end_date: datetime, limit: int = 5):
+    name = func.lower(func.trim(FoodEntry.item_name)).label("item_name")
+    count = func.count(FoodEntry.id).label("count")
+    return (
+        select(name, count, func.coalesce(func.sum(FoodEntry.calories), 0).label("calories"))
+        .where(FoodEntry.user_id == user_id, FoodEntry.created_at >= start_date, FoodEntry.created_at <= end_date, func.trim(FoodEntry.item_name) != "")
+        .group_by(name)
+        .order_by(count.desc(), name)
+        .limit(limit)
+    )
+
+def get_log_rows(db: Session, user_id: int, start_date: datetime, end_date: datetime):
+    """(created_at, steps, sleep_hours, water_intake, calories) rows, oldest first."""
+    try:
+        return db.execute(log_rows_statement(user_id, start_date, end_date)).all()
+    except Exception as e:
+        print(f"Error retrieving log rows: {e}")
+        return []
+
+def get_food_rows(db: Session, user_id: int, start_date: datetime, end_date: datetime):
+    """(created_at, item_name, calories) rows, oldest first."""
+    try:
+        return db.execute(food_rows_statement(user_id, start_date, end_date)).all()
+    except Exception as e:
+        print(f"Error retrieving food rows: {e}")
+        return []
+
+def get_daily_log_totals(db: Session, user_id: int, start_date: datetime, end_date: datetime):
+    """One (day, entries, steps, avg_sleep_hours, avg_water_intake, calories) row per day with logs, newest first."""
+    try:
+        return db.execute(daily_log_totals_statement(user_id, start_date, end_date)).all()
+    except Exception as e:
+        print(f"Error aggregating logs: {e}")
+        return []
+
+def get_daily_food_totals(db: Session, user_id: int, start_date: datetime, end_date: datetime):
+    """One (day, entries, calories) row per day with food entries, newest first."""
+    try:
+        return db.execute(daily_food_totals_statement(user_id, start_date, end_date)).all()
+    except Exception as e:
+        print(f"Error aggregating food entries: {e}")
+        return []
+
+def get_top_foods(db: Session, user_id: int, start_date: datetime, end_date: datetime, limit: int = 5):
+    """The most logged foods as (item_name, count, calories) rows; names are compared trimmed and lowercased."""
+    try:
+        return db.execute(top_foods_statement(user_id, start_date, end_date, limit)).all()
+    except Exception as e:
+        print(f"Error aggregating top foods: {e}")
+        return []
+
+def goal_targets_statement(user_id: int):
+    """The promoted target columns of the user's latest goal, without loading the goal."""
+    return select(*(getattr(Goal, name) for name in GOAL_TARGETS)).where(Goal.user_id == user_id).order_by(Goal.created_at.desc()).limit(1)
+
+def get_goal_targets(db: Session, user_id: int) -> dict:
+    """Set targets of the latest goal, e.g. {"target_steps": 8000}; empty without a goal or analysis."""
+    row = db.execute(goal_targets_statement(user_id)).first()
+    return {name: value for name, value in row._mapping.items() if value is not None} if row else {}
+
 def get_goal_by_user_id(db: Session, user_id: int):
     try:
-        db_goal = db.query(Goal).filter(Goal.user_id == user_id).order_by(Goal.created_at.desc()).first()
-        if db_goal and db_goal.analysis_result:
-            db_goal.analysis_result = json.loads(db_goal.analysis_result)
-        return db_goal
+        return db.query(Goal).filter(Goal.user_id == user_id).order_by(Goal.created_at.desc()).first()
     except Exception as e:
         print(f"Error retrieving goal by user ID: {e}")
         return None
\ No newline at end of file
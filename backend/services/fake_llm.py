@@ -0,0 +1,138 @@
+import asyncio
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from backend.services.context_compactor import estimate_tokens
+from backend.services.prerouter import INTENT_PATTERNS, Slots, Unsure, extract_slots
+from backend.services.tools import compute_bmr
+
+# Tool the fake agent calls when the user's message matches the pattern
+TOOL_INTENTS = {
+    "bmi_calculator": INTENT_PATTERNS["bmi"],
+    "bmr_calculator": INTENT_PATTERNS["bmr"],
+    "calorie_estimator": INTENT_PATTERNS["calories"],
+    "user_log_summary_tool": re.compile(r"\b(?:logs?|progress|summar\w*|this week)\b", re.I),
+}
+# Used for tool arguments the message does not mention
+DEFAULT_SLOTS = {"weight_kg": 70.0, "height_cm": 175.0, "age_years": 30, "gender": "male", "activity_level": "moderate", "goal": "maintain_weight"}
+
+
+def last_human_text(messages: List[BaseMessage]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message.content if isinstance(message.content, str) else str(message.content)
+    return ""
+
+
+def _slot_values(text: str) -> Dict[str, Any]:
+    try:
+        slots = extract_slots(text)
+    except Unsure:
+        slots = Slots()
+    values = dict(DEFAULT_SLOTS)
+    values.update({name: value for name, value in vars(slots).items() if name in DEFAULT_SLOTS and value is not None})
+    values["height_m"] = values["height_cm"] / 100
+    values["bmr"] = compute_bmr(values["age_years"], values["gender"], values["weight_kg"], values["height_cm"])
+    return values
+
+
+def _fake_value(name: str, spec: dict, values: Dict[str, Any], text: str):
+    if "anyOf" in spec:
+        spec = next((option for option in spec["anyOf"] if option.get("type") != "null"), {})
+    enum = spec.get("enum")
+    if enum:
+        return next((option for option in enum if str(option).replace("_", " ") in text.lower()), enum[0])
+    if name in values:
+        return values[name]
+    if "default" in spec and spec["default"] is not None:
+        return spec["default"]
+    return {"boolean": False, "integer": 1, "number": 1.0, "array": [], "object": {}}.get(spec.get("type"), f"fake {name}")
+
+
+def fake_tool_args(tool: dict, text: str) -> dict:
+    """Fills an OpenAI-format tool schema from the slots in `text`, with fixed defaults for the rest."""
+    values = _slot_values(text)
+    parameters = tool["function"].get("parameters") or {}
+    return {name: _fake_value(name, spec, values, text) for name, spec in (parameters.get("properties") or {}).items()}
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic offline chat model with the same surface the planner uses from Gemini.
+
+    Supports `bind_tools` and `with_structured_output`. The agent calls the calculator and
+    log tools when the user's message asks for them, answers from the tool results on the
+    next step, and otherwise replies with a fixed template. Every call waits
+    `latency_seconds` before it answers (or before the first streamed chunk).
+    """
+
+    latency_seconds: float = 0.05
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-health-assistant"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"latency_seconds": self.latency_seconds}
+
+    def bind_tools(self, tools, *, tool_choice: Optional[str] = None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[dict]] = None, tool_choice: Optional[str] = None, **kwargs) -> AIMessage:
+        text = last_human_text(messages)
+        tools = tools or []
+        if tools and tool_choice:
+            # Structured output: always call the (single) schema tool
+            tool = tools[0]
+            return AIMessage(content="", tool_calls=[{"name": tool["function"]["name"], "args": fake_tool_args(tool, text), "id": "call_0"}])
+
+        answered = isinstance(messages[-1], ToolMessage)
+        if tools and not answered:
+            calls = [
+                {"name": tool["function"]["name"], "args": fake_tool_args(tool, text), "id": f"call_{i}"}
+                for i, tool in enumerate(tools)
+                if tool["function"]["name"] in TOOL_INTENTS and TOOL_INTENTS[tool["function"]["name"]].search(text)
+            ]
+            if calls:
+                return AIMessage(content="", tool_calls=calls)
+
+        if answered:
+            results = [message.content for message in messages if isinstance(message, ToolMessage)]
+            return AIMessage(content="Here is what I found: " + " ".join(str(result) for result in results))
+        topic = " ".join(text.split()[:12])
+        return AIMessage(content=f'About "{topic}": keep meals balanced, drink water through the day, sleep 7-9 hours and stay active most days.')
+
+    def _result(self, messages: List[BaseMessage], **kwargs) -> ChatResult:
+        message = self._respond(messages, **kwargs)
+        prompt_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        completion_tokens = estimate_tokens(str(message.content) + str(message.tool_calls))
+        message.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_seconds)
+        return self._result(messages, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_seconds)
+        return self._result(messages, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency_seconds)
+        message = self._result(messages, **kwargs).generations[0].message
+        if message.tool_calls:
+            chunks = [{"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i} for i, call in enumerate(message.tool_calls)]
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=chunks, usage_metadata=message.usage_metadata))
+            return
+        words = re.findall(r"\S+\s*", message.content)
+        for i, word in enumerate(words):
+            usage = message.usage_metadata if i == len(words) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word, usage_metadata=usage))
+            await asyncio.sleep(0)
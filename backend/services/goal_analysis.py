@@ -1,4 +1,31 @@
-from backend.services.planner import run_assistant
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+
+from pydantic import BaseModel, Field, ValidationError
+
+from backend.config.settings import GOAL_ANALYSIS_CACHE_SIZE
+from backend.data.db import AsyncSessionLocal
+from backend.schemas import GoalSet
+from backend.services import async_db_service
+from backend.services.client import get_llm
+from backend.services.llm_scheduler import LLMOverloaded, Priority, llm_priority
+from backend.services.prerouter import STORED_ACTIVITY_LEVELS, STORED_GOAL_TYPES
+from backend.services.singleflight import SingleFlight
+from backend.services.tools import ACTIVITY_MULTIPLIERS, compute_bmr
+from models.db_models import Goal
+
+# Profiles within the same bucket share one analysis
+WEIGHT_BUCKET_KG = 2.5
+HEIGHT_BUCKET_CM = 5
+AGE_BUCKET_YEARS = 5
+MAX_LLM_ATTEMPTS = 3
+JOB_RETENTION_SECONDS = 3600
 
 def calculate_bmi(weight_kg: float, height_cm: float) -> float:
     height_m = height_cm / 100
@@ -10,32 +37,245 @@ def calculate_bmr(weight_kg: float, height_cm: float, age: int, gender: str) ->
     else:
        return round(10 * weight_kg + 6.25 * height_cm - 5 * age - 161, 2)
 
-async def analyze_goal(goal_description: str):
-    # This is a placeholder for actual goal analysis logic.
-    # In a real scenario, you would use an LLM to parse the goal
-    # and extract structured information like target calories, water intake, etc.
-    # For now, we'll simulate a simple analysis.
-
-    # Example: Using the planner to get a response that might contain analysis
-    # You would design your prompt to elicit structured JSON output from the LLM
-    # that can be easily parsed.
-    prompt = f"Analyze the following health goal and extract key metrics like target daily calories, water intake (in liters), sleep hours, and steps. If any metric is not explicitly mentioned, infer a reasonable default or mark as 'not specified'. If the goal is unclear or requires more information, indicate 'clarification_needed': true. Goal: {goal_description}"
-    
-    # Simulate LLM call
-    # In a real application, you would call your LLM here (e.g., Gemini, OpenAI)
-    # and parse its response.
-    # For demonstration, let's assume a simple parsing.
-    
-    # For now, let's just return a dummy analysis result.
-    # In a real scenario, this would be the parsed output from the LLM.
-    if "clarify" in goal_description.lower():
-        return {"clarification_needed": True, "message": "Please provide more details about your goal."}
-    else:
+def describe_goal(goal: GoalSet) -> str:
+    """The goal description stored in `Goal.goal_text`."""
+    goal_description = f"Goal Type: {goal.goal_type}"
+    goal_description += f", Target Weight: {goal.target_weight}kg"
+    goal_description += f", Timeframe: {goal.timeframe}"
+    goal_description += f", Activity Level: {goal.activity_level}"
+    if goal.dietary_preferences: goal_description += f", Dietary Preferences: {goal.dietary_preferences}"
+    if goal.allergies: goal_description += f", Allergies: {goal.allergies}"
+    goal_description += f", Current Weight: {goal.current_weight}kg"
+    goal_description += f", Height: {goal.height}cm"
+    goal_description += f", Age: {goal.age}"
+    goal_description += f", Gender: {goal.gender}"
+    return goal_description
+
+# --- Normalized profile --- #
+def _bucket(value: float, size: float) -> float:
+    return round(round(value / size) * size, 1)
+
+def _text(value: Optional[str]) -> str:
+    return " ".join((value or "").lower().split())
+
+def _items(value: Optional[str]) -> str:
+    return ", ".join(sorted({_text(item) for item in (value or "").split(",") if item.strip()}))
+
+def normalize_goal(goal: GoalSet) -> dict:
+    """The GoalSet fields the analysis depends on, with weight, height and age bucketed."""
+    return {
+        "goal_type": _text(goal.goal_type),
+        "target_weight_kg": _bucket(goal.target_weight, WEIGHT_BUCKET_KG),
+        "timeframe": _text(goal.timeframe),
+        "activity_level": _text(goal.activity_level),
+        "dietary_preferences": _items(goal.dietary_preferences),
+        "allergies": _items(goal.allergies),
+        "current_weight_kg": _bucket(goal.current_weight, WEIGHT_BUCKET_KG),
+        "height_cm": _bucket(goal.height, HEIGHT_BUCKET_CM),
+        "age_years": int(_bucket(goal.age, AGE_BUCKET_YEARS)),
+        "gender": _text(goal.gender),
+    }
+
+def analysis_key(profile: dict) -> str:
+    return hashlib.sha256(json.dumps(profile, sort_keys=True).encode("utf-8")).hexdigest()
+
+# --- Analysis --- #
+class GoalTargets(BaseModel):
+    """Daily targets for a user's health goal."""
+    clarification_needed: bool = Field(description="True if the goal is too unclear or unsafe to set targets for.")
+    message: Optional[str] = Field(default=None, description="What the user should clarify, when clarification is needed.")
+    target_calories: Optional[int] = Field(default=None, description="Daily calorie target in kcal.")
+    target_water_intake_liters: Optional[float] = Field(default=None, description="Daily water intake target in liters.")
+    target_sleep_hours: Optional[float] = Field(default=None, description="Nightly sleep target in hours.")
+    target_steps: Optional[int] = Field(default=None, description="Daily step target.")
+
+goal_targets_llm = get_llm().with_structured_output(GoalTargets)
+
+def fallback_targets(profile: dict) -> dict:
+    """Formula-based targets (Mifflin-St Jeor with a 500 kcal deficit/surplus) used when the LLM is unavailable."""
+    activity = STORED_ACTIVITY_LEVELS.get(profile["activity_level"].replace(" ", "_"), "moderate")
+    goal = STORED_GOAL_TYPES.get(profile["goal_type"].replace(" ", "_"), "maintain_weight")
+    gender = profile["gender"] if profile["gender"] in ("male", "female") else "female"
+    maintenance = compute_bmr(profile["age_years"], gender, profile["current_weight_kg"], profile["height_cm"]) * ACTIVITY_MULTIPLIERS[activity]
+    calories = maintenance - 500 if goal == "lose_weight" else maintenance + 500 if goal == "gain_weight" else maintenance
+    steps = {"sedentary": 6000, "light": 8000, "moderate": 10000}.get(activity, 12000)
+    return {
+        "clarification_needed": False,
+        "target_calories": round(calories),
+        "target_water_intake_liters": round(profile["current_weight_kg"] * 0.033, 1),
+        "target_sleep_hours": 8,
+        "target_steps": steps,
+        "source": "formula",
+    }
+
+async def _llm_targets(profile: dict) -> dict:
+    prompt = f"""You are a nutrition and fitness coach. Set daily targets for this user's health goal:
+    calories (kcal), water intake (liters), sleep (hours) and steps. Base calories on their BMR, activity level
+    and goal, respecting a safe rate of change for the timeframe. If the goal is unclear or unsafe, set
+    clarification_needed and explain what is missing in `message`.
+
+    Profile (weight, height and age are rounded):
+    {json.dumps(profile, indent=2)}
+    """
+    for attempt in range(MAX_LLM_ATTEMPTS):
+        try:
+            targets: GoalTargets = await goal_targets_llm.ainvoke(prompt)
+            return {**targets.model_dump(exclude_none=True), "source": "llm"}
+        except LLMOverloaded as e:
+            # Background work is shed first under load; wait for the queue to drain instead of failing the job
+            if attempt == MAX_LLM_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+class GoalAnalyzer:
+    """LLM goal analysis memoized by the normalized, bucketed profile.
+
+    Identical concurrent analyses share one LLM call; formula fallbacks are not memoized
+    so the next request for that profile tries the LLM again.
+    """
+
+    def __init__(self, max_entries: int = GOAL_ANALYSIS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._results: "OrderedDict[str, dict]" = OrderedDict()
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    async def analyze(self, goal: GoalSet) -> dict:
+        profile = normalize_goal(goal)
+        key = analysis_key(profile)
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+        self.misses += 1
+        try:
+            result = await self._flights.do(key, lambda: _llm_targets(profile))
+        except Exception as e:
+            print(f"Goal analysis LLM call failed, using formula targets: {e}")
+            self.fallbacks += 1
+            return fallback_targets(profile)
+        self._results[key] = result
+        if len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+        return dict(result)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
         return {
-            "clarification_needed": False,
-            "target_calories": 2000,
-            "target_water_intake_liters": 2.5,
-            "target_sleep_hours": 8,
-            "target_steps": 10000
+            "entries": len(self._results),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "fallbacks": self.fallbacks,
+            **{f"llm_{name}": value for name, value in self._flights.stats().items() if name.endswith("calls")},
         }
-        
\ No newline at end of file
+
+goal_analyzer = GoalAnalyzer()
+
+async def analyze_goal(goal: GoalSet) -> dict:
+    """Returns structured daily targets (calories, water, sleep, steps) for a goal."""
+    return await goal_analyzer.analyze(goal)
+
+# --- Background jobs --- #
+@dataclass
+class GoalAnalysisJob:
+    id: str
+    user_id: int
+    goal_id: int
+    status: str = "pending" # pending -> running -> succeeded | needs_clarification | superseded | failed
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "goal_id": self.goal_id,
+            "status": self.status,
+            "analysis_result": self.result,
+            "error": self.error,
+        }
+
+# WARNING: in-memory like `chat_histories` in routes/chat.py; not shared across workers, and jobs
+# pending at a restart are lost (see resubmit_pending_analyses).
+goal_jobs: Dict[str, GoalAnalysisJob] = {}
+_latest_job_by_goal: Dict[int, str] = {}
+_running: Set[asyncio.Task] = set() # Keeps job tasks referenced until they finish
+
+async def _save_analysis(job: GoalAnalysisJob, result: dict) -> bool:
+    async with AsyncSessionLocal() as db:
+        return await async_db_service.set_goal_analysis(db, job.goal_id, result)
+
+async def _run_job(job: GoalAnalysisJob, goal: GoalSet):
+    llm_priority.set(Priority.BACKGROUND)
+    job.status = "running"
+    try:
+        result = await analyze_goal(goal)
+        # A newer update of the same goal supersedes this job; its result is never stored
+        if _latest_job_by_goal.get(job.goal_id) != job.id:
+            job.status = "superseded"
+            return
+        if not await _save_analysis(job, result):
+            raise RuntimeError("Could not save the analysis result.")
+        job.result = result
+        job.status = "needs_clarification" if result.get("clarification_needed") else "succeeded"
+    except Exception as e:
+        print(f"Goal analysis job {job.id} failed: {e}")
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = time.time()
+
+def _prune_jobs():
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for job_id in [job_id for job_id, job in goal_jobs.items() if job.finished_at and job.finished_at < cutoff]:
+        job = goal_jobs.pop(job_id)
+        if _latest_job_by_goal.get(job.goal_id) == job_id:
+            del _latest_job_by_goal[job.goal_id]
+
+def submit_goal_analysis(user_id: int, goal_id: int, goal: GoalSet) -> GoalAnalysisJob:
+    """Analyzes `goal` in a background task and stores the result on the Goal row."""
+    _prune_jobs()
+    job = GoalAnalysisJob(id=uuid.uuid4().hex, user_id=user_id, goal_id=goal_id)
+    goal_jobs[job.id] = job
+    _latest_job_by_goal[goal_id] = job.id
+    task = asyncio.create_task(_run_job(job, goal))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+    return job
+
+def get_goal_job(job_id: str, user_id: int) -> Optional[GoalAnalysisJob]:
+    job = goal_jobs.get(job_id)
+    return job if job and job.user_id == user_id else None
+
+def stored_goal_set(goal: Goal) -> GoalSet:
+    """The GoalSet a Goal row was created from; raises ValidationError when a required field is missing."""
+    return GoalSet(
+        goal_type=goal.goal_type, target_weight=goal.target_weight, timeframe=goal.timeframe,
+        activity_level=goal.activity_level, dietary_preferences=goal.preferences, allergies=goal.allergies,
+        current_weight=goal.current_weight, height=goal.height, age=goal.age, gender=goal.gender,
+    )
+
+async def resubmit_pending_analyses() -> int:
+    """Submits a job for every goal still without analysis_result; returns how many were submitted.
+
+    Jobs live in memory, so a restart drops the ones that were pending and a failed job
+    leaves the goal unanalyzed; this runs at startup to pick those goals up again. With
+    several workers each one resubmits them, which only repeats the (memoized) analysis.
+    """
+    async with AsyncSessionLocal() as db:
+        goals = await async_db_service.get_goals_without_analysis(db)
+    submitted = 0
+    for goal in goals:
+        try:
+            goal_set = stored_goal_set(goal)
+        except ValidationError as e:
+            print(f"Goal {goal.id} can't be analyzed, {e.error_count()} fields are missing or invalid.")
+            continue
+        submit_goal_analysis(goal.user_id, goal.id, goal_set)
+        submitted += 1
+    return submitted
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from backend.config.settings import LLM_CACHE_BACKEND, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS, LLM_CACHE_PATH
+
+
+def make_cache_key(prompt: str, llm_string: str) -> str:
+    """Hashes the serialized message list (whitespace-normalized) with the model/tool-binding signature.
+
+    Langchain passes `prompt` as the serialized message list and `llm_string` as the
+    model parameters, which include any tools bound with `bind_tools` and the schema of
+    `with_structured_output`.
+    """
+    normalized_prompt = " ".join(prompt.split())
+    return hashlib.sha256(f"{normalized_prompt}\x00{llm_string}".encode("utf-8")).hexdigest()
+
+
+class CacheStatsMixin:
+    """Hit/miss/eviction counters shared by the cache backends."""
+
+    def _init_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self),
+        }
+
+
+class LRUTTLCache(CacheStatsMixin, BaseCache):
+    """In-process LLM cache with size-bounded LRU and TTL eviction."""
+
+    backend_name = "memory"
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, Sequence[Generation]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._init_stats()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = make_cache_key(prompt, llm_string)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, generations = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = make_cache_key(prompt, llm_string)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, return_val)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteTTLCache(CacheStatsMixin, BaseCache):
+    """On-disk LLM cache in SQLite with the same LRU/TTL policy, shareable across workers."""
+
+    backend_name = "sqlite"
+
+    def __init__(self, path: str = ".llm_cache.sqlite", max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache (last_used)")
+        self._init_stats()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = make_cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return [loads(generation) for generation in json.loads(value)]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = make_cache_key(prompt, llm_string)
+        value = json.dumps([dumps(generation) for generation in return_val])
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl_seconds, now),
+            )
+            overflow = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+
+def build_llm_cache(backend: str = LLM_CACHE_BACKEND) -> Optional[BaseCache]:
+    """Builds the configured cache backend ('memory', 'sqlite' or 'none')."""
+    if backend == "memory":
+        return LRUTTLCache(max_entries=LLM_CACHE_MAX_ENTRIES, ttl_seconds=LLM_CACHE_TTL_SECONDS)
+    if backend == "sqlite":
+        return SQLiteTTLCache(path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, ttl_seconds=LLM_CACHE_TTL_SECONDS)
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown LLM_CACHE_BACKEND '{backend}'. Choose from: memory, sqlite, none.")
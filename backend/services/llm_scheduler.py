@@ -0,0 +1,166 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
+
+from backend.config.settings import LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE_DEPTH, LLM_REQUESTS_PER_SECOND, LLM_BURST
+
+# Upper bounds (seconds) of the queue wait histogram
+WAIT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_RETRY_AFTER_SECONDS = 30
+
+
+class Priority(IntEnum):
+    """Lower values are admitted first."""
+    INTERACTIVE = 0 # /chat/stream
+    CHAT = 1 # /chat
+    BACKGROUND = 2 # Goal analysis, chat history folding
+
+
+# Priority of LLM calls made by the current request or task; routes and background jobs set it
+llm_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.CHAT)
+
+
+class LLMOverloaded(Exception):
+    """Raised when the LLM queue is too deep to admit another request; carries a Retry-After hint."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"The assistant is handling too many requests, retry in {retry_after}s.")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Paces upstream calls to `rate` per second with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Takes one token and returns how long to wait before it may be used."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class LLMScheduler:
+    """Admission control for upstream LLM calls.
+
+    At most `max_concurrency` calls run at once; the rest wait in a priority queue
+    (interactive before chat before background, FIFO within a priority) and are
+    paced by a token bucket. Once the queue is `max_queue_depth` deep new requests
+    are shed with LLMOverloaded; background work is shed at half that depth.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_queue_depth: int = LLM_MAX_QUEUE_DEPTH,
+                 requests_per_second: float = LLM_REQUESTS_PER_SECOND, burst: int = LLM_BURST):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue_depth = max_queue_depth
+        self.bucket = TokenBucket(requests_per_second, burst) if requests_per_second > 0 else None
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        # Metrics
+        self.admitted: Counter = Counter()
+        self.shed: Counter = Counter()
+        self.peak_queue_depth = 0
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_buckets = [0] * len(WAIT_BUCKETS)
+        self.pacing_seconds_total = 0.0
+        self.avg_service_seconds = 1.0 # EWMA of slot hold time, used for Retry-After
+
+    def queue_depth(self, priority: Optional[Priority] = None) -> int:
+        return sum(1 for p, _, waiter in self._waiters if not waiter.done() and (priority is None or p == priority))
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained."""
+        drain = (self.queue_depth() + 1) * self.avg_service_seconds / self.max_concurrency
+        return min(MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(drain)))
+
+    def check_admission(self, priority: Optional[Priority] = None):
+        """Raises LLMOverloaded if a request of `priority` would be shed right now."""
+        priority = llm_priority.get() if priority is None else priority
+        limit = self.max_queue_depth // 2 if priority == Priority.BACKGROUND else self.max_queue_depth
+        if self.in_flight >= self.max_concurrency and self.queue_depth() >= limit:
+            self.shed[priority.name.lower()] += 1
+            raise LLMOverloaded(self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[Priority] = None):
+        """Holds one of the concurrency slots for the duration of an upstream call."""
+        priority = llm_priority.get() if priority is None else priority
+        self.check_admission(priority)
+        queued_at = time.monotonic()
+        if self.in_flight < self.max_concurrency and self.queue_depth() == 0:
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth())
+            try:
+                await waiter # `_release` hands its slot over by resolving the future
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release()
+                raise
+        self.admitted[priority.name.lower()] += 1
+        self._record_wait(time.monotonic() - queued_at)
+
+        started_at = time.monotonic()
+        try:
+            if self.bucket is not None:
+                delay = self.bucket.reserve()
+                if delay > 0:
+                    self.pacing_seconds_total += delay
+                    await asyncio.sleep(delay)
+            yield
+        finally:
+            self.avg_service_seconds += 0.2 * (time.monotonic() - started_at - self.avg_service_seconds)
+            self._release()
+
+    def _release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _record_wait(self, seconds: float):
+        self.wait_count += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if seconds <= bound:
+                self.wait_buckets[i] += 1
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth(),
+            "queue_depth_by_priority": {p.name.lower(): self.queue_depth(p) for p in Priority},
+            "peak_queue_depth": self.peak_queue_depth,
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+            "wait_count": self.wait_count,
+            "wait_seconds_avg": round(self.wait_seconds_total / self.wait_count, 4) if self.wait_count else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 4),
+            "wait_seconds_buckets": {str(bound): count for bound, count in zip(WAIT_BUCKETS, self.wait_buckets)},
+            "pacing_seconds_total": round(self.pacing_seconds_total, 4),
+        }
+
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,136 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from backend.data.db import AsyncSessionLocal
+from backend.services import async_db_service
+from backend.services.db_service import get_goal_targets
+from backend.services.rollups import aget_daily_rollups, get_daily_rollups
+from models.db_models import DailyRollup
+
+CALORIE_TOLERANCE = 0.1 # A day meets the calorie target within +/-10%
+TARGETS = { # metric -> promoted Goal target column
+    "steps": "target_steps",
+    "sleep_hours": "target_sleep_hours",
+    "water_intake": "target_water_intake_liters",
+    "calories": "target_calories",
+}
+
+
+def _daily_totals(rollups: List[DailyRollup]) -> Dict[date, dict]:
+    """Per-day log and food totals from the daily rollups (one row per day, not per entry)."""
+    return {
+        rollup.day: {
+            "log_entries": rollup.log_count,
+            "food_entries": rollup.food_count,
+            "steps": rollup.steps_total,
+            "sleep_hours": rollup.sleep_hours_sum / rollup.sleep_count if rollup.sleep_count else 0.0,
+            "water_intake": rollup.water_intake_sum / rollup.water_count if rollup.water_count else 0.0,
+            "calories": rollup.log_calories_total + rollup.food_calories_total,
+        }
+        for rollup in rollups
+    }
+
+
+def _by_metric(targets: dict) -> Dict[str, float]:
+    return {metric: targets[column] for metric, column in TARGETS.items() if column in targets}
+
+
+def goal_targets(db: Session, user_id: int) -> Dict[str, float]:
+    """Targets of the latest goal by metric, from its promoted target columns."""
+    return _by_metric(get_goal_targets(db, user_id))
+
+
+def _meets(metric: str, value: float, target: float) -> bool:
+    if metric == "calories":
+        return abs(value - target) <= target * CALORIE_TOLERANCE
+    return value >= target
+
+
+def _streak(window: List[date], hit) -> int:
+    """Consecutive days ending today that satisfy `hit`; today may still be in progress, so it can't break the streak."""
+    streak = 0
+    for i, day in enumerate(reversed(window)):
+        if hit(day):
+            streak += 1
+        elif i > 0:
+            break
+    return streak
+
+
+def build_summary(user_id: int, days: int, today: date, totals: Dict[date, dict], targets: Dict[str, float]) -> dict:
+    window = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    logged = [totals[day] for day in window if day in totals]
+    with_logs = [day for day in logged if day["log_entries"]]
+    summary = {
+        "user_id": user_id,
+        "days": days,
+        "start_date": window[0].isoformat(),
+        "end_date": today.isoformat(),
+        "days_logged": len(logged),
+        "logging_streak": _streak(window, lambda day: day in totals),
+        "totals": {
+            "steps": sum(day["steps"] for day in logged),
+            "calories": round(sum(day["calories"] for day in logged), 1),
+            "log_entries": sum(day["log_entries"] for day in logged),
+            "food_entries": sum(day["food_entries"] for day in logged),
+        },
+        # Per logged day, so days without entries don't drag averages to zero
+        "averages": {
+            "steps": round(sum(day["steps"] for day in with_logs) / len(with_logs)) if with_logs else 0,
+            "sleep_hours": round(sum(day["sleep_hours"] for day in with_logs) / len(with_logs), 1) if with_logs else 0.0,
+            "water_intake": round(sum(day["water_intake"] for day in with_logs) / len(with_logs), 1) if with_logs else 0.0,
+            "calories": round(sum(day["calories"] for day in logged) / len(logged)) if logged else 0,
+        },
+        "adherence": {},
+    }
+    for metric, target in targets.items():
+        met = lambda day, metric=metric, target=target: day in totals and _meets(metric, totals[day][metric], target)
+        days_met = sum(1 for day in window if met(day))
+        summary["adherence"][metric] = {
+            "target": target,
+            "days_met": days_met,
+            "rate": round(days_met / days, 2),
+            "streak": _streak(window, met),
+        }
+    return summary
+
+
+def _clamp_days(days: int) -> int:
+    return max(1, min(int(days), 366))
+
+
+def summarize_logs(db: Session, user_id: int, days: int = 7, today: Optional[date] = None) -> dict:
+    """Averages, totals, streaks and target adherence over the last `days` days (today included)."""
+    days = _clamp_days(days)
+    today = today or datetime.now().date()
+    totals = _daily_totals(get_daily_rollups(db, user_id, today - timedelta(days=days - 1), today))
+    return build_summary(user_id, days, today, totals, goal_targets(db, user_id))
+
+
+async def asummarize_logs(user_id: int, days: int = 7, today: Optional[date] = None) -> dict:
+    """`summarize_logs` on its own async session."""
+    days = _clamp_days(days)
+    today = today or datetime.now().date()
+    async with AsyncSessionLocal() as db:
+        totals = _daily_totals(await aget_daily_rollups(db, user_id, today - timedelta(days=days - 1), today))
+        targets = _by_metric(await async_db_service.get_goal_targets(db, user_id))
+    return build_summary(user_id, days, today, totals, targets)
+
+
+def format_summary(summary: dict) -> str:
+    """Compact text for the agent."""
+    if not summary["days_logged"]:
+        return f"No logs or food entries in the past {summary['days']} days ({summary['start_date']} to {summary['end_date']})."
+    averages, totals = summary["averages"], summary["totals"]
+    lines = [
+        f"Past {summary['days']} days ({summary['start_date']} to {summary['end_date']}): logged on {summary['days_logged']} days, current logging streak {summary['logging_streak']} days.",
+        f"Averages per logged day: {averages['steps']} steps, {averages['sleep_hours']} h sleep, {averages['water_intake']} L water, {averages['calories']} kcal.",
+        f"Totals: {totals['steps']} steps, {totals['calories']:g} kcal from {totals['log_entries']} daily logs and {totals['food_entries']} food entries.",
+    ]
+    for metric, adherence in summary["adherence"].items():
+        lines.append(f"{metric} target {adherence['target']:g}: met on {adherence['days_met']}/{summary['days']} days ({adherence['rate']:.0%}), streak {adherence['streak']} days.")
+    if not summary["adherence"]:
+        lines.append("No goal targets set yet, so adherence can't be measured.")
+    return "\n".join(lines)
@@ -0,0 +1,209 @@
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_text(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name, self.help_text, self.labelnames = name, help_text, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help_text, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {} # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    le = 'le="%g"' % bound
+                    lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {bucket_count}")
+                inf = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, inf)} {count}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {total:g}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text format on scrape.
+
+    Recording is a dict update under a lock, so nodes, tools and executor threads never
+    wait on I/O; `collectors` add gauges computed from other components' stats at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: List[Tuple[str, Callable[[], dict]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, prefix: str, stats: Callable[[], dict]):
+        """Exposes the numeric values of `stats()` as gauges named `<prefix>_<key>`; nested dicts become a `key` label."""
+        self._collectors.append((prefix, stats))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats in self._collectors:
+            for key, value in stats().items():
+                name = f"{prefix}_{key}"
+                if isinstance(value, dict):
+                    values = [(f'{{key="{label}"}}', v) for label, v in value.items() if isinstance(v, (int, float))]
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values = [("", value)]
+                else:
+                    continue
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(f"{name}{labels} {v:g}" for labels, v in values)
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+NODE_SECONDS = metrics.histogram("planner_node_seconds", "Time spent in each planner graph node.", ["node"])
+TOOL_SECONDS = metrics.histogram("planner_tool_seconds", "Time spent running each tool, by outcome.", ["tool", "status"])
+LLM_CALL_SECONDS = metrics.histogram("llm_call_seconds", "Upstream LLM call latency including admission wait.", ["kind"])
+LLM_CALLS = metrics.counter("llm_calls_total", "Upstream LLM calls (cache misses not shared with an in-flight call).", ["kind"])
+LLM_TOKENS = metrics.counter("llm_tokens_total", "Tokens reported by the LLM provider.", ["type"])
+DB_CHECKOUT_SECONDS = metrics.histogram("db_pool_checkout_seconds", "Time waiting for a pooled database connection.", ["pool"])
+REQUEST_SECONDS = metrics.histogram("chat_request_seconds", "End-to-end chat request latency.", ["route"])
+REQUEST_LLM_CALLS = metrics.histogram("chat_request_llm_calls", "Upstream LLM calls per chat request.", ["route"], buckets=(0, 1, 2, 3, 4, 6, 8, 12))
+REQUEST_TOKENS = metrics.histogram("chat_request_tokens", "Prompt plus completion tokens per chat request.", ["route"], buckets=(0, 250, 500, 1000, 2000, 4000, 8000, 16000))
+CONTEXT_TOKENS = metrics.counter("user_context_tokens_total", "Estimated tokens of compacted user context in planner prompts (compact) and saved against the raw context (saved).", ["type"])
+
+
+@dataclass
+class RequestMetrics:
+    """Timings and LLM usage of one chat request, shared by every task the request spawns."""
+    started: float = field(default_factory=time.perf_counter)
+    spans: Dict[str, float] = field(default_factory=dict) # Server-Timing name -> total seconds
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    context_tokens: int = 0
+    context_tokens_saved: int = 0
+
+    def add_span(self, name: str, seconds: float):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (durations in ms)."""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans.items()]
+        entries.append(f'tokens;desc="{self.llm_calls} LLM calls, {self.prompt_tokens} prompt + {self.completion_tokens} completion"')
+        if self.context_tokens:
+            entries.append(f'context_tokens;desc="{self.context_tokens} compact, {self.context_tokens_saved} saved"')
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def finish(self, route: str):
+        REQUEST_SECONDS.observe(time.perf_counter() - self.started, route=route)
+        REQUEST_LLM_CALLS.observe(self.llm_calls, route=route)
+        REQUEST_TOKENS.observe(self.prompt_tokens + self.completion_tokens, route=route)
+
+
+# Metrics of the request being served; None outside chat requests (e.g. background folds)
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request", default=None)
+
+
+def record_node(node: str, seconds: float):
+    NODE_SECONDS.observe(seconds, node=node)
+    request = current_request.get()
+    if request is not None:
+        request.add_span(f"node.{node}", seconds)
+
+
+def record_tool(tool: str, seconds: float, status: str):
+    TOOL_SECONDS.observe(seconds, tool=tool, status=status)
+    request = current_request.get()
+    if request is not None:
+        request.add_span(f"tool.{tool}", seconds)
+
+
+def record_llm_call(kind: str, seconds: float, usage: Optional[dict]):
+    """Records one upstream LLM call; `usage` is the message's usage_metadata when the provider reports it."""
+    LLM_CALL_SECONDS.observe(seconds, kind=kind)
+    LLM_CALLS.inc(kind=kind)
+    prompt_tokens = (usage or {}).get("input_tokens", 0)
+    completion_tokens = (usage or {}).get("output_tokens", 0)
+    LLM_TOKENS.inc(prompt_tokens, type="prompt")
+    LLM_TOKENS.inc(completion_tokens, type="completion")
+    request = current_request.get()
+    if request is not None:
+        request.add_span("llm", seconds)
+        request.llm_calls += 1
+        request.prompt_tokens += prompt_tokens
+        request.completion_tokens += completion_tokens
+
+
+def record_context_tokens(compact_tokens: int, tokens_saved: int):
+    """Records the size of a turn's compacted user context and the tokens it saved."""
+    CONTEXT_TOKENS.inc(compact_tokens, type="compact")
+    CONTEXT_TOKENS.inc(tokens_saved, type="saved")
+    request = current_request.get()
+    if request is not None:
+        request.context_tokens += compact_tokens
+        request.context_tokens_saved += tokens_saved
+
+
+def timed_node(fn):
+    """Records the duration of an async graph node under its function name."""
+    @functools.wraps(fn)
+    async def wrapper(state):
+        start = time.perf_counter()
+        try:
+            return await fn(state)
+        finally:
+            record_node(fn.__name__, time.perf_counter() - start)
+    return wrapper
@@ -1,23 +1,34 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import TypedDict, Annotated, List, Union, Optional, Literal , Tuple
 from langchain_core.agents import AgentAction, AgentFinish
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, END
 import operator
 # from typing import List, Tuple, Optional, Literal, Union, TypedDict, Annotated
 
+from backend.config.settings import PLANNER_MODE, TOOL_TIMEOUT_SECONDS, TOOL_EXECUTOR_WORKERS
 from backend.services.client import get_llm
-from backend.services.tools import get_tools
+from backend.services.tools import get_tools, tool_user_id
+from backend.services.context_compactor import compact_user_context
+from backend.services.prerouter import prerouter
+from backend.services.metrics import record_context_tokens, record_tool, timed_node
 
 # --- Agent State --- #
 class AgentState(TypedDict):
     input: str # User's initial input
-    chat_history: List[BaseMessage] # Full conversation history
-    agent_outcome: Optional[Union[AgentAction, AgentFinish, List[AgentAction]]] # Intermediate step for tool use
-    intermediate_steps: Annotated[List[tuple[AgentAction, str]], operator.add] # Tool execution results
+    chat_history: List[BaseMessage] # Recent conversation turns, kept verbatim
+    history_summary: Optional[str] # Running summary of turns older than the verbatim window
+    agent_outcome: Optional[Union[AgentAction, AgentFinish, List["ToolInvocation"]]] # Intermediate step for tool use
+    intermediate_steps: Annotated[List[BaseMessage], operator.add] # AI tool-call messages and their ToolMessage results
     
     # Fields for contextual information
     user_context: Optional[dict] # Comprehensive user context including profile, goal, and recent logs
+    context_summary: Optional[str] # Token-budgeted rendering of user_context, computed once per turn
     clarification_needed: bool # Flag if clarification is required
     clarification_questions_asked: int # Counter for clarification attempts
 
@@ -33,17 +44,92 @@ class PlanDecision(BaseModel):
     should_use_tools: bool = Field(description="True if tools are needed to answer the user's query, False otherwise.")
     reasoning: Optional[str] = Field(description="Brief explanation for the decision.")
 
+class ToolInvocation(BaseModel):
+    """A single tool call requested by the agent LLM."""
+    tool: str
+    tool_input: dict
+    tool_call_id: Optional[str] = None
+
 # --- LangGraph Nodes --- # 
 
 llm = get_llm()
+# Personalized prompts embed user context and rarely repeat, so they skip the response cache
+personal_llm = get_llm(cache=False)
 all_tools = get_tools()
 # tool_executor = ToolExecutor(all_tools) # ToolExecutor might be deprecated or moved
 
+# --- Graph Registry --- #
+class GraphRegistry:
+    """Compiles every workflow once and holds the runnables the nodes share across turns.
+
+    Tool binding, structured-output wrappers, tool prompt strings and the tool lookup
+    table are built once here instead of on every node invocation.
+    """
+
+    def __init__(self, llm, personal_llm, tools):
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        # Tools with their own `_arun` run on the event loop; the rest block and go to `tool_executor`
+        self.native_async_tools = {tool.name for tool in tools if type(tool)._arun is not BaseTool._arun}
+        self.tool_names = [tool.name for tool in tools]
+        self.tool_descriptions = [f'{tool.name}: {tool.description}' for tool in tools]
+        self.agent_llm = llm.bind_tools(tools)
+        self.personal_agent_llm = personal_llm.bind_tools(tools)
+        self.goal_llm = llm.with_structured_output(GoalIdentification)
+        self.plan_llm = llm.with_structured_output(PlanDecision)
+        self._builders = {}
+        self._graphs = {}
+
+    def register(self, name: str, builder):
+        """Registers a zero-argument function returning a compiled graph."""
+        self._builders[name] = builder
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._builders)
+
+    def get(self, name: str):
+        """Returns the compiled graph `name`, compiling it on first use if warmup() has not run."""
+        graph = self._graphs.get(name)
+        if graph is None:
+            if name not in self._builders:
+                raise ValueError(f"Unknown graph '{name}'. Choose from: {', '.join(self._builders)}.")
+            graph = self._graphs[name] = self._builders[name]()
+        return graph
+
+    def warmup(self) -> List[str]:
+        """Compiles every registered graph; call once at application startup."""
+        for name in self._builders:
+            self.get(name)
+        return self.names
+
+graph_registry = GraphRegistry(llm, personal_llm, all_tools)
+
+# Bounded pool for tools without a native async implementation
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_EXECUTOR_WORKERS, thread_name_prefix="planner-tool")
+
+def format_chat_history(state: AgentState) -> str:
+    """Renders the history summary and recent turns as plain text for single-prompt calls."""
+    lines = []
+    if state.get('history_summary'):
+        lines.append(f"Summary of earlier conversation: {state['history_summary']}")
+    for message in state.get('chat_history') or []:
+        lines.append(f"{'User' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}")
+    return "\n".join(lines) if lines else "(no previous messages)"
+
+def history_messages(state: AgentState) -> List[BaseMessage]:
+    """Returns the history summary (if any) followed by the recent turns as chat messages."""
+    messages = []
+    if state.get('history_summary'):
+        messages.append(HumanMessage(content=f"Summary of our earlier conversation: {state['history_summary']}"))
+    messages.extend(state.get('chat_history') or [])
+    return messages
+
 # 1. Goal Analysis Node
-def analyze_goal_node(state: AgentState):
+@timed_node
+async def analyze_goal_node(state: AgentState):
     """Analyzes the user's input to identify their goal and if clarification is needed."""
     print("--- ANALYZING GOAL ---")
-    structured_llm_goal = llm.with_structured_output(GoalIdentification)
+    structured_llm_goal = graph_registry.goal_llm
     
     # Extract goal from user_context if available
     current_user_goal = state['user_context'].get('goal', {}).get('goal_description') if state.get('user_context') else None
@@ -69,14 +155,14 @@ def analyze_goal_node(state: AgentState):
     - "Are there any health conditions, allergies, or dietary restrictions I should be aware of?"
 
     Conversation History:
-    {state['chat_history']}
+    {format_chat_history(state)}
     
     User Input: {state['input']}
     
     Based on the input and history, identify the goal and whether clarification is required.
     """
     
-    goal_analysis: GoalIdentification = structured_llm_goal.invoke(prompt)
+    goal_analysis: GoalIdentification = await structured_llm_goal.ainvoke(prompt)
     
     print(f"Goal Analysis Result: {goal_analysis}")
     
@@ -90,11 +176,12 @@ def analyze_goal_node(state: AgentState):
 
     return {
         "clarification_needed": goal_analysis.requires_clarification,
-        "clarification_questions_asked": state.get("clarification_questions_asked", 0) # Initialize if not present
+        "clarification_questions_asked": state.get("clarification_questions_asked") or 0 # Initialize if not present
     }
 
 # 2. Clarification Node (if needed)
-def clarification_node(state: AgentState):
+@timed_node
+async def clarification_node(state: AgentState):
     """Asks clarifying questions if the user's goal is unclear."""
     print("--- ASKING CLARIFICATION QUESTIONS ---")
     questions = [
@@ -110,42 +197,35 @@ def clarification_node(state: AgentState):
     
     return {
         "agent_outcome": AgentFinish(return_values={"output": clarification_prompt}, log=clarification_prompt),
-        "clarification_questions_asked": state.get("clarification_questions_asked", 0) + 1
+        "clarification_questions_asked": (state.get("clarification_questions_asked") or 0) + 1
     }
 
+def get_context_summary(state: AgentState) -> str:
+    """Returns the compacted user context for prompts, compacting it now if the turn did not precompute it."""
+    if state.get('context_summary') is not None:
+        return state['context_summary']
+    return compact_user_context(state.get('user_context')).text
+
 # 3. Planning Node (Decide to use tools or respond directly)
-def planning_node(state: AgentState):
+@timed_node
+async def planning_node(state: AgentState):
     """Decides whether to use tools or generate a direct response based on the clear goal."""
     print("--- PLANNING: DECIDING ON TOOL USE ---")
-    structured_llm_plan = llm.with_structured_output(PlanDecision)
+    structured_llm_plan = graph_registry.plan_llm
     
-    user_profile = state['user_context'].get('user_profile', {})
-    user_goal = state['user_context'].get('goal', {})
-    recent_logs = state['user_context'].get('recent_logs', [])
-    recent_food_entries = state['user_context'].get('recent_food_entries', [])
-
-    # Summarize relevant user context for the LLM
-    context_summary = ""
-    if user_profile:
-        context_summary += f"User: {user_profile.get('name', 'N/A')}, Email: {user_profile.get('email', 'N/A')}.\n"
-    if user_goal:
-        context_summary += f"Current Goal: {user_goal.get('goal_description', 'N/A')}. Analysis: {user_goal.get('analysis_result', 'N/A')}.\n"
-    if recent_logs:
-        context_summary += f"Recent Logs (last {len(recent_logs)} entries): {recent_logs}.\n"
-    if recent_food_entries:
-        context_summary += f"Recent Food Entries (last {len(recent_food_entries)} entries): {recent_food_entries}.\n"
+    context_summary = get_context_summary(state)
 
     prompt = f"""
     You are an AI health assistant. You have the following user context:
     {context_summary}
 
     Conversation History:
-    {state['chat_history']}
+    {format_chat_history(state)}
     User Input: {state['input']}
 
-    Available tools: {[tool.name for tool in all_tools]}
+    Available tools: {graph_registry.tool_names}
     Tool descriptions:
-    {[f'{tool.name}: {tool.description}' for tool in all_tools]}
+    {graph_registry.tool_descriptions}
 
     Based on the user's input, their current context (goal, logs, etc.), and conversation history, decide if you need to use any tools to formulate a comprehensive plan or answer.
     For example:
@@ -157,7 +237,7 @@ def planning_node(state: AgentState):
     Respond with whether tools are needed.
     """
     
-    plan_decision: PlanDecision = structured_llm_plan.invoke(prompt)
+    plan_decision: PlanDecision = await structured_llm_plan.ainvoke(prompt)
     print(f"Planning Decision: {plan_decision}")
 
     if plan_decision.should_use_tools:
@@ -168,25 +248,33 @@ def planning_node(state: AgentState):
         return {}
 
 # 4. Agent Node (LangChain's ReAct-like logic for tool invocation or direct response)
-def agent_node(state: AgentState):
+@timed_node
+async def agent_node(state: AgentState):
     """Invokes the LLM to use tools or generate a response. This is the main ReAct-style agent logic."""
     print("--- AGENT: EXECUTING/RESPONDING ---")
-    
-    user_profile = state['user_context'].get('user_profile', {})
-    user_goal = state['user_context'].get('goal', {})
-    recent_logs = state['user_context'].get('recent_logs', [])
-    recent_food_entries = state['user_context'].get('recent_food_entries', [])
-
-    # Summarize relevant user context for the LLM
-    context_summary = ""
-    if user_profile:
-        context_summary += f"User: {user_profile.get('name', 'N/A')}, Email: {user_profile.get('email', 'N/A')}.\n"
-    if user_goal:
-        context_summary += f"Current Goal: {user_goal.get('goal_description', 'N/A')}. Analysis: {user_goal.get('analysis_result', 'N/A')}.\n"
-    if recent_logs:
-        context_summary += f"Recent Logs (last {len(recent_logs)} entries): {recent_logs}.\n"
-    if recent_food_entries:
-        context_summary += f"Recent Food Entries (last {len(recent_food_entries)} entries): {recent_food_entries}.\n"
+    return await _agent_step(state)
+
+# Extra instructions for the fast planner: goal detection and clarification happen in the same tool-bound call
+FAST_PLANNER_INSTRUCTIONS = """
+    Before answering, silently identify the user's primary goal ('lose_weight', 'gain_weight', 'stay_healthy') from their input, the conversation and the user context.
+    If the goal is unclear and the user context has no goal set, do not call any tools. Instead ask for the missing details, e.g.:
+    - What is your specific health goal (e.g., lose weight, gain muscle, improve energy)?
+    - Do you have a timeframe in mind to achieve this goal?
+    - Do you exercise regularly? If so, what kind and how often?
+    - Are there any health conditions, allergies, or dietary restrictions I should be aware of?
+    """
+
+@timed_node
+async def fast_agent_node(state: AgentState):
+    """Single tool-bound LLM call covering goal detection, clarification and tool choice."""
+    print("--- FAST AGENT: ANALYZING/EXECUTING/RESPONDING ---")
+    return await _agent_step(state, FAST_PLANNER_INSTRUCTIONS)
+
+async def _agent_step(state: AgentState, extra_instructions: str = ""):
+    """Builds the agent prompt and makes one tool-bound LLM call."""
+
+    user_context = state.get('user_context') or {}
+    context_summary = get_context_summary(state)
 
     # Construct messages for the LLM, including history and current input
     # The system prompt guides the LLM on how to behave based on the current state (goal, tools needed etc.)
@@ -197,7 +285,7 @@ def agent_node(state: AgentState):
     Conversation History is provided.
     
     You have access to the following tools:
-    {[f'{tool.name}: {tool.description}' for tool in all_tools]}
+    {graph_registry.tool_descriptions}
     
     Follow these instructions:
     1. If the user's query can be answered directly or a plan can be provided without specific calculations yet, respond directly.
@@ -209,20 +297,22 @@ def agent_node(state: AgentState):
     Based on the user's input, their current context, and the conversation history, decide whether to call a tool or respond directly.
     If you are calling a tool, ensure you have all necessary parameters from the conversation or ask if missing.
     If responding directly, provide a comprehensive answer or plan.
-    """
+    {extra_instructions}"""
     
     messages = [HumanMessage(content=system_prompt)] # System prompt as HumanMessage for some models
-    messages.extend(state['chat_history'])
+    messages.extend(history_messages(state))
     messages.append(HumanMessage(content=state['input']))
+    # Replay earlier tool calls and their results so the LLM can answer from them instead of re-calling the tools
+    messages.extend(state.get('intermediate_steps') or [])
 
     # The LLM decides whether to call a tool or respond directly.
-    # We bind the tools to the LLM so it knows how to format tool calls.
-    agent_llm_with_tools = llm.bind_tools(all_tools)
+    # The tools are bound to the LLM once in the registry so it knows how to format tool calls.
+    agent_llm_with_tools = graph_registry.personal_agent_llm if user_context else graph_registry.agent_llm
     
     # Invoke the LLM
     # If the LLM decides to call a tool, it will return a message with `tool_calls` attribute
     # If it decides to respond directly, it will return a standard AIMessage content
-    ai_response_message = agent_llm_with_tools.invoke(messages)
+    ai_response_message = await agent_llm_with_tools.ainvoke(messages)
     
     if not ai_response_message.tool_calls:
         print(f"Agent: Responding directly. AI Response: {ai_response_message.content}")
@@ -232,7 +322,7 @@ def agent_node(state: AgentState):
         # Convert AIMessage with tool_calls to AgentAction(s)
         actions = []
         for tool_call in ai_response_message.tool_calls:
-            actions.append(ToolInvocation(tool=tool_call["name"], tool_input=tool_call["args"]))
+            actions.append(ToolInvocation(tool=tool_call["name"], tool_input=tool_call["args"], tool_call_id=tool_call.get("id")))
         
         # LangGraph expects AgentAction for tool execution, not ToolInvocation directly in this part of the typical agent loop.
         # However, ToolExecutor can take ToolInvocation. For simplicity in this custom loop, 
@@ -244,11 +334,44 @@ def agent_node(state: AgentState):
         
         # For now, let's prepare it as if it's going to the ToolExecutor which can handle ToolInvocation
         # The `agent_outcome` will be processed by the `tool_execution_node`
-        return {"agent_outcome": actions} # actions is a list of ToolInvocation
+        return {"agent_outcome": actions, "intermediate_steps": [ai_response_message]} # actions is a list of ToolInvocation
 
 # 5. Tool Execution Node
-def tool_execution_node(state: AgentState):
-    """Executes the tools chosen by the agent and returns the results."""
+async def execute_tool(action: ToolInvocation) -> ToolMessage:
+    """Runs one tool call with its timeout and wraps the result (or error) in a ToolMessage."""
+    print(f"Executing tool: {action.tool} with input {action.tool_input}")
+    tool_to_execute = graph_registry.tools_by_name.get(action.tool)
+    start = time.perf_counter()
+    status = "ok"
+    if tool_to_execute:
+        timeout = getattr(tool_to_execute, "timeout_seconds", TOOL_TIMEOUT_SECONDS)
+        try:
+            if action.tool in graph_registry.native_async_tools:
+                # ainvoke dispatches to the tool's _arun coroutine
+                pending = tool_to_execute.ainvoke(action.tool_input)
+            else:
+                # Copy the context so callbacks (e.g. tool events on /chat/stream) still fire from the worker thread
+                context = contextvars.copy_context()
+                pending = asyncio.get_running_loop().run_in_executor(tool_executor, context.run, tool_to_execute.invoke, action.tool_input)
+            observation = await asyncio.wait_for(pending, timeout)
+        except asyncio.TimeoutError:
+            status = "timeout"
+            observation = f"Error executing tool {action.tool}: timed out after {timeout}s"
+            print(f"Error: {observation}")
+        except Exception as e:
+            status = "error"
+            observation = f"Error executing tool {action.tool}: {e}"
+            print(f"Error: {observation}")
+    else:
+        status = "not_found"
+        observation = f"Tool {action.tool} not found."
+        print(f"Error: {observation}")
+    record_tool(action.tool, time.perf_counter() - start, status)
+    return ToolMessage(content=str(observation), tool_call_id=action.tool_call_id or action.tool)
+
+@timed_node
+async def tool_execution_node(state: AgentState):
+    """Executes the tools chosen by the agent concurrently and returns the results in call order."""
     print("--- EXECUTING TOOLS --- ")
     agent_actions = state["agent_outcome"] # This should be List[ToolInvocation]
     
@@ -256,37 +379,15 @@ def tool_execution_node(state: AgentState):
         # Handle cases where it might be a single action, though LLM tool_calls usually gives a list
         agent_actions = [agent_actions]
 
-    outputs = []
-    for action in agent_actions:
-        # action here is expected to be a ToolInvocation or similar structure that tool_executor can handle
-        # If it was an AgentAction, it would be action.tool, action.tool_input
-        print(f"Executing tool: {action.tool} with input {action.tool_input}")
-        # The tool_executor.invoke expects a single ToolInvocation or AgentAction
-        # If agent_outcome is a list of ToolInvocations, we iterate and execute.
-        tool_to_execute = next((t for t in all_tools if t.name == action.tool), None)
-        if tool_to_execute:
-            try:
-                observation = tool_to_execute.invoke(action.tool_input)
-            except Exception as e:
-                observation = f"Error executing tool {action.tool}: {e}"
-                print(f"Error: {observation}")
-        else:
-            observation = f"Tool {action.tool} not found."
-            print(f"Error: {observation}")
-        
-        outputs.append(
-            (ToolMessage(content=str(observation), tool_call_id=action.tool_call_id if hasattr(action, 'tool_call_id') else None) if isinstance(action, ToolInvocation) else (action, str(observation)))
-        )
-        # The structure for intermediate_steps is typically List[Tuple[AgentAction, str]]
-        # We need to adapt if action is ToolInvocation. For now, storing as (ToolInvocation, observation string)
-        # Or convert ToolInvocation to a mock AgentAction for storage if strict ReAct format is needed for `intermediate_steps`
-        # For simplicity, let's assume this structure is okay for now or adapt later if LangGraph complains.
-        # A more robust way: if action is ToolInvocation, create a dummy AgentAction for the tuple.
-        # mock_agent_action = AgentAction(tool=action.tool, tool_input=action.tool_input, log="")
-        # outputs.append((mock_agent_action, str(observation)))
+    # Tools that read user data run for the authenticated user only; the tasks below inherit it
+    profile = (state.get("user_context") or {}).get("user_profile") or {}
+    tool_user_id.set(profile.get("id"))
+
+    # gather keeps results in the order of the tool calls, so each ToolMessage lines up with its tool_call_id
+    outputs = await asyncio.gather(*(execute_tool(action) for action in agent_actions))
 
     print(f"Tool Results: {outputs}")
-    return {"intermediate_steps": outputs}
+    return {"intermediate_steps": list(outputs)}
 
 # --- Conditional Edges --- #
 
@@ -380,76 +481,196 @@ workflow.add_conditional_edges(
 # After tools are executed, results go back to the agent node to process and generate a final response
 workflow.add_edge("tool_execution_node", "agent_node")
 
-# Compile the graph
-app = workflow.compile()
+# Compiled once by the graph registry
+graph_registry.register("graph", workflow.compile)
 
-def run_assistant(user_input: str, chat_history: List[Tuple[str, str]] = [], current_goal: Optional[dict] = None):
-    # Convert chat history to Langchain format
+# --- Fast Planner Graph --- #
+# One tool-bound LLM call per turn (plus one per tool round): fast_agent_node -> tools -> fast_agent_node
+fast_workflow = StateGraph(AgentState)
+fast_workflow.add_node("agent_node", fast_agent_node)
+fast_workflow.add_node("tool_execution_node", tool_execution_node)
+fast_workflow.set_entry_point("agent_node")
+fast_workflow.add_conditional_edges(
+    "agent_node",
+    after_planning_or_agent,
+    {
+        "tool_execution_node": "tool_execution_node",
+        END: END
+    }
+)
+fast_workflow.add_edge("tool_execution_node", "agent_node")
+graph_registry.register("fast", fast_workflow.compile)
+
+PLANNER_MODES = ("fast", "graph")
+
+def get_planner_app(mode: Optional[str] = None):
+    """Returns the compiled planner for `mode` ('fast' or 'graph'), defaulting to PLANNER_MODE."""
+    mode = mode or PLANNER_MODE
+    if mode not in PLANNER_MODES:
+        raise ValueError(f"Unknown planner mode '{mode}'. Choose from: {', '.join(PLANNER_MODES)}.")
+    return graph_registry.get(mode)
+
+def _convert_chat_history(chat_history: List[Tuple[str, str]]) -> List[BaseMessage]:
+    """Converts (human, ai) tuples into Langchain messages."""
     converted_chat_history = []
     for human_msg, ai_msg in chat_history:
         converted_chat_history.append(HumanMessage(content=human_msg))
         converted_chat_history.append(AIMessage(content=ai_msg))
-
-    # Initial state for the graph
-    initial_state = {
+    return converted_chat_history
+
+def build_initial_state(user_input: str, chat_history: List[Tuple[str, str]] = [], current_goal: Optional[dict] = None, user_context: Optional[dict] = None, history_summary: str = "") -> dict:
+    """Builds the initial graph state for a personalized assistant turn."""
+    if user_context is None and current_goal:
+        user_context = {"goal": current_goal} # Pass goal from DB
+    compact_context = compact_user_context(user_context)
+    record_context_tokens(compact_context.compact_tokens, compact_context.tokens_saved)
+    return {
         "input": user_input,
-        "chat_history": converted_chat_history,
+        "chat_history": _convert_chat_history(chat_history),
+        "history_summary": history_summary,
         "intermediate_steps": [],
-        "user_goal": current_goal.get("goal_text") if current_goal else "unknown", # Pass goal from DB
+        "user_context": user_context or {},
+        "context_summary": compact_context.text,
         "clarification_needed": False, # Assume clarified if goal is passed
         "clarification_questions_asked": 0
     }
 
-    # Run the graph
-    final_state: AgentState = app.invoke(initial_state)
+def _stored_goal(current_goal: Optional[dict], user_context: Optional[dict]) -> Optional[dict]:
+    """The user's saved Goal as a dict, used by the pre-router to fill calculator inputs."""
+    return (user_context or {}).get("goal") or current_goal
 
-    # Extract the final response
-    if isinstance(final_state["agent_outcome"], AgentFinish):
+def _final_output(final_state: AgentState, error_message: str) -> str:
+    """Extracts the final response text from the graph's final state."""
+    if isinstance(final_state.get("agent_outcome"), AgentFinish):
         return final_state["agent_outcome"].return_values["output"]
-    else:
-        # This case should ideally not be reached if the graph always ends with AgentFinish
-        return "An unexpected error occurred or the assistant did not finalize its response."
+    # This case should ideally not be reached if the graph always ends with AgentFinish
+    return error_message
 
-def run_qa_assistant(user_input: str, chat_history: List[Tuple[str, str]] = []):
-    # Convert chat history to Langchain format
-    converted_chat_history = []
-    for human_msg, ai_msg in chat_history:
-        converted_chat_history.append(HumanMessage(content=human_msg))
-        converted_chat_history.append(AIMessage(content=ai_msg))
+async def arun_assistant(user_input: str, chat_history: List[Tuple[str, str]] = [], current_goal: Optional[dict] = None, user_context: Optional[dict] = None, mode: Optional[str] = None, history_summary: str = "") -> str:
+    """Runs the personalized planner graph natively on the event loop."""
+    routed = prerouter.route(user_input, _stored_goal(current_goal, user_context))
+    if routed:
+        return routed.text
+    initial_state = build_initial_state(user_input, chat_history, current_goal, user_context, history_summary)
 
-    # Define a simple Q&A workflow without goal analysis or complex planning
-    qa_workflow = StateGraph(AgentState)
+    # Run the graph
+    final_state: AgentState = await get_planner_app(mode).ainvoke(initial_state)
 
-    # Define a simple agent node for Q&A
-    def qa_agent_node(state: AgentState):
-        print("--- QA AGENT: RESPONDING DIRECTLY ---")
-        messages = [
-            HumanMessage(content="You are a helpful AI assistant. Respond to the user's query.")
-        ]
-        messages.extend(state['chat_history'])
-        messages.append(HumanMessage(content=state['input']))
+    # Extract the final response
+    return _final_output(final_state, "An unexpected error occurred or the assistant did not finalize its response.")
+
+# Define a simple agent node for Q&A
+@timed_node
+async def qa_agent_node(state: AgentState):
+    print("--- QA AGENT: RESPONDING DIRECTLY ---")
+    messages = [
+        HumanMessage(content="You are a helpful AI assistant. Respond to the user's query.")
+    ]
+    messages.extend(history_messages(state))
+    messages.append(HumanMessage(content=state['input']))
 
-        ai_response_message = llm.invoke(messages)
-        return {"agent_outcome": AgentFinish(return_values={"output": ai_response_message.content}, log=ai_response_message.content)}
+    ai_response_message = await llm.ainvoke(messages)
+    return {"agent_outcome": AgentFinish(return_values={"output": ai_response_message.content}, log=ai_response_message.content)}
 
+def build_qa_app():
+    """Builds a simple Q&A workflow without goal analysis or complex planning."""
+    qa_workflow = StateGraph(AgentState)
     qa_workflow.add_node("qa_agent", qa_agent_node)
     qa_workflow.set_entry_point("qa_agent")
     qa_workflow.add_edge("qa_agent", END)
+    return qa_workflow.compile()
 
-    qa_app = qa_workflow.compile()
+graph_registry.register("qa", build_qa_app)
 
-    initial_state = {
+def build_qa_state(user_input: str, chat_history: List[Tuple[str, str]] = [], history_summary: str = "") -> dict:
+    """Builds the initial graph state for a generic Q&A turn."""
+    return {
         "input": user_input,
-        "chat_history": converted_chat_history,
+        "chat_history": _convert_chat_history(chat_history),
+        "history_summary": history_summary,
         "intermediate_steps": []
     }
 
-    final_state: AgentState = qa_app.invoke(initial_state)
-
-    if isinstance(final_state["agent_outcome"], AgentFinish):
-        return final_state["agent_outcome"].return_values["output"]
-    else:
-        return "An unexpected error occurred in Q&A assistant."
+async def arun_qa_assistant(user_input: str, chat_history: List[Tuple[str, str]] = [], history_summary: str = "") -> str:
+    """Runs the generic Q&A graph natively on the event loop."""
+    routed = prerouter.route(user_input)
+    if routed:
+        return routed.text
+    qa_app = graph_registry.get("qa")
+    initial_state = build_qa_state(user_input, chat_history, history_summary)
+
+    final_state: AgentState = await qa_app.ainvoke(initial_state)
+    return _final_output(final_state, "An unexpected error occurred in Q&A assistant.")
+
+# Nodes whose LLM output is the user-facing answer; structured-output calls in other nodes are not streamed
+STREAMING_NODES = {"agent_node", "qa_agent"}
+
+def _chunk_text(chunk) -> str:
+    """Returns the text part of a streamed message chunk."""
+    content = chunk.content
+    if isinstance(content, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+    return content or ""
+
+async def astream_graph(graph, initial_state: dict, error_message: str):
+    """Streams a compiled graph run as (kind, payload) events.
+
+    Yields ("token", text) for every LLM chunk produced by a streaming node,
+    ("tool_start", {...}) / ("tool_end", {...}) around tool runs, and finally
+    ("final", text) with the complete answer.
+    """
+    final_state = None
+    streamed_any = False
+    async for event in graph.astream_events(initial_state, version="v2"):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+        if kind == "on_chat_model_stream" and node in STREAMING_NODES:
+            text = _chunk_text(event["data"]["chunk"])
+            if text:
+                streamed_any = True
+                yield "token", text
+        elif kind == "on_tool_start":
+            yield "tool_start", {"name": event["name"], "input": event["data"].get("input")}
+        elif kind == "on_tool_end":
+            output = event["data"].get("output")
+            yield "tool_end", {"name": event["name"], "output": str(getattr(output, "content", output))}
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            final_state = event["data"].get("output")
+
+    final_text = _final_output(final_state or {}, error_message)
+    if not streamed_any:
+        # e.g. the clarification node answers without calling the LLM
+        yield "token", final_text
+    yield "final", final_text
+
+async def _routed_events(text: str):
+    """Event stream for an answer produced by the pre-router."""
+    yield "token", text
+    yield "final", text
+
+def astream_assistant(user_input: str, chat_history: List[Tuple[str, str]] = [], current_goal: Optional[dict] = None, user_context: Optional[dict] = None, mode: Optional[str] = None, history_summary: str = ""):
+    """Streams the personalized planner graph token by token."""
+    routed = prerouter.route(user_input, _stored_goal(current_goal, user_context))
+    if routed:
+        return _routed_events(routed.text)
+    initial_state = build_initial_state(user_input, chat_history, current_goal, user_context, history_summary)
+    return astream_graph(get_planner_app(mode), initial_state, "An unexpected error occurred or the assistant did not finalize its response.")
+
+def astream_qa_assistant(user_input: str, chat_history: List[Tuple[str, str]] = [], history_summary: str = ""):
+    """Streams the generic Q&A graph token by token."""
+    routed = prerouter.route(user_input)
+    if routed:
+        return _routed_events(routed.text)
+    initial_state = build_qa_state(user_input, chat_history, history_summary)
+    return astream_graph(graph_registry.get("qa"), initial_state, "An unexpected error occurred in Q&A assistant.")
+
+def run_assistant(user_input: str, chat_history: List[Tuple[str, str]] = [], current_goal: Optional[dict] = None, user_context: Optional[dict] = None, mode: Optional[str] = None) -> str:
+    """Sync wrapper around `arun_assistant` for scripts; must not be called from a running event loop."""
+    return asyncio.run(arun_assistant(user_input, chat_history, current_goal, user_context, mode))
+
+def run_qa_assistant(user_input: str, chat_history: List[Tuple[str, str]] = []) -> str:
+    """Sync wrapper around `arun_qa_assistant` for scripts; must not be called from a running event loop."""
+    return asyncio.run(arun_qa_assistant(user_input, chat_history))
 
 
 # Example usage (for testing)
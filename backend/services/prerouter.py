@@ -0,0 +1,231 @@
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from backend.services.tools import BMICalculatorTool, BMRCalculatorTool, CalorieEstimatorTool, compute_bmr
+
+# --- Intents --- #
+INTENT_PATTERNS = {
+    "bmi": re.compile(r"\bbmi\b|body mass index", re.I),
+    "bmr": re.compile(r"\bbmr\b|basal metabolic|resting metabolic", re.I),
+    "calories": re.compile(
+        r"how many calories|calorie (?:needs?|target|intake|goal|budget)|daily calories|maintenance calories"
+        r"|calories (?:should|do|must) i (?:eat|need|consume|have)",
+        re.I,
+    ),
+}
+
+# Anything asking for more than a number goes to the LLM
+COMPOUND_REQUEST = re.compile(
+    r"\b(?:plan|meal|recipe|workout|routine|why|explain|tips?|advice|suggest|recommend|compare|versus|vs)\b", re.I
+)
+MAX_MESSAGE_CHARS = 240
+
+# --- Slots --- #
+WEIGHT = re.compile(r"(\d+(?:\.\d+)?)\s*(kg|kgs|kilos?|kilograms?|lbs?|pounds?)\b", re.I)
+HEIGHT_M = re.compile(r"(?<![\d.])(\d(?:\.\d+)?)\s*(?:m|meters?|metres?)\b", re.I)
+HEIGHT_CM = re.compile(r"(?<![\d.])(\d{2,3}(?:\.\d+)?)\s*(?:cm|cms|centimet(?:er|re)s?)\b", re.I)
+HEIGHT_FT = re.compile(r"(?<![\d.])(\d)\s*(?:ft|feet|foot|')\s*(?:(\d{1,2})\s*(?:in|inches|\"|''))?", re.I)
+AGE = re.compile(r"(\d{1,3})\s*(?:years?|yrs?|y/o|yo)\b|\baged?\s*(?:is\s*|of\s*|:\s*)?(\d{1,3})\b", re.I)
+GENDER = re.compile(r"\b(male|man|boy|guy|female|woman|girl|lady)\b", re.I)
+ACTIVITY = re.compile(r"\b(sedentary|lightly active|light|moderately active|moderate|very active|extra active|extremely active|active)\b", re.I)
+# "lose 10 pounds" is a weight change, not the user's weight
+WEIGHT_CHANGE = re.compile(r"\b(?:lose|losing|lost|gain|gaining|gained|drop|shed|put on)\s*(?:about|around|another)?\s*$", re.I)
+PLAUSIBLE = {"weight_kg": (20, 400), "height_cm": (100, 250), "age_years": (10, 120)}
+GOAL = re.compile(r"\b(lose|losing|cut|cutting|deficit|gain|gaining|bulk|bulking|surplus|maintain|maintaining|maintenance)\b", re.I)
+
+FEMALE_WORDS = {"female", "woman", "girl", "lady"}
+ACTIVITY_WORDS = {
+    "sedentary": "sedentary",
+    "light": "light", "lightly active": "light",
+    "moderate": "moderate", "moderately active": "moderate",
+    "active": "active", "very active": "active",
+    "extra active": "very_active", "extremely active": "very_active",
+}
+GOAL_WORDS = {
+    "lose": "lose_weight", "losing": "lose_weight", "cut": "lose_weight", "cutting": "lose_weight", "deficit": "lose_weight",
+    "gain": "gain_weight", "gaining": "gain_weight", "bulk": "gain_weight", "bulking": "gain_weight", "surplus": "gain_weight",
+    "maintain": "maintain_weight", "maintaining": "maintain_weight", "maintenance": "maintain_weight",
+}
+# Values stored on `Goal` by the set-goal form
+STORED_ACTIVITY_LEVELS = {
+    "sedentary": "sedentary", "lightly_active": "light", "moderately_active": "moderate",
+    "very_active": "active", "extra_active": "very_active",
+    "light": "light", "moderate": "moderate", "active": "active",
+}
+STORED_GOAL_TYPES = {
+    "weight_loss": "lose_weight", "lose_weight": "lose_weight",
+    "muscle_gain": "gain_weight", "gain_weight": "gain_weight",
+    "healthy_eating": "maintain_weight", "overall_fitness": "maintain_weight", "maintain_weight": "maintain_weight",
+}
+
+
+@dataclass
+class Slots:
+    weight_kg: Optional[float] = None
+    height_cm: Optional[float] = None
+    age_years: Optional[int] = None
+    gender: Optional[str] = None
+    activity_level: Optional[str] = None
+    goal: Optional[str] = None
+    from_profile: List[str] = field(default_factory=list) # Slots filled from the stored goal
+
+
+class Unsure(Exception):
+    """Raised when the message cannot be answered deterministically; carries the fallback reason."""
+
+
+def _single(values: List[float], slot: str) -> Optional[float]:
+    distinct = set(values)
+    if len(distinct) > 1:
+        raise Unsure(f"ambiguous_{slot}")
+    return distinct.pop() if distinct else None
+
+
+def extract_slots(message: str) -> Slots:
+    """Pulls body metrics, activity level and goal out of a free-text message."""
+    slots = Slots()
+    weights = []
+    for match in WEIGHT.finditer(message):
+        if WEIGHT_CHANGE.search(message[:match.start()]):
+            continue
+        weight, unit = float(match.group(1)), match.group(2).lower()
+        weights.append(round(weight * 0.45359237, 2) if unit.startswith(("lb", "pound")) else weight)
+    slots.weight_kg = _single(weights, "weight")
+
+    heights = [float(value) for value in HEIGHT_CM.findall(message)]
+    heights += [float(value) * 100 for value in HEIGHT_M.findall(message)]
+    heights += [round((int(feet) * 12 + int(inches or 0)) * 2.54, 1) for feet, inches in HEIGHT_FT.findall(message)]
+    slots.height_cm = _single(heights, "height")
+
+    ages = [int(a or b) for a, b in AGE.findall(message)]
+    age = _single(ages, "age")
+    slots.age_years = int(age) if age is not None else None
+
+    genders = {"female" if word.lower() in FEMALE_WORDS else "male" for word in GENDER.findall(message)}
+    if len(genders) > 1:
+        raise Unsure("ambiguous_gender")
+    slots.gender = genders.pop() if genders else None
+
+    activities = {ACTIVITY_WORDS[word.lower()] for word in ACTIVITY.findall(message)}
+    if len(activities) > 1:
+        raise Unsure("ambiguous_activity_level")
+    slots.activity_level = activities.pop() if activities else None
+
+    goals = {GOAL_WORDS[word.lower()] for word in GOAL.findall(message)}
+    if len(goals) > 1:
+        raise Unsure("ambiguous_goal")
+    slots.goal = goals.pop() if goals else None
+
+    for name, (low, high) in PLAUSIBLE.items():
+        value = getattr(slots, name)
+        if value is not None and not low <= value <= high:
+            raise Unsure(f"implausible_{name}")
+    return slots
+
+
+def fill_from_goal(slots: Slots, goal: Optional[dict]) -> Slots:
+    """Fills missing slots from the user's stored Goal (height in cm, as saved by /goal/set)."""
+    if not goal:
+        return slots
+    stored = {
+        "weight_kg": goal.get("current_weight"),
+        "height_cm": goal.get("height"),
+        "age_years": goal.get("age"),
+        "gender": (goal.get("gender") or "").lower() or None,
+        "activity_level": STORED_ACTIVITY_LEVELS.get((goal.get("activity_level") or "").lower()),
+        "goal": STORED_GOAL_TYPES.get((goal.get("goal_type") or "").lower()),
+    }
+    for name, value in stored.items():
+        if getattr(slots, name) is None and value is not None:
+            setattr(slots, name, value)
+            slots.from_profile.append(name)
+    return slots
+
+
+@dataclass
+class RoutedAnswer:
+    text: str
+    intents: List[str]
+
+
+class PreRouter:
+    """Answers pure calculator questions (BMI, BMR, calorie needs) from the tools without an LLM call."""
+
+    def __init__(self):
+        self.bmi_tool = BMICalculatorTool()
+        self.bmr_tool = BMRCalculatorTool()
+        self.calorie_tool = CalorieEstimatorTool()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.hits_by_intent: Counter = Counter()
+        self.fallbacks_by_reason: Counter = Counter()
+
+    def _detect_intents(self, message: str) -> List[str]:
+        return [intent for intent, pattern in INTENT_PATTERNS.items() if pattern.search(message)]
+
+    def _answer(self, intents: List[str], slots: Slots) -> str:
+        def need(*names):
+            missing = [name for name in names if getattr(slots, name) is None]
+            if missing:
+                raise Unsure("missing_" + "_".join(missing))
+
+        parts = []
+        if "bmi" in intents:
+            need("weight_kg", "height_cm")
+            parts.append(self.bmi_tool._run(weight_kg=slots.weight_kg, height_m=slots.height_cm / 100))
+        if "bmr" in intents or "calories" in intents:
+            need("weight_kg", "height_cm", "age_years", "gender")
+            if slots.gender not in ("male", "female"):
+                raise Unsure("unsupported_gender")
+            bmr_text = self.bmr_tool._run(age_years=slots.age_years, gender=slots.gender, weight_kg=slots.weight_kg, height_cm=slots.height_cm)
+            if "bmr" in intents:
+                parts.append(bmr_text)
+            if "calories" in intents:
+                need("activity_level", "goal")
+                bmr = compute_bmr(slots.age_years, slots.gender, slots.weight_kg, slots.height_cm)
+                parts.append(self.calorie_tool._run(bmr=bmr, activity_level=slots.activity_level, goal=slots.goal))
+        if any(part.startswith("Error") for part in parts):
+            raise Unsure("invalid_slots")
+        if slots.from_profile:
+            parts.append("(Calculated from the details in your saved goal profile.)")
+        return " ".join(parts)
+
+    def route(self, message: str, goal: Optional[dict] = None) -> Optional[RoutedAnswer]:
+        """Returns a direct answer, or None when the planner graph should handle the message."""
+        try:
+            if len(message) > MAX_MESSAGE_CHARS:
+                raise Unsure("too_long")
+            intents = self._detect_intents(message)
+            if not intents:
+                raise Unsure("no_intent")
+            if COMPOUND_REQUEST.search(message):
+                raise Unsure("compound_request")
+            slots = fill_from_goal(extract_slots(message), goal)
+            answer = RoutedAnswer(text=self._answer(intents, slots), intents=intents)
+        except Unsure as reason:
+            with self._lock:
+                self.requests += 1
+                self.fallbacks_by_reason[str(reason)] += 1
+            return None
+        with self._lock:
+            self.requests += 1
+            self.hits += 1
+            self.hits_by_intent.update(intents)
+        return answer
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.requests, 4) if self.requests else 0.0,
+                "hits_by_intent": dict(self.hits_by_intent),
+                "fallbacks_by_reason": dict(self.fallbacks_by_reason),
+            }
+
+
+prerouter = PreRouter()
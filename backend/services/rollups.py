@@ -0,0 +1,173 @@
+"""Per-user daily rollups of logs and food entries (the `daily_rollups` table).
+
+Writes bump the day's row in the same transaction as the entry they add, so summary and
+context reads fetch one row per day instead of every entry. Rebuild the table from the
+raw entries with:
+    python -m backend.services.rollups --backfill [--user-id N]
+"""
+import argparse
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models.db_models import DailyRollup, FoodEntry, Log
+
+rollups = DailyRollup.__table__
+COUNTERS = (
+    "log_count", "steps_total", "sleep_hours_sum", "sleep_count", "water_intake_sum", "water_count",
+    "log_calories_total", "food_count", "food_calories_total",
+)
+BACKFILL_BATCH_ROWS = 5000
+
+
+def as_date(value) -> date:
+    # func.date() returns a date on MySQL and an ISO string on SQLite
+    if isinstance(value, datetime):
+        return value.date()
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def log_increments(log: Union[Log, dict]) -> Dict[str, float]:
+    get = log.get if isinstance(log, dict) else log.__getattribute__
+    return {
+        "log_count": 1,
+        "steps_total": get("steps") or 0,
+        "sleep_hours_sum": get("sleep_hours") or 0,
+        "sleep_count": int(get("sleep_hours") is not None),
+        "water_intake_sum": get("water_intake") or 0,
+        "water_count": int(get("water_intake") is not None),
+        "log_calories_total": get("calories") or 0,
+    }
+
+
+def food_increments(entry: Union[FoodEntry, dict]) -> Dict[str, float]:
+    calories = entry.get("calories") if isinstance(entry, dict) else entry.calories
+    return {"food_count": 1, "food_calories_total": calories or 0}
+
+
+def daily_increments(rows: List[dict], increments: Callable[[dict], Dict[str, float]]) -> Dict[Tuple[int, date], Dict[str, float]]:
+    """Sums the increments of many entries (dicts with user_id and created_at) per user and day, so a batch bumps each row once."""
+    days: Dict[Tuple[int, date], Dict[str, float]] = {}
+    for row in rows:
+        totals = days.setdefault((row["user_id"], as_date(row["created_at"])), {})
+        for name, value in increments(row).items():
+            totals[name] = totals.get(name, 0) + value
+    return days
+
+
+def _upsert(dialect: str, user_id: int, day: date, increments: Dict[str, float]):
+    values = {"user_id": user_id, "day": day, **{name: increments.get(name, 0) for name in COUNTERS}}
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(rollups).values(**values)
+        return stmt.on_duplicate_key_update({name: rollups.c[name] + stmt.inserted[name] for name in increments})
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(rollups).values(**values)
+        return stmt.on_conflict_do_update(index_elements=["user_id", "day"], set_={name: rollups.c[name] + stmt.excluded[name] for name in increments})
+    return None
+
+
+def _fallback_statements(user_id: int, day: date, increments: Dict[str, float]):
+    # No native upsert: update, then insert when the row doesn't exist yet
+    bump = update(rollups).where(rollups.c.user_id == user_id, rollups.c.day == day).values({name: rollups.c[name] + value for name, value in increments.items()})
+    create = rollups.insert().values(user_id=user_id, day=day, **{name: increments.get(name, 0) for name in COUNTERS})
+    return bump, create
+
+
+def bump_daily_rollup(db: Union[Session, Connection], user_id: int, day: date, increments: Dict[str, float]):
+    """Adds `increments` to the user's row for `day`, creating it if needed; the caller commits."""
+    stmt = _upsert(db.get_bind().dialect.name if isinstance(db, Session) else db.dialect.name, user_id, day, increments)
+    if stmt is not None:
+        db.execute(stmt)
+        return
+    bump, create = _fallback_statements(user_id, day, increments)
+    if not db.execute(bump).rowcount:
+        db.execute(create)
+
+
+async def abump_daily_rollup(db: AsyncSession, user_id: int, day: date, increments: Dict[str, float]):
+    """`bump_daily_rollup` for an AsyncSession."""
+    stmt = _upsert(db.bind.dialect.name, user_id, day, increments)
+    if stmt is not None:
+        await db.execute(stmt)
+        return
+    bump, create = _fallback_statements(user_id, day, increments)
+    if not (await db.execute(bump)).rowcount:
+        await db.execute(create)
+
+
+def daily_rollups_statement(user_id: int, start_day: date, end_day: date):
+    return (
+        select(DailyRollup)
+        .where(DailyRollup.user_id == user_id, DailyRollup.day >= start_day, DailyRollup.day <= end_day)
+        .order_by(DailyRollup.day.desc())
+    )
+
+
+def get_daily_rollups(db: Session, user_id: int, start_day: date, end_day: date) -> List[DailyRollup]:
+    """The user's rollups from `start_day` to `end_day` inclusive, newest first (days without entries are absent)."""
+    return list(db.execute(daily_rollups_statement(user_id, start_day, end_day)).scalars())
+
+
+async def aget_daily_rollups(db: AsyncSession, user_id: int, start_day: date, end_day: date) -> List[DailyRollup]:
+    return list((await db.execute(daily_rollups_statement(user_id, start_day, end_day))).scalars())
+
+
+def rollup_counters(rollup: DailyRollup) -> dict:
+    """The raw counters of a rollup with its day as an ISO date (what the context cache keeps and patches)."""
+    return {"day": rollup.day.isoformat(), **{name: getattr(rollup, name) for name in COUNTERS}}
+
+
+def backfill_rollups(conn: Connection, user_id: Optional[int] = None) -> int:
+    """Rebuilds rollups (for one user or everyone) from the raw entries; returns the rows written.
+
+    Entries added while it runs may be counted twice or not at all, so run it with writes
+    paused or for a user who isn't logging.
+    """
+    log_day = func.date(Log.created_at)
+    log_rows = select(
+        Log.user_id, log_day, func.count(Log.id), func.coalesce(func.sum(Log.steps), 0),
+        func.coalesce(func.sum(Log.sleep_hours), 0), func.count(Log.sleep_hours),
+        func.coalesce(func.sum(Log.water_intake), 0), func.count(Log.water_intake),
+        func.coalesce(func.sum(Log.calories), 0),
+    ).group_by(Log.user_id, log_day)
+    food_day = func.date(FoodEntry.created_at)
+    food_rows = select(FoodEntry.user_id, food_day, func.count(FoodEntry.id), func.coalesce(func.sum(FoodEntry.calories), 0)).group_by(FoodEntry.user_id, food_day)
+    clear = delete(rollups)
+    if user_id is not None:
+        log_rows = log_rows.where(Log.user_id == user_id)
+        food_rows = food_rows.where(FoodEntry.user_id == user_id)
+        clear = clear.where(rollups.c.user_id == user_id)
+
+    days: Dict[Tuple[int, date], dict] = {}
+    for row_user, day, *counters in conn.execute(log_rows):
+        if row_user is None or day is None:
+            continue
+        days[(row_user, as_date(day))] = dict(zip(COUNTERS[:7], counters), food_count=0, food_calories_total=0)
+    for row_user, day, count, calories in conn.execute(food_rows):
+        if row_user is None or day is None:
+            continue
+        row = days.setdefault((row_user, as_date(day)), {name: 0 for name in COUNTERS})
+        row["food_count"], row["food_calories_total"] = count, calories
+
+    conn.execute(clear)
+    batch = [{"user_id": key[0], "day": key[1], **counters} for key, counters in days.items()]
+    for start in range(0, len(batch), BACKFILL_BATCH_ROWS):
+        conn.execute(rollups.insert(), batch[start:start + BACKFILL_BATCH_ROWS])
+    return len(batch)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the daily_rollups table from logs and food entries.")
+    parser.add_argument("--backfill", action="store_true", required=True)
+    parser.add_argument("--user-id", type=int, help="Only rebuild this user's rollups")
+    args = parser.parse_args()
+
+    from backend.data.db import engine
+    with engine.begin() as conn:
+        print(f"Wrote {backfill_rollups(conn, args.user_id)} daily rollups.")
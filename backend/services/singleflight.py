@@ -0,0 +1,110 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, List
+
+
+class _Flight:
+    """One upstream call shared by every caller with the same key."""
+
+    def __init__(self):
+        self.subscribers = 0
+        self.task: asyncio.Task = None
+        # Streaming flights buffer chunks so late joiners replay what they missed
+        self.chunks: List = []
+        self.done = False
+        self.error: BaseException = None
+        self.changed = asyncio.Condition()
+
+
+class SingleFlight:
+    """Coalesces concurrent identical async calls (and streams) into one upstream request.
+
+    The upstream call runs in its own task, so a caller that disconnects does not cancel
+    it for the others; it is only cancelled once every caller has gone away.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.deduplicated_calls = 0
+        self.streams = 0
+        self.deduplicated_streams = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        """Awaits `fn()` once for all concurrent callers of `key` and returns its result to each."""
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = self._calls[key] = _Flight()
+            flight.task = asyncio.ensure_future(fn())
+            flight.task.add_done_callback(lambda _: self._forget(self._calls, key, flight))
+            self.calls += 1
+        else:
+            self.deduplicated_calls += 1
+        flight.subscribers += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(self._calls, key, flight)
+
+    async def stream(self, key: str, fn: Callable[[], AsyncIterator]) -> AsyncIterator:
+        """Iterates `fn()` once for all concurrent callers of `key`; each caller receives every chunk."""
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = self._streams[key] = _Flight()
+            flight.task = asyncio.ensure_future(self._pump(key, flight, fn))
+            self.streams += 1
+        else:
+            self.deduplicated_streams += 1
+        flight.subscribers += 1
+        try:
+            position = 0
+            while True:
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: position < len(flight.chunks) or flight.done)
+                    pending = flight.chunks[position:]
+                    finished, error = flight.done, flight.error
+                for chunk in pending:
+                    yield chunk
+                position += len(pending)
+                if finished and position >= len(flight.chunks):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(self._streams, key, flight)
+
+    async def _pump(self, key: str, flight: _Flight, fn: Callable[[], AsyncIterator]):
+        try:
+            async for chunk in fn():
+                async with flight.changed:
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+        except BaseException as e:
+            flight.error = e
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            # New callers start a fresh upstream call once this one has finished
+            self._forget(self._streams, key, flight)
+            async with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
+
+    @staticmethod
+    def _forget(flights: Dict[str, _Flight], key: str, flight: _Flight):
+        if flights.get(key) is flight:
+            del flights[key]
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "deduplicated_calls": self.deduplicated_calls,
+            "streams": self.streams,
+            "deduplicated_streams": self.deduplicated_streams,
+        }
@@ -1,6 +1,7 @@
 from langchain.tools import BaseTool, Tool
 from pydantic import BaseModel, Field
 from typing import Type, Optional, List
+from contextvars import ContextVar
 import math
 
 # Optional: Tavily Search Tool (requires TAVILY_API_KEY in .env)
@@ -10,6 +11,34 @@ try:
 except Exception:
     tavily_tool = None
 
+# Shared formulas so the tools, the pre-router and batch calculators give identical results
+ACTIVITY_MULTIPLIERS = {
+    'sedentary': 1.2,        # little or no exercise
+    'light': 1.375,          # light exercise/sports 1-3 days/week
+    'moderate': 1.55,        # moderate exercise/sports 3-5 days/week
+    'active': 1.725,         # hard exercise/sports 6-7 days a week
+    'very_active': 1.9       # very hard exercise/sports & physical job
+}
+
+def compute_bmi(weight_kg: float, height_m: float) -> float:
+    """BMI rounded to one decimal, as reported by the BMI tool."""
+    return round(weight_kg / (height_m ** 2), 1)
+
+def bmi_category(bmi: float) -> str:
+    if bmi < 18.5:
+        return "Underweight"
+    elif 18.5 <= bmi <= 24.9:
+        return "Normal weight"
+    elif 25 <= bmi <= 29.9:
+        return "Overweight"
+    return "Obesity"
+
+def compute_bmr(age_years: int, gender: str, weight_kg: float, height_cm: float) -> float:
+    """Mifflin-St Jeor BMR (unrounded)."""
+    if gender.lower() == 'male':
+        return (10 * weight_kg) + (6.25 * height_cm) - (5 * age_years) + 5
+    return (10 * weight_kg) + (6.25 * height_cm) - (5 * age_years) - 161
+
 class BMICalculatorInput(BaseModel):
     weight_kg: float = Field(description="User's weight in kilograms")
     height_m: float = Field(description="User's height in meters")
@@ -18,21 +47,13 @@ class BMICalculatorTool(BaseTool):
     name: str = "bmi_calculator"
     description: str = "Calculates Body Mass Index (BMI) using weight in kg and height in meters. BMI Categories: Underweight < 18.5, Normal weight = 18.5–24.9, Overweight = 25–29.9, Obesity >= 30."
     args_schema: Type[BaseModel] = BMICalculatorInput
+    timeout_seconds: float = 2.0 # Per-tool timeout enforced by the planner
 
     def _run(self, weight_kg: float, height_m: float) -> str:
         if height_m <= 0:
             return "Error: Height must be greater than 0."
-        bmi = round(weight_kg / (height_m ** 2), 1)
-        category = ""
-        if bmi < 18.5:
-            category = "Underweight"
-        elif 18.5 <= bmi <= 24.9:
-            category = "Normal weight"
-        elif 25 <= bmi <= 29.9:
-            category = "Overweight"
-        else:
-            category = "Obesity"
-        return f"Your BMI is {bmi} ({category})."
+        bmi = compute_bmi(weight_kg, height_m)
+        return f"Your BMI is {bmi} ({bmi_category(bmi)})."
 
     async def _arun(self, weight_kg: float, height_m: float) -> str:
         return self._run(weight_kg, height_m)
@@ -47,6 +68,7 @@ class BMRCalculatorTool(BaseTool):
     name: str = "bmr_calculator"
     description: str = "Calculates Basal Metabolic Rate (BMR) using the Mifflin-St Jeor equation. This is the number of calories your body burns at rest."
     args_schema: Type[BaseModel] = BMRCalculatorInput
+    timeout_seconds: float = 2.0 # Per-tool timeout enforced by the planner
 
     def _run(self, age_years: int, gender: str, weight_kg: float, height_cm: float) -> str:
         if gender.lower() not in ['male', 'female']:
@@ -54,10 +76,7 @@ class BMRCalculatorTool(BaseTool):
         if weight_kg <= 0 or height_cm <= 0 or age_years <= 0:
             return "Error: Age, weight, and height must be positive values."
 
-        if gender.lower() == 'male':
-            bmr = (10 * weight_kg) + (6.25 * height_cm) - (5 * age_years) + 5
-        else:  # female
-            bmr = (10 * weight_kg) + (6.25 * height_cm) - (5 * age_years) - 161
+        bmr = compute_bmr(age_years, gender, weight_kg, height_cm)
         return f"Your estimated BMR is {round(bmr)} calories/day."
 
     async def _arun(self, age_years: int, gender: str, weight_kg: float, height_cm: float) -> str:
@@ -72,15 +91,10 @@ class CalorieEstimatorTool(BaseTool):
     name: str = "calorie_estimator"
     description: str = "Estimates daily calorie needs based on BMR, activity level, and health goal (lose_weight, gain_weight, maintain_weight)."
     args_schema: Type[BaseModel] = CalorieEstimatorInput
+    timeout_seconds: float = 2.0 # Per-tool timeout enforced by the planner
 
     def _run(self, bmr: float, activity_level: str, goal: str) -> str:
-        activity_multipliers = {
-            'sedentary': 1.2,        # little or no exercise
-            'light': 1.375,          # light exercise/sports 1-3 days/week
-            'moderate': 1.55,        # moderate exercise/sports 3-5 days/week
-            'active': 1.725,         # hard exercise/sports 6-7 days a week
-            'very_active': 1.9       # very hard exercise/sports & physical job
-        }
+        activity_multipliers = ACTIVITY_MULTIPLIERS
         activity_level_lower = activity_level.lower()
         if activity_level_lower not in activity_multipliers:
             return f"Error: Invalid activity level. Choose from: {', '.join(activity_multipliers.keys())}."
@@ -101,25 +115,39 @@ class CalorieEstimatorTool(BaseTool):
     async def _arun(self, bmr: float, activity_level: str, goal: str) -> str:
         return self._run(bmr, activity_level, goal)
 
+# Authenticated user the planner runs tools for (set by the tool execution node, never by the LLM)
+tool_user_id: ContextVar[Optional[int]] = ContextVar("tool_user_id", default=None)
+
+NO_TOOL_USER = "Error: Log summaries are only available to signed-in users."
+
 class UserLogSummaryInput(BaseModel):
-    user_id: str = Field(description="The ID of the user whose logs are to be summarized")
     days: int = Field(default=7, description="Number of past days to summarize logs for, e.g., 3 or 7")
 
 class UserLogSummaryTool(BaseTool):
     name: str = "user_log_summary_tool"
-    description: str = "Analyzes and summarizes user's recent health logs (e.g., steps, water intake, sleep) from the past few days. Provides insights based on the log data."
+    description: str = "Summarizes the signed-in user's health logs and food entries over the past few days: averages, totals, logging streaks and adherence to their goal targets (steps, sleep, water, calories)."
     args_schema: Type[BaseModel] = UserLogSummaryInput
-
-    def _run(self, user_id: str, days: int = 7) -> str:
-        # Placeholder: In a real application, this would query a database or data store
-        # For now, it returns a mock response.
-        # Example: Fetch logs for user_id for the last 'days' days
-        # Perform analysis (e.g., average sleep, water intake consistency, step goals)
-        # Return a summary string.
-        return f"Placeholder: Summarizing logs for user {user_id} for the past {days} days. Based on your (mock) recent activity, you seem to be drinking less water than needed. You’re getting enough steps but could improve sleep duration."
-
-    async def _arun(self, user_id: str, days: int = 7) -> str:
-        return self._run(user_id, days)
+    timeout_seconds: float = 5.0 # Per-tool timeout enforced by the planner
+
+    def _run(self, days: int = 7) -> str:
+        # Imported here so the calculator tools don't need a database
+        from backend.data.db import SessionLocal
+        from backend.services.log_summary import format_summary, summarize_logs
+        user_id = tool_user_id.get()
+        if user_id is None:
+            return NO_TOOL_USER
+        db = SessionLocal()
+        try:
+            return format_summary(summarize_logs(db, user_id, days))
+        finally:
+            db.close()
+
+    async def _arun(self, days: int = 7) -> str:
+        from backend.services.log_summary import asummarize_logs, format_summary
+        user_id = tool_user_id.get()
+        if user_id is None:
+            return NO_TOOL_USER
+        return format_summary(await asummarize_logs(user_id, days))
 
 
 # List of all tools to be used by the agent
@@ -169,7 +197,8 @@ if __name__ == '__main__':
     print(calorie_tool.run({"bmr": 1600, "activity_level": "light", "goal": "lose_weight"}))
 
     log_summary_tool = UserLogSummaryTool()
-    print(log_summary_tool.run({"user_id": "test_user_123"}))
+    tool_user_id.set(1)
+    print(log_summary_tool.run({"days": 7}))
 
     # available_tools = get_tools()
     # print(f"\nAvailable tools: {[tool.name for tool in available_tools]}")
\ No newline at end of file
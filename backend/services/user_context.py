@@ -0,0 +1,34 @@
+"""The user context placed in planner prompts (profile, goal, last 30 days), served from the context cache."""
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.services import async_db_service
+from backend.services.context_cache import CONTEXT_DAYS, TOP_FOODS_LIMIT, context_cache
+from backend.services.rollups import aget_daily_rollups, rollup_counters
+from models.db_models import User, rollup_view
+
+
+async def aget_user_context(db: AsyncSession, user: User) -> dict:
+    """Goal, daily rollups and top foods of the last 30 days; writes keep the cached entry
+    current, so only the parts it's missing are loaded (nothing for a returning user)."""
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=CONTEXT_DAYS)
+    entry, version = await context_cache.aget(user.id, end_date.date())
+    if entry is None or entry["goal"] is False or entry["rollups"] is None or entry["top_foods"] is None:
+        entry = entry or context_cache.new_entry(end_date.date())
+        if entry["goal"] is False:
+            current_goal = await async_db_service.get_goal_by_user_id(db, user.id)
+            entry["goal"] = current_goal.to_dict() if current_goal else None
+        if entry["rollups"] is None:
+            entry["rollups"] = [rollup_counters(rollup) for rollup in await aget_daily_rollups(db, user.id, start_date.date(), end_date.date())]
+        if entry["top_foods"] is None:
+            entry["top_foods"] = [dict(food._mapping) for food in await async_db_service.get_top_foods(db, user.id, start_date, end_date, TOP_FOODS_LIMIT)]
+        await context_cache.aput(user.id, entry, version)
+
+    return {
+        "user_profile": user.to_dict(),
+        "goal": entry["goal"],
+        "daily_rollups": [rollup_view(row) for row in entry["rollups"]],
+        "top_foods": entry["top_foods"],
+    }
@@ -0,0 +1,171 @@
+"""Write-behind group commit for /log and /log/food (enabled with LOG_WRITE_BEHIND=true).
+
+Accepted entries wait in an in-process buffer that is written as one transaction (multi-row
+INSERTs plus one rollup bump per user and day) every LOG_FLUSH_INTERVAL_MS, or as soon as
+LOG_FLUSH_MAX_ROWS entries are waiting, so peak write load costs one commit per batch
+instead of one per request.
+
+Acknowledgement (LOG_WRITE_ACK):
+  durable   the request waits for the commit of its batch, so a success response always
+            means the entry is stored (default); a failed batch is retried row by row, so
+            only the requests whose rows can't be stored fail
+  buffered  the request returns once the entry is buffered; entries still in memory are lost
+            if the process dies before the next flush
+Stored rows get their `id` (RETURNING, or one INSERT per row on MySQL). With either ack
+the buffer is flushed on shutdown, and `sync(user_id)` flushes a user's pending entries so
+reads like /summary see that user's own writes.
+
+WARNING: per process, like `goal_jobs`; each worker buffers and flushes its own entries.
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from backend.config.settings import LOG_FLUSH_INTERVAL_MS, LOG_FLUSH_MAX_ROWS, LOG_WRITE_ACK, LOG_WRITE_BEHIND
+from backend.data.db import AsyncSessionLocal
+from backend.services import async_db_service
+
+
+class WriteFailed(Exception):
+    """The batch holding an entry could not be committed."""
+
+
+class WriteBuffer:
+    def __init__(self, flush_interval_ms: float = LOG_FLUSH_INTERVAL_MS, max_rows: int = LOG_FLUSH_MAX_ROWS, durable: bool = LOG_WRITE_ACK != "buffered"):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+        self.durable = durable
+        self._pending: List[Tuple[str, dict, asyncio.Future]] = [] # (kind, row, commit future)
+        self._pending_users: Dict[int, int] = {}
+        self._flushing_users: Set[int] = set()
+        self._has_rows = asyncio.Event()
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock() # One flush at a time
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.largest_batch = 0
+        self.retried_batches = 0 # Failed as a whole, then written row by row
+        self.failed_rows = 0
+        self.lost_rows = 0 # Buffered-ack rows that could not be stored
+        self.flush_seconds_total = 0.0
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._has_rows.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.shield(self.flush()) # close() cancels the loop; a batch being written still completes
+
+    async def add(self, kind: str, row: dict) -> dict:
+        """Buffers a "log" or "food" row (dict of its columns incl. user_id); returns it once acknowledged."""
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((kind, row, future))
+        self._pending_users[row["user_id"]] = self._pending_users.get(row["user_id"], 0) + 1
+        self._has_rows.set()
+        if len(self._pending) >= self.max_rows:
+            self._full.set()
+        if not self.durable:
+            return row
+        return await asyncio.shield(future) # A cancelled request doesn't drop its entry from the batch
+
+    async def add_log(self, user_id: int, steps: int, sleep_hours: float, water_intake: float, calories: float) -> dict:
+        return await self.add("log", {"user_id": user_id, "steps": steps, "sleep_hours": sleep_hours, "water_intake": water_intake, "calories": calories, "created_at": None})
+
+    async def add_food_log(self, user_id: int, item_name: str, calories: int, confirmed: bool) -> dict:
+        return await self.add("food", {"user_id": user_id, "item_name": item_name, "calories": calories, "confirmed": confirmed, "created_at": None})
+
+    async def flush(self):
+        """Writes every buffered entry in one transaction and resolves their futures."""
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            self._flushing_users = set(self._pending_users)
+            self._pending_users = {}
+            self._has_rows.clear()
+            self._full.clear()
+            if not batch:
+                return
+            start = time.perf_counter()
+            try:
+                failed = await self._write(batch)
+            finally:
+                self._flushing_users = set()
+            self.flush_seconds_total += time.perf_counter() - start
+            self.flushes += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.rows_flushed += len(batch) - len(failed)
+            self.failed_rows += len(failed)
+            if failed and not self.durable:
+                self.lost_rows += len(failed)
+                print(f"Write buffer lost {len(failed)} acknowledged entries.")
+            for index, (_, row, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if index not in failed:
+                    future.set_result(row)
+                else:
+                    future.set_exception(WriteFailed("Could not store the entry."))
+                    future.exception() # Marks it retrieved when nobody awaits it (buffered ack)
+
+    async def _write(self, batch: List[Tuple[str, dict, asyncio.Future]]) -> Set[int]:
+        """Stores a batch in one transaction (rows get their ids); returns the indexes of the rows that failed."""
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.connection() # Without a connection the retries below would each wait for one
+                if await async_db_service.add_entries(
+                    db,
+                    [row for kind, row, _ in batch if kind == "log"],
+                    [row for kind, row, _ in batch if kind == "food"],
+                    with_ids=True,
+                ):
+                    return set()
+                # One bad row fails the whole transaction; retry row by row so only its request fails
+                self.retried_batches += 1
+                failed = set()
+                for index, (kind, row, _) in enumerate(batch):
+                    if not await async_db_service.add_entries(db, [row] if kind == "log" else [], [row] if kind == "food" else [], with_ids=True):
+                        failed.add(index)
+                return failed
+        except Exception as e: # e.g. no connection available
+            print(f"Error flushing write buffer: {e}")
+            return set(range(len(batch)))
+
+    async def sync(self, user_id: int):
+        """Read-your-writes: returns once every entry `user_id` has buffered so far is committed."""
+        if self._pending_users.get(user_id) or user_id in self._flushing_users:
+            await self.flush() # Waits for a flush in progress, then writes what's left
+
+    async def close(self):
+        """Stops the periodic flush and writes whatever is still buffered (on shutdown)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": int(LOG_WRITE_BEHIND),
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "avg_batch": round(self.rows_flushed / self.flushes, 1) if self.flushes else 0.0,
+            "largest_batch": self.largest_batch,
+            "retried_batches": self.retried_batches,
+            "failed_rows": self.failed_rows,
+            "lost_rows": self.lost_rows,
+            "flush_seconds_avg": round(self.flush_seconds_total / self.flushes, 4) if self.flushes else 0.0,
+        }
+
+
+log_writer = WriteBuffer()
@@ -0,0 +1,131 @@
+"""Offline tests of the chat routes through the ASGI app, with the fake LLM provider.
+
+Run from the project root:
+    python -m pytest backend/test_project.py
+"""
+import os
+import tempfile
+import uuid
+
+# Offline settings; must be set before the app (and the LLM client) is imported
+os.environ.update(
+    LLM_PROVIDER="fake",
+    LLM_FAKE_LATENCY_MS="0",
+    LLM_REQUESTS_PER_SECOND="0",
+    LLM_CACHE_BACKEND="none",
+    DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.sqlite')}",
+    SECRET_KEY="test-secret",
+    ALGORITHM="HS256",
+    SERVER_TIMING_ENABLED="true",
+)
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import HumanMessage
+
+from backend.main import app
+from backend.services.cassette import Cassette, CassetteMiss, ReplayChatModel, cassette_key
+from backend.services.fake_llm import FakeChatModel
+
+GOAL = {"goal_type": "lose_weight", "target_weight": 75, "timeframe": "3 months", "activity_level": "moderate", "current_weight": 82, "height": 178, "age": 34, "gender": "male"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def sign_up(client: TestClient, goal: bool = True) -> dict:
+    response = client.post("/api/v1/auth/signup", json={"name": "test", "email": f"{uuid.uuid4().hex}@example.com", "password": "test"})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    if goal:
+        client.post("/api/v1/goal/set", json=GOAL, headers=headers).raise_for_status()
+    return headers
+
+
+@pytest.fixture(scope="module")
+def user(client):
+    return sign_up(client)
+
+
+def sse_events(body: str) -> list:
+    """(event, data) pairs of an SSE body; every event must end with a blank line."""
+    assert body.endswith("\n\n")
+    events = []
+    for block in body[:-2].split("\n\n"):
+        event = None
+        data = []
+        for line in block.split("\n"):
+            field, _, value = line.partition(": ")
+            assert field in ("event", "data"), line
+            if field == "event":
+                event = value
+            else:
+                data.append(value)
+        events.append((event, "\n".join(data)))
+    return events
+
+
+def stream(client: TestClient, headers: dict, message: str, **options) -> list:
+    with client.stream("POST", "/api/v1/chat/stream", json={"message": message, "session_id": uuid.uuid4().hex, **options}, headers=headers) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        return sse_events(response.read().decode())
+
+
+def test_chat_runs_the_personalized_planner(client, user):
+    response = client.post("/api/v1/chat", json={"message": "What should I cook tonight?", "session_id": "chat-test"}, headers=user)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["response"] == 'About "What should I cook tonight?": keep meals balanced, drink water through the day, sleep 7-9 hours and stay active most days.'
+    assert body["updated_chat_history"][-1] == ["What should I cook tonight?", body["response"]]
+    assert "node.fast_agent_node;dur=" in response.headers["Server-Timing"]
+    assert 'context_tokens;desc="' in response.headers["Server-Timing"]
+
+
+def test_chat_stream_streams_tokens_and_ends_with_done(client, user):
+    events = stream(client, user, "What should I cook tonight?")
+    assert events[-1] == (None, "[DONE]")
+    # Timings come last, since the headers went out before the graph ran
+    assert events[-2][0] == "server_timing" and "total;dur=" in events[-2][1]
+    tokens = events[:-2]
+    assert len(tokens) > 1 and all(event is None for event, _ in tokens)
+    answer = client.post("/api/v1/chat", json={"message": "What should I cook tonight?"}, headers=user).json()["response"]
+    assert "".join(data for _, data in tokens) == answer
+
+
+def test_chat_stream_tool_events(client, user):
+    events = stream(client, user, "Summarize my logs this week", include_tool_events=True)
+    kinds = [event for event, _ in events]
+    assert kinds.index("tool_start") < kinds.index("tool_end") < kinds.index(None)
+    assert '"user_log_summary_tool"' in dict(events)["tool_start"]
+    assert "".join(data for event, data in events[:-1] if event is None).startswith("Here is what I found: No logs or food entries")
+    assert events[-1] == (None, "[DONE]")
+
+    assert "tool_start" not in [event for event, _ in stream(client, user, "Summarize my logs this week")]
+
+
+def test_health_question_without_goal_gets_the_fixed_reply(client):
+    headers = sign_up(client, goal=False)
+    reply = "Welcome! It looks like you haven't set a health goal yet. Please set one to get personalized advice."
+    assert client.post("/api/v1/chat", json={"message": "How many calories should I eat?"}, headers=headers).json()["response"] == reply
+    assert stream(client, headers, "How many calories should I eat?") == [(None, reply), (None, "[DONE]")]
+
+
+def test_chat_routes_require_login(client):
+    assert client.post("/api/v1/chat", json={"message": "hi"}).status_code == 401
+    assert client.post("/api/v1/chat/stream", json={"message": "hi"}).status_code == 401
+
+
+def test_replay_cassette_answers_recorded_requests(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    messages = [HumanMessage(content="How much water should I drink on workout days?")]
+    recorded = FakeChatModel(latency_seconds=0).invoke(messages)
+    Cassette(path).record(cassette_key(messages), recorded)
+
+    replay = ReplayChatModel(latency_seconds=0, cassette_path=path)
+    assert replay.invoke(messages).content == recorded.content
+    with pytest.raises(CassetteMiss):
+        replay.invoke([HumanMessage(content="A request that was never recorded")])
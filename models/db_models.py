@@ -1,6 +1,6 @@
 from backend.data.db import Base
 from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, ForeignKey, Index, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -23,6 +23,7 @@ class User(Base):
     bmi_data = relationship("BMIData", back_populates="owner")
     bmr_data = relationship("BMRData", back_populates="owner")
     daily_logs = relationship("Log", back_populates="owner")
+    daily_rollups = relationship("DailyRollup", back_populates="owner")
 
     def to_dict(self):
         return {
@@ -32,8 +33,27 @@ class User(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
 
+# Daily targets of a goal analysis, promoted to columns of `goals` -> type
+GOAL_TARGETS = {
+    "target_calories": int,
+    "target_water_intake_liters": float,
+    "target_sleep_hours": float,
+    "target_steps": int,
+}
+
+def analysis_targets(analysis) -> dict:
+    """Values for the promoted target columns (None where the analysis has no positive number)."""
+    analysis = analysis if isinstance(analysis, dict) else {}
+    targets = {}
+    for name, kind in GOAL_TARGETS.items():
+        value = analysis.get(name)
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+        targets[name] = (round(value) if kind is int else float(value)) if valid else None
+    return targets
+
 class Goal(Base):
     __tablename__ = "goals"
+    __table_args__ = (Index("ix_goals_user_id_created_at", "user_id", "created_at"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     goal_type = Column(String(255))
@@ -49,11 +69,27 @@ class Goal(Base):
     calculated_bmi = Column(Float)
     calculated_bmr = Column(Float)
     goal_text = Column(String(2048), nullable=False)
-    analysis_result = Column(String(2048), nullable=True) # Store structured data from goal analysis
+    analysis_result = Column(JSON(none_as_null=True), nullable=True) # Structured goal analysis, parsed once when the row loads
+    # Copied from analysis_result by set_analysis(), so targets can be read and compared in SQL
+    target_calories = Column(Integer)
+    target_water_intake_liters = Column(Float)
+    target_sleep_hours = Column(Float)
+    target_steps = Column(Integer)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     owner = relationship("User", back_populates="goals")
 
+    def set_analysis(self, analysis: dict):
+        """Stores an analysis result and its promoted targets."""
+        self.analysis_result = analysis
+        for name, value in analysis_targets(analysis).items():
+            setattr(self, name, value)
+
+    @property
+    def targets(self) -> dict:
+        """The promoted targets that are set, e.g. {"target_steps": 8000}."""
+        return {name: getattr(self, name) for name in GOAL_TARGETS if getattr(self, name) is not None}
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -72,11 +108,13 @@ class Goal(Base):
             "calculated_bmr": self.calculated_bmr,
             "goal_text": self.goal_text,
             "analysis_result": self.analysis_result,
+            **{name: getattr(self, name) for name in GOAL_TARGETS},
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
 
 class WeightLog(Base):
     __tablename__ = "weight_logs"
+    __table_args__ = (Index("ix_weight_logs_user_id_timestamp", "user_id", "timestamp"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     weight = Column(Float, nullable=False)
@@ -86,6 +124,7 @@ class WeightLog(Base):
 
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
+    __table_args__ = (Index("ix_activity_logs_user_id_date", "user_id", "date"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     type = Column(String(255))
@@ -96,6 +135,7 @@ class ActivityLog(Base):
 
 class FoodEntry(Base):
     __tablename__ = "food_entries"
+    __table_args__ = (Index("ix_food_entries_user_id_created_at", "user_id", "created_at"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     item_name = Column(String(255), nullable=False)
@@ -117,6 +157,7 @@ class FoodEntry(Base):
 
 class OCRLog(Base):
     __tablename__ = "ocr_logs"
+    __table_args__ = (Index("ix_ocr_logs_user_id_timestamp", "user_id", "timestamp"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     food_name = Column(String(255))
@@ -128,6 +169,7 @@ class OCRLog(Base):
 
 class BMIData(Base):
     __tablename__ = "bmi_data"
+    __table_args__ = (Index("ix_bmi_data_user_id_calculated_at", "user_id", "calculated_at"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     height = Column(Float)
@@ -139,6 +181,7 @@ class BMIData(Base):
 
 class BMRData(Base):
     __tablename__ = "bmr_data"
+    __table_args__ = (Index("ix_bmr_data_user_id_calculated_at", "user_id", "calculated_at"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     age = Column(Integer)
@@ -152,6 +195,7 @@ class BMRData(Base):
 
 class Log(Base):
     __tablename__ = "logs"
+    __table_args__ = (Index("ix_logs_user_id_created_at", "user_id", "created_at"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     steps = Column(Integer)
@@ -171,4 +215,39 @@ class Log(Base):
             "water_intake": self.water_intake,
             "calories": self.calories,
             "created_at": self.created_at.isoformat() if self.created_at else None,
-        }
\ No newline at end of file
+        }
+
+def rollup_view(row: dict) -> dict:
+    """A rollup's counters (dict of DailyRollup columns, day as ISO date) as days are shown: averages instead of sums."""
+    return {
+        "day": row["day"],
+        "steps": row["steps_total"],
+        "sleep_hours": row["sleep_hours_sum"] / row["sleep_count"] if row["sleep_count"] else None,
+        "water_intake": row["water_intake_sum"] / row["water_count"] if row["water_count"] else None,
+        "calories": row["log_calories_total"] + row["food_calories_total"],
+        "log_count": row["log_count"],
+        "food_count": row["food_count"],
+    }
+
+class DailyRollup(Base):
+    """Per-user, per-day totals of `logs` and `food_entries`, kept up to date by db_service writes."""
+    __tablename__ = "daily_rollups"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    log_count = Column(Integer, nullable=False, default=0)
+    steps_total = Column(Integer, nullable=False, default=0)
+    sleep_hours_sum = Column(Float, nullable=False, default=0)
+    sleep_count = Column(Integer, nullable=False, default=0)
+    water_intake_sum = Column(Float, nullable=False, default=0)
+    water_count = Column(Integer, nullable=False, default=0)
+    log_calories_total = Column(Float, nullable=False, default=0)
+    food_count = Column(Integer, nullable=False, default=0)
+    food_calories_total = Column(Integer, nullable=False, default=0)
+
+    owner = relationship("User", back_populates="daily_rollups")
+
+    def to_dict(self):
+        return rollup_view({
+            **{column.name: getattr(self, column.name) for column in self.__table__.columns},
+            "day": self.day.isoformat() if self.day else None,
+        })